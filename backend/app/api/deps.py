@@ -7,29 +7,51 @@ This module contains dependencies used across API endpoints.
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
 import uuid
 
 from app.core.config import settings
+from app.core.access_cache import compile_user_access, user_access_cache
+from app.core.permissions import get_active_tenant_ids
 from app.db.session import get_db
-from app.models.user import User
+from app.db.async_session import get_async_db
+from app.models.user import User, Role
+from app.models.user_tenant_assignment import UserTenantAssignment
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+
+def _user_access_load_options(include_permissions: bool = True):
     """
-    Get the current user from the token
+    Loader options joining tenant assignments with their tenants and roles into the
+    user query, and optionally the roles' permissions.
+    
+    Built on demand so that mappers are configured only after all models are imported.
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
+    role_load = joinedload(User.tenant_assignments).joinedload(UserTenantAssignment.role)
+    if include_permissions:
+        role_load = role_load.joinedload(Role.permissions)
+    return (
+        joinedload(User.tenant_assignments).joinedload(UserTenantAssignment.tenant),
+        role_load,
     )
+
+
+def decode_access_token(token: str):
+    """
+    Decode an access token.
     
+    Returns:
+        Tuple of the SQL condition selecting the token's user and the access cache key
+    """
     try:
         payload = jwt.decode(
             token, settings.JWT_SECRET, algorithms=[settings.JWT_ALGORITHM]
@@ -40,24 +62,46 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    # Try to find user by user_id first
+    # Tokens issued before iat was added are keyed by their expiry instead
+    cache_key = (user_id, payload.get("iat") or payload.get("exp"))
+    
+    if user_id.startswith("user-"):
+        # Legacy format - strip the prefix
+        user_id = user_id[5:]
+    
+    # Try to parse as UUID
+    try:
+        return User.user_id == str(uuid.UUID(user_id)), cache_key
+    except ValueError:
+        pass
+    
+    # Not a valid UUID, try to find by numeric ID
+    try:
+        return User.id == int(user_id), cache_key
+    except (ValueError, TypeError):
+        raise credentials_exception
+
+
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> User:
+    """
+    Get the current user from the token
+    
+    The user's compiled tenant access is taken from the access cache when possible;
+    otherwise assignments and roles are loaded in the same query as the user and
+    compiled once. Role permissions come from the permission index, so they are
+    only loaded for roles it has not compiled yet.
+    """
+    condition, cache_key = decode_access_token(token)
+    access = user_access_cache.get(cache_key)
+    
     try:
-        # Check if user_id is a valid UUID
-        if user_id.startswith("user-"):
-            # Legacy format - strip the prefix
-            user_id = user_id[5:]
-        
-        # Try to parse as UUID
-        try:
-            uuid_obj = uuid.UUID(user_id)
-            user = db.query(User).filter(User.user_id == str(uuid_obj)).first()
-        except ValueError:
-            # Not a valid UUID, try to find by numeric ID
-            try:
-                id_value = int(user_id)
-                user = db.query(User).filter(User.id == id_value).first()
-            except (ValueError, TypeError):
-                user = None
+        query = db.query(User).filter(condition)
+        if access is None:
+            query = query.options(*_user_access_load_options(include_permissions=False))
+        user = query.first()
     except Exception as e:
         print(f"Error finding user: {e}")
         user = None
@@ -65,7 +109,65 @@ def get_current_user(
     if user is None:
         raise credentials_exception
     
+    if access is None:
+        access = compile_user_access(user)
+        user_access_cache.put(cache_key, access)
+    user.resolved_access = access
+    
+    # Store the access token with the user object for use in forwarding requests
+    user.access_token = token
+    
+    return user
+
+
+async def get_current_user_async(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """
+    Get the current user from the token using the async session.
+    
+    On an access cache hit only the user row is loaded. Otherwise tenant assignments
+    with their tenants, roles and permissions are loaded eagerly, since lazy loading
+    is not available on async sessions, and compiled once. Endpoints that read the
+    assignments themselves call load_tenant_assignments() first.
+    """
+    condition, cache_key = decode_access_token(token)
+    access = user_access_cache.get(cache_key)
+    
+    query = select(User).where(condition)
+    if access is None:
+        query = query.options(*_user_access_load_options())
+    user = (await db.execute(query)).unique().scalars().first()
+    
+    if user is None:
+        raise credentials_exception
+    
+    if access is None:
+        # Queries cannot be issued through the user's session outside run_sync
+        active_tenant_ids = await db.run_sync(get_active_tenant_ids) if user.is_msp_user else None
+        access = compile_user_access(user, active_tenant_ids)
+        user_access_cache.put(cache_key, access)
+    user.resolved_access = access
+    
     # Store the access token with the user object for use in forwarding requests
     user.access_token = token
     
     return user
+
+
+async def load_tenant_assignments(db: AsyncSession, user: User):
+    """
+    Load a user's tenant assignments with their tenants and roles, unless loaded already.
+    
+    Args:
+        db: The async session the user was loaded with
+        user: The user returned by get_current_user_async
+    """
+    if "tenant_assignments" not in inspect(user).unloaded:
+        return
+    # Eager loads fill the unloaded collection of the user already in the session
+    result = await db.execute(
+        select(User).where(User.id == user.id).options(*_user_access_load_options(include_permissions=False))
+    )
+    result.unique().scalars().all()
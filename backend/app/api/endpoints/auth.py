@@ -1,19 +1,32 @@
 from datetime import timedelta
-from typing import Any
+from typing import Any, Dict, List
+import hashlib
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import func, literal, select, union_all
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
-from app.api.deps import get_current_user, get_db
+from app.api.deps import (
+    get_current_user, get_current_user_async, get_db, decode_access_token, load_tenant_assignments, oauth2_scheme
+)
+from app.db.async_session import get_async_db
 from app.core.config import settings
 from app.core.security import authenticate_user, create_access_token
 from app.core.permissions import get_user_accessible_tenants, get_user_permissions_in_tenant, can_user_switch_to_tenant
 from app.core.tenant_utils import get_user_role_in_tenant, get_user_permissions_in_tenant as get_tenant_permissions
-from app.models.user import User
-from app.schemas.user import Token, LoginResponse, User, TenantAssignmentResponse
+from app.core.access_cache import get_user_access, bootstrap_etag_cache
+from app.core.utils import parse_if_none_match
+from app.models.user import User, Tenant
+from app.models.deployment import CloudAccount, Deployment, Environment, Template
+from app.schemas.user import (
+    Token, LoginResponse, User, TenantAssignmentResponse,
+    SessionBootstrap, BootstrapTenant, BootstrapTenantCounts
+)
 from app.db.session import get_db
 
 router = APIRouter()
@@ -24,14 +37,17 @@ class SwitchTenantRequest(BaseModel):
 
 
 @router.post("/login", response_model=LoginResponse)
-def login_for_access_token(
+async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """
     OAuth2 compatible token login, get an access token for future requests
+    
+    The password is verified on the dedicated password hashing executor, so login
+    bursts don't hold up the threadpool serving other endpoints.
     """
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -41,28 +57,10 @@ def login_for_access_token(
     
     access_token_expires = timedelta(minutes=settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    # Get user's accessible tenants
-    accessible_tenants = get_user_accessible_tenants(user, db)
-    
-    # Determine current tenant (primary tenant or first available)
-    current_tenant_id = None
-    if user.is_msp_user:
-        # MSP users default to the first tenant or their primary tenant
-        primary_assignment = user.get_primary_tenant_assignment()
-        current_tenant_id = primary_assignment.tenant_id if primary_assignment else (accessible_tenants[0] if accessible_tenants else None)
-    else:
-        # Regular users default to their primary tenant
-        primary_assignment = user.get_primary_tenant_assignment()
-        current_tenant_id = primary_assignment.tenant_id if primary_assignment else None
-    
-    # Get current role and permissions based on tenant context
-    current_role = get_user_role_in_tenant(user, current_tenant_id)
-    
-    if current_tenant_id:
-        permissions = get_tenant_permissions(user, current_tenant_id)
-    else:
-        # Fallback to legacy permission system if no tenant context
-        permissions = get_user_permissions_in_tenant(user, current_tenant_id)
+    # Tenant assignments are loaded lazily, which needs the sync session context
+    user_response = await db.run_sync(
+        lambda session: _build_user_response(user, get_user_accessible_tenants(user, session))
+    )
 
     # Create access token with tenant context
     access_token = create_access_token(
@@ -72,29 +70,7 @@ def login_for_access_token(
     return LoginResponse(
         access_token=access_token,
         token_type="bearer",
-        user=User(
-            id=user.user_id,
-            name=user.full_name,
-            email=user.email,
-            role=current_role,
-            tenantId=current_tenant_id,
-            permissions=permissions,
-            accessibleTenants=accessible_tenants,
-            isMspUser=user.is_msp_user,
-            tenant_assignments=[
-                TenantAssignmentResponse(
-                    tenant_id=assignment.tenant_id,
-                    tenant_name=assignment.tenant.name if assignment.tenant else None,
-                    role_id=assignment.role_id,
-                    role_name=assignment.role.name if assignment.role else None,
-                    is_primary=assignment.is_primary,
-                    is_active=assignment.is_active,
-                    provisioned_via=assignment.provisioned_via,
-                    external_group_id=assignment.external_group_id,
-                    external_role_mapping=assignment.external_role_mapping
-                ) for assignment in user.get_tenant_assignments()
-            ]
-        )
+        user=user_response
     )
 
 
@@ -111,9 +87,9 @@ def options_login():
 
 
 @router.get("/me", response_model=User)
-def read_users_me(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def read_users_me(
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """
     Get current user information with tenant context
@@ -125,8 +101,23 @@ def read_users_me(
     response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
     
     # Get user's accessible tenants
-    accessible_tenants = get_user_accessible_tenants(current_user, db)
+    await load_tenant_assignments(db, current_user)
+    accessible_tenants = await db.run_sync(lambda session: get_user_accessible_tenants(current_user, session))
     
+    return _build_user_response(current_user, accessible_tenants)
+
+
+def _build_user_response(current_user, accessible_tenants: List[str]) -> User:
+    """
+    Build the current user's information with tenant context.
+    
+    Args:
+        current_user: The authenticated user, with tenant assignments loaded
+        accessible_tenants: IDs of the tenants the user can access
+        
+    Returns:
+        User schema with the current tenant, role and permissions
+    """
     # Determine current tenant (primary tenant or first available)
     current_tenant_id = None
     if current_user.is_msp_user:
@@ -172,6 +163,94 @@ def read_users_me(
     )
 
 
+# Resources counted per tenant in the session bootstrap
+BOOTSTRAP_COUNTED_MODELS = {
+    "environments": Environment,
+    "cloud_accounts": CloudAccount,
+    "templates": Template,
+    "deployments": Deployment
+}
+
+
+async def _count_by_tenant(db: AsyncSession, tenant_ids: List[str]) -> Dict[str, BootstrapTenantCounts]:
+    """
+    Count environments, cloud accounts, templates and deployments per tenant in one query.
+    """
+    if not tenant_ids:
+        return {}
+    
+    statement = union_all(*[
+        select(literal(kind).label("kind"), model.tenant_id, func.count().label("count"))
+        .where(model.tenant_id.in_(tenant_ids))
+        .group_by(model.tenant_id)
+        for kind, model in BOOTSTRAP_COUNTED_MODELS.items()
+    ])
+    
+    counts = {tenant_id: {} for tenant_id in tenant_ids}
+    for kind, tenant_id, count in (await db.execute(statement)).all():
+        counts[tenant_id][kind] = count
+    return {tenant_id: BootstrapTenantCounts(**values) for tenant_id, values in counts.items()}
+
+
+@router.get("/bootstrap", response_model=SessionBootstrap)
+async def bootstrap_session(
+    request: Request,
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> Any:
+    """
+    Get the current user, their tenants, their role and permissions in each tenant
+    and per-tenant resource counts in one call.
+    
+    Responses carry an ETag. A request whose If-None-Match holds the ETag last issued
+    for the same token is answered with 304 before the database is touched, until
+    BOOTSTRAP_ETAG_TTL passes or user access or tenants change.
+    """
+    _, cache_key = decode_access_token(token)
+    client_etags = parse_if_none_match(request.headers.get("if-none-match", ""))
+    
+    etag = bootstrap_etag_cache.get(cache_key)
+    if etag and (etag in client_etags or "*" in client_etags):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    
+    current_user = await get_current_user_async(token, db)
+    await load_tenant_assignments(db, current_user)
+    accessible_tenants = await db.run_sync(lambda session: get_user_accessible_tenants(current_user, session))
+    
+    tenants = []
+    if accessible_tenants:
+        tenants = (await db.execute(
+            select(Tenant.tenant_id, Tenant.name, Tenant.description)
+            .where(Tenant.tenant_id.in_(accessible_tenants), Tenant.is_active == True)
+            .order_by(Tenant.id)
+        )).all()
+    counts = await _count_by_tenant(db, [tenant.tenant_id for tenant in tenants])
+    
+    access = get_user_access(current_user)
+    bootstrap = SessionBootstrap(
+        user=_build_user_response(current_user, accessible_tenants),
+        tenants=[
+            BootstrapTenant(
+                tenant_id=tenant.tenant_id,
+                name=tenant.name,
+                description=tenant.description,
+                role=access.for_tenant(tenant.tenant_id).role,
+                permissions=sorted(access.for_tenant(tenant.tenant_id).permissions),
+                counts=counts[tenant.tenant_id]
+            ) for tenant in tenants
+        ]
+    )
+    
+    content = bootstrap.model_dump(mode="json")
+    etag = '"' + hashlib.sha256(bootstrap.model_dump_json().encode()).hexdigest()[:32] + '"'
+    bootstrap_etag_cache.put(cache_key, etag)
+    
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag in client_etags:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return JSONResponse(content=content, headers=headers)
+
+
 @router.get("/verify")
 def verify_token(current_user: User = Depends(get_current_user)) -> Any:
     """
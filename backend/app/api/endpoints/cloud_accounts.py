@@ -18,6 +18,8 @@ from app.core.tenant_utils import (
     resolve_tenant_context,
     get_user_role_name_in_tenant,
 )
+from app.services.widget_data_service import invalidate_widget_data
+from app.services.tenant_stats_service import TenantStatDeltas
 import requests
 
 router = APIRouter()
@@ -254,8 +256,10 @@ def create_cloud_account(
         )
         
         db.add(cloud_account)
+        TenantStatDeltas().cloud_account(cloud_account.tenant_id).apply(db)
         db.commit()
         db.refresh(cloud_account)
+        invalidate_widget_data(cloud_account.tenant_id)
         
         # Format cloud IDs
         cloud_ids = []
@@ -363,6 +367,7 @@ def update_cloud_account(
         
         db.commit()
         db.refresh(account)
+        invalidate_widget_data(account.tenant_id)
         
         # Get the tenant associated with this account
         tenant = db.query(Tenant).filter(Tenant.id == account.tenant_id).first()
@@ -444,8 +449,11 @@ def delete_cloud_account(
             )
         
         # Delete account
+        account_tenant_id = account.tenant_id
+        TenantStatDeltas().cloud_account(account_tenant_id, sign=-1).apply(db)
         db.delete(account)
         db.commit()
+        invalidate_widget_data(account_tenant_id)
         
         return Response(status_code=status.HTTP_204_NO_CONTENT)
     
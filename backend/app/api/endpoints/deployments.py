@@ -1,11 +1,14 @@
 from typing import Any, List, Optional, Dict
-from fastapi import APIRouter, Depends, HTTPException, status, Response, Query, Body, Path
+from fastapi import APIRouter, Depends, HTTPException, status, Response, Query, Body, Path, Header
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, tuple_, case, select
 import uuid
 import requests
 import os
 import json
+import time
 from datetime import datetime
 from pydantic import BaseModel, Field
 
@@ -16,15 +19,29 @@ logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
 from app.db.session import get_db
+from app.db.async_session import get_async_db, AsyncSessionLocal
 from app.api.endpoints.auth import get_current_user
+from app.api.deps import get_current_user_async
 from app.models.user import User, Tenant
 from app.models.deployment import Deployment, DeploymentHistory, Template, Environment, CloudAccount
 from app.models.deployment_details import DeploymentDetails
 from app.models.cloud_settings import CloudSettings
 from app.schemas.deployment import (
     DeploymentResponse, DeploymentCreate, DeploymentUpdate,
-    CloudDeploymentResponse
+    CloudDeploymentResponse, EngineStatusBatch, EngineStatusBatchResponse
 )
+from app.services.deployment_status_service import (
+    TERMINAL_STATUSES,
+    apply_status_updates,
+    rebuild_snapshots,
+    history_level,
+    history_level_filter,
+    notify_history_written,
+    wait_for_history
+)
+from app.services.widget_data_service import invalidate_widget_data
+from app.services.tenant_stats_service import TenantStatDeltas, deployment_provider, set_deployment_status
+from app.core.utils import encode_cursor, decode_cursor
 from app.core.tenant_utils import (
     resolve_tenant_context,
     get_user_role_name_in_tenant,
@@ -58,6 +75,29 @@ class AzureSubscriptionResponse(BaseModel):
     state: str
     tenant_id: str
 
+
+def invalidate_engine_credentials(tenant_id: str, current_user: User):
+    """
+    Have the deployment engine drop the Azure deployers it pooled for a tenant.
+
+    Called after the tenant's credentials change; failures are only logged, since the
+    engine also rebuilds pooled deployers when the settings change or expire.
+    """
+    params = {}
+    if tenant_id != current_user.tenant.tenant_id:
+        params["target_tenant_id"] = tenant_id
+    try:
+        response = requests.delete(
+            f"{DEPLOYMENT_ENGINE_URL}/credentials/pool",
+            headers={"Authorization": f"Bearer {current_user.access_token}"},
+            params=params,
+            timeout=10
+        )
+        if response.status_code != 200:
+            logger.warning(f"Deployment engine did not drop pooled credentials for tenant {tenant_id}: {response.text}")
+    except requests.RequestException as e:
+        logger.warning(f"Error dropping pooled credentials for tenant {tenant_id}: {str(e)}")
+
 @router.get("/azure_credentials", tags=["azure-credentials"], response_model=List[AzureCredentialsResponse])
 def get_azure_credentials(
     *,
@@ -198,6 +238,8 @@ def set_azure_credentials(
         db.add(new_creds)
         db.commit()
         db.refresh(new_creds)
+        invalidate_widget_data(creds_tenant_id)
+        invalidate_engine_credentials(creds_tenant_id, current_user)
         
 
         logger.info(f"New Azure credentials added for tenant ID: {creds_tenant_id}, settings ID: {new_creds.settings_id}")
@@ -347,6 +389,8 @@ def delete_azure_credential(
         # Delete credential
         db.delete(creds)
         db.commit()
+        invalidate_widget_data(creds_tenant_id)
+        invalidate_engine_credentials(creds_tenant_id, current_user)
         
         return {"message": "Azure credential deleted successfully"}
     
@@ -366,131 +410,41 @@ def update_deployment_status(
     """
     Update deployment status from the deployment engine
     """
-    logger.setLevel(logging.DEBUG)
-    
     logger.debug(f"Received status update for deployment {deployment_id}")
-    logger.debug(f"Update data: {json.dumps(update_data, default=str)}")
     logger.debug(f"User: {current_user.username} (ID: {current_user.id})")
     
-    # Find the deployment first to get tenant_id
-    logger.debug(f"Looking for deployment with ID: {deployment_id}")
-    deployment = db.query(Deployment).filter(Deployment.deployment_id == deployment_id).first()
-    
-    if not deployment:
-        logger.warning(f"Deployment not found: {deployment_id}")
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Deployment not found"
-        )
-    
-    logger.debug(f"Found deployment: {deployment.name} (ID: {deployment.id}, DB ID: {deployment.deployment_id})")
-    
-    # Get tenant_id from deployment for permission check
-    tenant_id = deployment.tenant_id
-    
-    # Check if user has permission to update deployments
-    has_permission = user_has_any_permission(current_user, ["update:deployments"], tenant_id)
-    logger.debug(f"User has update:deployments permission: {has_permission}")
-    
-    if not has_permission:
-        logger.warning(f"User {current_user.username} does not have permission to update deployments")
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions"
-        )
-    
     try:
-        # Get or create deployment details
-        logger.debug(f"Looking for deployment details for deployment ID: {deployment.id}")
-        deployment_details = db.query(DeploymentDetails).filter(
-            DeploymentDetails.deployment_id == deployment.id
-        ).first()
+        results = apply_status_updates(db, current_user, [{**update_data, "deployment_id": deployment_id}])
+        result = results[0]["result"]
         
-        if not deployment_details:
-            logger.debug(f"Creating new deployment details for deployment ID: {deployment.id}")
-            
-            # Create cloud_properties object with available data
-            cloud_properties = {}
-            if hasattr(deployment, 'region') and deployment.region:
-                cloud_properties['location'] = deployment.region
-            
-            deployment_details = DeploymentDetails(
-                deployment_id=deployment.id,
-                provider="azure",
-                deployment_type=deployment.deployment_type if hasattr(deployment, 'deployment_type') else "arm",
-                cloud_deployment_id=deployment.cloud_deployment_id if hasattr(deployment, 'cloud_deployment_id') else None,
-                cloud_properties=cloud_properties if cloud_properties else None,
-                status="in_progress"
+        if result == "not_found":
+            logger.warning(f"Deployment not found: {deployment_id}")
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Deployment not found"
             )
-            db.add(deployment_details)
-            logger.debug(f"Added new deployment details to session")
-        else:
-            logger.debug(f"Found existing deployment details: {deployment_details.id}")
-        
-        # Update deployment status
-        status_value = update_data.get("status")
-        if status_value:
-            logger.debug(f"Updating status to: {status_value}")
-            deployment.status = status_value
-            deployment_details.status = status_value
-            
-            # If deployment is complete, update completed_at
-            if status_value in ["succeeded", "failed", "canceled"]:
-                logger.debug(f"Deployment is complete with status: {status_value}, updating completed_at")
-                deployment_details.completed_at = datetime.utcnow()
-        
-        # Update resources
-        resources = update_data.get("resources")
-        if resources:
-            logger.debug(f"Updating resources: {len(resources)} resources")
-            deployment_details.cloud_resources = resources
-        
-        # Update outputs
-        outputs = update_data.get("outputs")
-        if outputs:
-            logger.debug(f"Updating outputs: {len(outputs)} outputs")
-            deployment_details.outputs = outputs
-        
-        # Update logs
-        logs = update_data.get("logs")
-        if logs:
-            logger.debug(f"Updating logs: {len(logs)} log entries")
-            deployment_details.logs = logs
-        
-        # Add to deployment history
-        logger.debug(f"Creating history entry for status: {status_value}")
-        history_entry = DeploymentHistory(
-            deployment_id=deployment.id,
-            status=status_value,
-            message=f"Deployment status updated to {status_value}",
-            details={
-                "resources": resources,
-                "outputs": outputs,
-                "logs": logs,
-                "deployment_result": update_data.get("deployment_result", {})  # Store the deployment result
-            },
-            user_id=current_user.id
-        )
-        db.add(history_entry)
-        logger.debug(f"Added history entry to session")
         
-        # Commit changes
-        logger.debug("Committing changes to database")
-        try:
-            db.commit()
-            logger.debug("Successfully committed changes to database")
-        except Exception as commit_error:
-            logger.error(f"Error committing to database: {str(commit_error)}")
-            db.rollback()
-            raise commit_error
+        if result == "forbidden":
+            logger.warning(f"User {current_user.username} does not have permission to update deployments")
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions"
+            )
+        
+        db.commit()
+        notify_history_written([deployment_id])
+        invalidate_widget_data(*(result["tenant_id"] for result in results if result.get("status_changed")))
         
         logger.debug(f"Status update for deployment {deployment_id} completed successfully")
         return {
             "message": "Deployment status updated successfully",
             "deployment_id": deployment_id,
-            "status": status_value
+            "status": update_data.get("status")
         }
     
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         logger.error(f"Error updating deployment status: {str(e)}", exc_info=True)
         db.rollback()
@@ -499,6 +453,42 @@ def update_deployment_status(
             detail=f"Error updating deployment status: {str(e)}"
         )
 
+@router.post("/engine/status/batch", tags=["deployment-engine"], response_model=EngineStatusBatchResponse)
+def update_deployment_status_batch(
+    batch: EngineStatusBatch,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    Apply status updates for many deployments from the deployment engine in one transaction.
+    
+    Deployments that do not exist or that the user may not update are reported per item
+    and do not prevent the rest of the batch from being applied.
+    """
+    logger.debug(f"Received status batch with {len(batch.updates)} updates from user {current_user.username}")
+    
+    try:
+        results = apply_status_updates(
+            db,
+            current_user,
+            [update_item.dict(exclude_none=True) for update_item in batch.updates]
+        )
+        db.commit()
+        notify_history_written([result["deployment_id"] for result in results if result["result"] == "applied"])
+        invalidate_widget_data(*(result["tenant_id"] for result in results if result.get("status_changed")))
+        
+        applied = sum(1 for result in results if result["result"] == "applied")
+        logger.debug(f"Applied {applied} of {len(results)} deployment status updates")
+        return EngineStatusBatchResponse(applied=applied, results=results)
+    
+    except Exception as e:
+        logger.error(f"Error applying deployment status batch: {str(e)}", exc_info=True)
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error applying deployment status batch: {str(e)}"
+        )
+
 @router.get("/azure_credentials/{settings_id}/subscriptions", tags=["azure-credentials"], response_model=List[AzureSubscriptionResponse])
 def list_azure_subscriptions(
     *,
@@ -580,21 +570,42 @@ def list_azure_subscriptions(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Large fields of the deployment list that can be left out through ?fields=
+DEPLOYMENT_LIST_OPTIONAL_FIELDS = {"resources", "outputs"}
+
+def _resource_count_column(dialect_name: str):
+    """Number of resources in a deployment's details, computed in SQL."""
+    if dialect_name == "postgresql":
+        # json_array_length raises on JSON that is not an array
+        return case(
+            (func.json_typeof(DeploymentDetails.cloud_resources) == "array",
+             func.json_array_length(DeploymentDetails.cloud_resources)),
+            else_=0
+        )
+    return func.coalesce(func.json_array_length(DeploymentDetails.cloud_resources), 0)
+
 @router.get("/", tags=["deployments"], response_model=List[CloudDeploymentResponse])
-def get_deployments(
+async def get_deployments(
+    response: Response,
     tenant_id: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    status_filter: Optional[str] = Query(None, alias="status", description="Only deployments with this status"),
+    environment: Optional[str] = Query(None, description="Only deployments in this environment (name)"),
+    template_id: Optional[str] = Query(None, description="Only deployments of this template"),
+    fields: Optional[str] = Query(None, description="Comma-separated large fields to include: resources, outputs (default: all)"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; all deployments are returned when omitted"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """
     Get all deployments for the current user's tenant or a specific tenant
-    """
-    # Add CORS headers
-    response = Response()
-    response.headers["Access-Control-Allow-Origin"] = "*"
-    response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
-    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
     
+    Deployments are returned newest first. When limit is given and more deployments
+    exist, the cursor for the next page is returned in the X-Next-Cursor header.
+    Callers that do not need the large resources and outputs JSON can pick the
+    fields they need (an empty fields= leaves out both); resourceCount is always
+    returned.
+    """
     # Check if user has permission to view deployments
     has_permission = user_has_any_permission(current_user, ["list:deployments"], tenant_id)
     if not has_permission:
@@ -603,20 +614,49 @@ def get_deployments(
             detail="Not enough permissions to list deployments"
         )
     
+    if fields is not None:
+        requested_fields = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown_fields = requested_fields - DEPLOYMENT_LIST_OPTIONAL_FIELDS
+        if unknown_fields:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(sorted(unknown_fields))}"
+            )
+    else:
+        requested_fields = set(DEPLOYMENT_LIST_OPTIONAL_FIELDS)
+    
     try:
-        query = db.query(
-            Deployment, Template, Environment, Tenant
-        ).join(
+        # Project only the columns the list needs; details are outer-joined in the same statement
+        columns = [
+            Deployment.id,
+            Deployment.deployment_id,
+            Deployment.name,
+            Deployment.status,
+            Deployment.parameters,
+            Deployment.template_version,
+            Deployment.tenant_id,
+            Deployment.created_at,
+            Deployment.updated_at,
+            Template.template_id.label("template_uuid"),
+            Template.name.label("template_name"),
+            Template.provider,
+            Environment.name.label("environment_name"),
+            DeploymentDetails.id.label("details_id"),
+            _resource_count_column(db.bind.dialect.name).label("resource_count")
+        ]
+        if "resources" in requested_fields:
+            columns.append(DeploymentDetails.cloud_resources)
+        if "outputs" in requested_fields:
+            columns.append(DeploymentDetails.outputs)
+        
+        query = select(*columns).select_from(Deployment).join(
             Template, Deployment.template_id == Template.id
         ).join(
             Environment, Deployment.environment_id == Environment.id
-        ).join(
-            Tenant, Deployment.tenant_id == Tenant.tenant_id  # Join on tenant_id (UUID) instead of id (Integer)
+        ).outerjoin(
+            DeploymentDetails, DeploymentDetails.deployment_id == Deployment.id
         )
         
-        # Get the user's tenant
-        user_tenant = db.query(Tenant).filter(Tenant.tenant_id == current_user.tenant_id).first()
-        
         # Filter by tenant if specified
         if tenant_id:
             # Handle different tenant ID formats
@@ -626,7 +666,7 @@ def get_deployments(
                     tenant_id = tenant_id[7:]
                 
                 # Check if tenant exists
-                tenant = db.query(Tenant).filter(Tenant.tenant_id == tenant_id).first()
+                tenant = (await db.execute(select(Tenant).where(Tenant.tenant_id == tenant_id))).scalars().first()
                 if not tenant:
                     raise HTTPException(
                         status_code=status.HTTP_404_NOT_FOUND,
@@ -641,7 +681,7 @@ def get_deployments(
                         detail="Not authorized to view deployments for this tenant"
                     )
                 
-                query = query.filter(Tenant.tenant_id == tenant_id)
+                query = query.where(Deployment.tenant_id == tenant_id)
             except Exception as e:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -649,51 +689,61 @@ def get_deployments(
                 )
         else:
             # No tenant specified, show deployments from the user's tenant
-            # No tenant specified, show deployments from the user's tenant
-            if user_tenant:
-                query = query.filter(Tenant.tenant_id == user_tenant.tenant_id)
+            if current_user.tenant_id:
+                query = query.where(Deployment.tenant_id == current_user.tenant_id)
+        
+        if status_filter:
+            query = query.where(Deployment.status == status_filter)
+        if environment:
+            query = query.where(Environment.name == environment)
+        if template_id:
+            query = query.where(Template.template_id == template_id)
+        
+        # Keyset pagination on (created_at, id), newest first
+        if cursor:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            query = query.where(
+                tuple_(Deployment.created_at, Deployment.id) < tuple_(cursor_created_at, cursor_id)
+            )
+        query = query.order_by(Deployment.created_at.desc(), Deployment.id.desc())
         
-        results = query.all()
+        if limit:
+            rows = (await db.execute(query.limit(limit + 1))).all()
+            if len(rows) > limit:
+                rows = rows[:limit]
+                response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
+        else:
+            rows = (await db.execute(query)).all()
         
         # Convert to frontend-compatible format
         deployments = []
-        for deployment, template, environment, tenant in results:
-            # Get provider from template
-            provider = template.provider
-            
+        for row in rows:
             # Get region from parameters if available
             region = None
-            if deployment.parameters and "region" in deployment.parameters:
-                region = deployment.parameters["region"]
-            
-            # Get deployment details if available to fetch cloud_resources
-            deployment_details = db.query(DeploymentDetails).filter(
-                DeploymentDetails.deployment_id == deployment.id
-            ).first()
+            if row.parameters and "region" in row.parameters:
+                region = row.parameters["region"]
             
-            # Get resources from deployment details
-            resources = []
-            if deployment_details and deployment_details.cloud_resources:
-                resources = deployment_details.cloud_resources
+            details = None
+            if row.details_id is not None and "outputs" in requested_fields:
+                details = {"outputs": row.outputs or {}}
             
             deployments.append(CloudDeploymentResponse(
-                id=deployment.deployment_id,
-                name=deployment.name,
-                templateId=template.template_id,
-                templateName=template.name,
-                templateVersion=getattr(deployment, 'template_version', None),  # Safely get template_version if it exists
-                provider=provider,
-                status=deployment.status,
-                environment=environment.name,
-                createdAt=deployment.created_at.isoformat(),
-                updatedAt=deployment.updated_at.isoformat(),
-                parameters=deployment.parameters or {},
-                resources=resources,  # Use resources from deployment_details
-                tenantId=tenant.tenant_id,
+                id=row.deployment_id,
+                name=row.name,
+                templateId=row.template_uuid,
+                templateName=row.template_name,
+                templateVersion=row.template_version,
+                provider=row.provider,
+                status=row.status,
+                environment=row.environment_name,
+                createdAt=row.created_at.isoformat(),
+                updatedAt=row.updated_at.isoformat(),
+                parameters=row.parameters or {},
+                resources=(row.cloud_resources or []) if "resources" in requested_fields else [],
+                resourceCount=row.resource_count,
+                tenantId=row.tenant_id,
                 region=region,
-                details={
-                    "outputs": deployment_details.outputs if deployment_details else {}
-                } if deployment_details else None
+                details=details
             ))
         
         return deployments
@@ -883,10 +933,18 @@ def create_deployment(
             created_by_id=current_user.id,
             parameters=deployment.parameters,
             deployment_type=template.type.lower(),  # Set deployment_type based on template type
-            template_version=template.current_version  # Store the template version
+            template_version=template.current_version,  # Store the template version
+            provider=deployment_provider(environment)  # Counted under this provider even if the environment changes
         )
         
         db.add(new_deployment)
+        db.flush()
+        TenantStatDeltas().deployment(
+            new_deployment.tenant_id,
+            new_deployment.status,
+            new_deployment.provider,
+            new_deployment.created_at
+        ).apply(db)
         db.commit()
         db.refresh(new_deployment)
         
@@ -935,7 +993,10 @@ def create_deployment(
                 "location": location,
                 "template": {
                     "source": "code",
-                    "code": template_code
+                    "code": template_code,
+                    # Identify the version in the engine's compiled template cache
+                    "template_id": template.template_id,
+                    "version": template.current_version
                 },
                 "parameters": new_deployment.parameters if new_deployment.parameters else {}
             }
@@ -1002,12 +1063,13 @@ def create_deployment(
                 # Log the error but don't fail the deployment creation
                 print(f"Deployment engine error: {response.text}")
                 # Update deployment status to reflect the error
-                new_deployment.status = "failed"
+                set_deployment_status(db, new_deployment, "failed")
                 db.commit()
             else:
                 # Update deployment with engine response
                 engine_result = response.json()
-                new_deployment.status = engine_result.get("status", "pending")
+                engine_status = engine_result.get("status", "pending")
+                set_deployment_status(db, new_deployment, engine_status)
                 
                 # Store the Azure deployment ID in the cloud_deployment_id field
                 if "azure_deployment_id" in engine_result:
@@ -1019,7 +1081,8 @@ def create_deployment(
             # Log the error but don't fail the deployment creation
             print(f"Error forwarding to deployment engine: {str(e)}")
             # Update deployment status to reflect the error
-            new_deployment.status = "failed"
+            db.rollback()
+            set_deployment_status(db, new_deployment, "failed")
             db.commit()
         
         # Extract region from parameters if available
@@ -1054,6 +1117,8 @@ def create_deployment(
             db.add(deployment_details)
             db.commit()
         
+        invalidate_widget_data(new_deployment.tenant_id)
+        
         # Return frontend-compatible response
         return CloudDeploymentResponse(
             id=new_deployment.deployment_id,
@@ -1135,14 +1200,15 @@ def update_deployment(
             )
         
         # Update deployment
+        set_deployment_status(db, deployment, deployment_update.status)
         deployment.name = deployment_update.name
-        deployment.status = deployment_update.status
         deployment.parameters = deployment_update.parameters
         deployment.resources = deployment_update.resources
         deployment.region = deployment_update.region
         
         db.commit()
         db.refresh(deployment)
+        invalidate_widget_data(deployment.tenant_id)
         
         # Return frontend-compatible response
         return CloudDeploymentResponse(
@@ -1186,8 +1252,9 @@ def delete_deployment(
     Delete a deployment and all related records
     """
     try:
-        # First, get the deployment to check if it exists and get its tenant_id
-        deployment = db.query(Deployment).filter(Deployment.deployment_id == deployment_id).first()
+        # First, get the deployment to check if it exists and get its tenant_id; the row is
+        # locked so a concurrent status update cannot change the status it is uncounted from
+        deployment = db.query(Deployment).filter(Deployment.deployment_id == deployment_id).with_for_update().first()
         
         if not deployment:
             raise HTTPException(
@@ -1223,10 +1290,19 @@ def delete_deployment(
             db.delete(details_record)
         
         # 3. Finally delete the main deployment record
+        TenantStatDeltas().deployment(
+            deployment.tenant_id,
+            deployment.status,
+            deployment.provider,
+            deployment.created_at,
+            sign=-1
+        ).apply(db)
         db.delete(deployment)
         
         # Commit all deletions in a single transaction
+        deployment_tenant_id = deployment.tenant_id
         db.commit()
+        invalidate_widget_data(deployment_tenant_id)
         
         logger.info(f"Successfully deleted deployment {deployment_id} and all related records")
         
@@ -1265,72 +1341,125 @@ def options_deployment_by_id():
     response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
     return response
 
+# Maximum and keep-alive timings for deployment log streams, in seconds
+LOG_STREAM_MAX_DURATION = 300
+LOG_STREAM_KEEPALIVE = 15
+LOG_STREAM_BATCH_SIZE = 500
+
+def _get_deployment_for_logs(db: Session, deployment_id: str, current_user: User) -> Deployment:
+    """Get a deployment and check that the user may view its logs."""
+    deployment = db.query(Deployment).filter(Deployment.deployment_id == deployment_id).first()
+    
+    if not deployment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Deployment with ID {deployment_id} not found"
+        )
+    
+    # Check if user has permission to view deployments for this tenant
+    has_permission = user_has_any_permission(current_user, ["list:deployments"], deployment.tenant_id)
+    if not has_permission:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    return deployment
+
+def _filter_history(query, status_filter: Optional[str], level: Optional[str], since: Optional[int]):
+    """Apply the status, level and since filters shared by the log endpoints."""
+    if status_filter:
+        query = query.filter(DeploymentHistory.status == status_filter)
+    if level:
+        try:
+            query = query.filter(history_level_filter(level))
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+    if since is not None:
+        query = query.filter(DeploymentHistory.id > since)
+    return query
+
+def _format_history_entry(log: DeploymentHistory) -> Dict[str, Any]:
+    """Format a history entry for the log endpoints."""
+    return {
+        "id": log.id,
+        "status": log.status,
+        "level": history_level(log.status),
+        "message": log.message,
+        "details": log.details,
+        "timestamp": log.created_at.isoformat(),
+        "user_id": log.user_id
+    }
+
 @router.get("/{deployment_id}/logs", tags=["deployments"], response_model=List[Dict[str, Any]])
 def get_deployment_logs(
     deployment_id: str,
+    response: Response,
     tenant_id: Optional[str] = None,
+    include_snapshot: bool = False,
+    status_filter: Optional[str] = Query(None, alias="status", description="Only entries with this status"),
+    level: Optional[str] = Query(None, description="Only entries of this level: error, warning or info"),
+    since: Optional[int] = Query(None, description="Only entries newer than this history entry ID"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; all entries are returned when omitted"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> Any:
     """
     Get logs for a specific deployment from the deployment_history table
+    
+    Entries are returned newest first. When limit is given and more entries exist,
+    the cursor for the next page is returned in the X-Next-Cursor header. Use since
+    with the newest ID already seen to fetch only new entries.
+    
+    History entries store only what changed in each update. Pass include_snapshot=true
+    to also get the full deployment state (status, resources, outputs, logs) rebuilt
+    as of each entry.
     """
     try:
-        # First, get the deployment to check if it exists and get its tenant_id
-        deployment = db.query(Deployment).filter(Deployment.deployment_id == deployment_id).first()
+        deployment = _get_deployment_for_logs(db, deployment_id, current_user)
         
-        if not deployment:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Deployment with ID {deployment_id} not found"
-            )
-        
-        # Check if user has permission to view deployments for this tenant
-        has_permission = user_has_any_permission(current_user, ["list:deployments"], deployment.tenant_id)
-        if not has_permission:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Not enough permissions"
-            )
-        
-        # Now get the full deployment data with joins
-        result = db.query(
-            Deployment, Template, Environment, Tenant
-        ).join(
-            Template, Deployment.template_id == Template.id
-        ).join(
-            Environment, Deployment.environment_id == Environment.id
-        ).join(
-            Tenant, Deployment.tenant_id == Tenant.tenant_id  # Join on tenant_id (UUID) instead of id (Integer)
-        ).filter(
-            Deployment.deployment_id == deployment_id
-        ).first()
+        query = _filter_history(
+            db.query(DeploymentHistory).filter(DeploymentHistory.deployment_id == deployment.id),
+            status_filter, level, since
+        )
         
-        if not result:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Deployment with ID {deployment_id} not found"
+        # Keyset pagination on (created_at, id), newest first
+        if cursor:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            query = query.filter(
+                tuple_(DeploymentHistory.created_at, DeploymentHistory.id) < tuple_(cursor_created_at, cursor_id)
             )
+        query = query.order_by(DeploymentHistory.created_at.desc(), DeploymentHistory.id.desc())
         
-        deployment, template, environment, tenant = result
-        
-        
-        # Get logs from deployment_history table
-        logs = db.query(DeploymentHistory).filter(
-            DeploymentHistory.deployment_id == deployment.id
-        ).order_by(DeploymentHistory.created_at.desc()).all()
+        if limit:
+            logs = query.limit(limit + 1).all()
+            if len(logs) > limit:
+                logs = logs[:limit]
+                response.headers["X-Next-Cursor"] = encode_cursor(logs[-1].created_at, logs[-1].id)
+        else:
+            logs = query.all()
+        
+        # Snapshots are rebuilt by replaying every entry up to the newest one on this page
+        snapshots = {}
+        if include_snapshot and logs:
+            newest = logs[0]
+            history = db.query(DeploymentHistory).filter(
+                DeploymentHistory.deployment_id == deployment.id,
+                tuple_(DeploymentHistory.created_at, DeploymentHistory.id) <= tuple_(newest.created_at, newest.id)
+            ).order_by(DeploymentHistory.created_at, DeploymentHistory.id).all()
+            snapshots = {entry.id: snapshot for entry, snapshot in zip(history, rebuild_snapshots(history))}
         
         # Format logs for response
         formatted_logs = []
         for log in logs:
-            formatted_logs.append({
-                "id": log.id,
-                "status": log.status,
-                "message": log.message,
-                "details": log.details,
-                "timestamp": log.created_at.isoformat(),
-                "user_id": log.user_id
-            })
+            formatted_log = _format_history_entry(log)
+            if include_snapshot:
+                formatted_log["snapshot"] = snapshots.get(log.id)
+            formatted_logs.append(formatted_log)
         
         return formatted_logs
     
@@ -1341,3 +1470,73 @@ def get_deployment_logs(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error retrieving deployment logs: {str(e)}"
         )
+
+@router.get("/{deployment_id}/logs/stream", tags=["deployments"])
+def stream_deployment_logs(
+    deployment_id: str,
+    status_filter: Optional[str] = Query(None, alias="status", description="Only entries with this status"),
+    level: Optional[str] = Query(None, description="Only entries of this level: error, warning or info"),
+    since: Optional[int] = Query(None, description="Only entries newer than this history entry ID"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> StreamingResponse:
+    """
+    Stream new deployment history entries as server-sent events
+    
+    Each event carries one formatted entry with the history entry ID as the event ID,
+    so a reconnecting client resumes through the Last-Event-ID header. Entries written
+    by this backend process are pushed as soon as they are committed; entries written
+    elsewhere are picked up on the next keep-alive interval. The stream ends with an
+    "end" event once the deployment reaches a terminal status, or after
+    LOG_STREAM_MAX_DURATION seconds.
+    """
+    try:
+        deployment = _get_deployment_for_logs(db, deployment_id, current_user)
+        deployment_pk = deployment.id
+        
+        if last_event_id and last_event_id.isdigit():
+            since = int(last_event_id)
+        
+        # Validate the filters before the stream starts
+        _filter_history(select(DeploymentHistory), status_filter, level, since)
+    finally:
+        # The request session would otherwise be held until the stream ends
+        db.close()
+    
+    async def generate():
+        last_id = since or 0
+        version = None
+        deadline = time.monotonic() + LOG_STREAM_MAX_DURATION
+        
+        while time.monotonic() < deadline:
+            version = await wait_for_history(deployment_id, version, LOG_STREAM_KEEPALIVE)
+            
+            # Each check uses its own session, so the stream holds a connection only while querying
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    _filter_history(
+                        select(DeploymentHistory).filter(DeploymentHistory.deployment_id == deployment_pk),
+                        status_filter, level, last_id
+                    ).order_by(DeploymentHistory.id).limit(LOG_STREAM_BATCH_SIZE)
+                )
+                logs = result.scalars().all()
+                current_status = await session.scalar(
+                    select(Deployment.status).filter(Deployment.id == deployment_pk)
+                )
+            
+            for log in logs:
+                last_id = log.id
+                yield f"id: {log.id}\ndata: {json.dumps(_format_history_entry(log), default=str)}\n\n"
+            
+            if len(logs) == LOG_STREAM_BATCH_SIZE:
+                continue
+            
+            if current_status in TERMINAL_STATUSES:
+                yield f"event: end\ndata: {json.dumps({'status': current_status})}\n\n"
+                return
+            
+            if not logs:
+                yield ": keep-alive\n\n"
+    
+    return StreamingResponse(generate(), media_type="text/event-stream")
@@ -1,9 +1,13 @@
 from typing import Any, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 
 from app.api.endpoints.auth import get_current_user
+from app.api.deps import get_current_user_async
 from app.db.session import get_db
+from app.db.async_session import get_async_db
 from app.models.user import User, Tenant
 from app.models.deployment import Environment, CloudAccount
 from app.schemas.deployment import EnvironmentResponse, EnvironmentCreate, EnvironmentUpdate, CloudAccountResponse
@@ -19,10 +23,10 @@ router = APIRouter()
 
 
 @router.get("/", response_model=List[EnvironmentResponse])
-def get_environments(
+async def get_environments(
     tenant_id: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """
     Get all environments for the current user's tenant or a specific tenant
@@ -44,18 +48,22 @@ def get_environments(
     try:
         # If no tenant_id is provided, use the user's tenant
         if not tenant_id:
-            tenant_id = current_user.tenant.tenant_id
+            tenant_id = current_user.get_primary_tenant_id()
         
         # Check if tenant exists
-        tenant = db.query(Tenant).filter(Tenant.tenant_id == tenant_id).first()
+        tenant = (await db.execute(select(Tenant.id).where(Tenant.tenant_id == tenant_id))).first()
         if not tenant:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Tenant with ID {tenant_id} not found"
             )
         
-        # Get all environments for the tenant
-        environments = db.query(Environment).filter(Environment.tenant_id == tenant_id).all()
+        # Get all environments for the tenant, with their cloud accounts in one extra query
+        environments = (await db.execute(
+            select(Environment).where(Environment.tenant_id == tenant_id).options(
+                selectinload(Environment.cloud_accounts)
+            )
+        )).scalars().all()
         
         # Format response
         result = []
@@ -0,0 +1,35 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, status
+
+from app.api.endpoints.auth import get_current_user
+from app.models.user import User
+from app.db.session import engine
+from app.db.async_session import async_engine
+from shared.db_pool import get_pool_stats
+from app.core.tenant_utils import is_admin_or_msp
+from app.core.access_cache import user_access_cache
+from app.services.widget_data_service import widget_aggregate_cache
+
+router = APIRouter()
+
+
+@router.get("/")
+def get_metrics(
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Get API runtime metrics, including database connection pool telemetry
+    """
+    if not is_admin_or_msp(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    return {
+        "db_pool": get_pool_stats(engine),
+        "async_db_pool": get_pool_stats(async_engine.sync_engine),
+        "user_access_cache": user_access_cache.stats(),
+        "widget_aggregate_cache": widget_aggregate_cache.stats()
+    }
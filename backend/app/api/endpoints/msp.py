@@ -6,7 +6,7 @@ global management capabilities across all tenants.
 """
 
 from typing import Any, List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 import uuid
 
@@ -16,8 +16,10 @@ from app.models.user import User, Tenant, Role
 from app.models.user_tenant_assignment import UserTenantAssignment
 from app.schemas.user import UserCreate, UserUpdate, UserResponse
 from app.core.security import get_password_hash
+from app.core.access_cache import user_access_cache
 from app.core.permissions import has_global_permission
 from app.core.tenant_utils import get_user_role_name_in_tenant
+from app.services import platform_analytics_service
 
 router = APIRouter()
 
@@ -132,15 +134,17 @@ def create_msp_user(
         db.add(new_user)
         db.flush()  # Get the user ID
         
-        # Create tenant assignments for all tenants
-        all_tenants = db.query(Tenant).filter(Tenant.is_active == True).all()
-        for i, tenant in enumerate(all_tenants):
+        # A single wildcard assignment gives the MSP role in all tenants;
+        # the first active tenant is the user's home (primary) tenant
+        home_tenant = db.query(Tenant.tenant_id).filter(Tenant.is_active == True).order_by(Tenant.id).first()
+        if home_tenant:
             msp_assignment = UserTenantAssignment(
-                user_id=new_user.user_id,
-                tenant_id=tenant.tenant_id,
+                user_id=new_user.id,  # Use integer primary key instead of UUID
+                tenant_id=home_tenant.tenant_id,
                 role_id=msp_role.id,
-                is_primary=(i == 0),  # First tenant is primary
-                is_active=True
+                is_primary=True,
+                is_active=True,
+                applies_to_all_tenants=True
             )
             db.add(msp_assignment)
         
@@ -259,6 +263,7 @@ def update_msp_user(
             )
         
         db.commit()
+        user_access_cache.invalidate_user(user.id)
         db.refresh(user)
         
         return UserResponse(
@@ -340,8 +345,10 @@ def delete_msp_user(
             db.delete(dashboard)
         
         # Delete user
+        user_pk = user.id
         db.delete(user)
         db.commit()
+        user_access_cache.invalidate_user(user_pk)
         
         return {"message": "MSP user deleted successfully"}
     
@@ -380,20 +387,17 @@ def get_all_tenants(
     try:
         tenants = db.query(Tenant).filter(Tenant.is_active == True).all()
         
+        # Count users of all tenants (excluding MSP users) in one query
+        user_counts = platform_analytics_service.count_tenant_users(db, [tenant.tenant_id for tenant in tenants])
+        
         result = []
         for tenant in tenants:
-            # Count users in this tenant (excluding MSP users)
-            user_count = db.query(UserTenantAssignment).filter(
-                UserTenantAssignment.tenant_id == tenant.tenant_id,
-                UserTenantAssignment.is_active == True
-            ).join(User).filter(User.is_msp_user == False).count()
-            
             result.append({
                 "id": tenant.tenant_id,
                 "name": tenant.name,
                 "description": tenant.description,
                 "is_active": tenant.is_active,
-                "user_count": user_count,
+                "user_count": user_counts.get(tenant.tenant_id, 0),
                 "date_created": tenant.date_created.isoformat() if tenant.date_created else None,
                 "date_modified": tenant.date_modified.isoformat() if tenant.date_modified else None
             })
@@ -409,11 +413,15 @@ def get_all_tenants(
 
 @router.get("/analytics/platform", response_model=dict)
 def get_platform_analytics(
+    days: Optional[int] = Query(None, ge=1, le=3650, description="Limit deployment counts and growth to the last days"),
+    refresh: bool = Query(False, description="Compute the analytics now instead of reading the latest snapshot"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> Any:
     """
     Get platform-wide analytics. Only accessible to MSP users.
+    
+    Analytics for the configured time ranges are served from snapshots refreshed in the background.
     """
     # Check if user is MSP and has permission
     if not current_user.is_msp_user:
@@ -429,44 +437,7 @@ def get_platform_analytics(
         )
     
     try:
-        # Get basic counts
-        total_tenants = db.query(Tenant).filter(Tenant.is_active == True).count()
-        total_users = db.query(User).filter(User.is_msp_user == False).count()
-        total_msp_users = db.query(User).filter(User.is_msp_user == True).count()
-        
-        # Get user distribution by role
-        role_distribution = {}
-        roles = db.query(Role).all()
-        for role in roles:
-            # Count users with this role through tenant assignments
-            count = db.query(UserTenantAssignment).filter(
-                UserTenantAssignment.role_id == role.id,
-                UserTenantAssignment.is_active == True
-            ).join(User).filter(User.is_msp_user == False).count()
-            role_distribution[role.name] = count
-        
-        # Get tenant user counts
-        tenant_stats = []
-        tenants = db.query(Tenant).filter(Tenant.is_active == True).all()
-        for tenant in tenants:
-            user_count = db.query(UserTenantAssignment).filter(
-                UserTenantAssignment.tenant_id == tenant.tenant_id,
-                UserTenantAssignment.is_active == True
-            ).join(User).filter(User.is_msp_user == False).count()
-            
-            tenant_stats.append({
-                "tenant_id": tenant.tenant_id,
-                "tenant_name": tenant.name,
-                "user_count": user_count
-            })
-        
-        return {
-            "total_tenants": total_tenants,
-            "total_users": total_users,
-            "total_msp_users": total_msp_users,
-            "role_distribution": role_distribution,
-            "tenant_stats": tenant_stats
-        }
+        return platform_analytics_service.get_platform_analytics(db, days, refresh)
     
     except Exception as e:
         raise HTTPException(
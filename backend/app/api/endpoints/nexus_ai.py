@@ -7,6 +7,7 @@ from datetime import datetime
 
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Request
 from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 import requests
 from sqlalchemy.orm import Session
@@ -206,7 +207,7 @@ async def chat(
         
         # Send the request to Azure OpenAI
         start_time = time.time()
-        response = requests.post(azure_url, headers=headers, json=payload)
+        response = await run_in_threadpool(requests.post, azure_url, headers=headers, json=payload)
         end_time = time.time()
         
         add_log(f"Request completed in {end_time - start_time:.2f} seconds")
@@ -581,7 +582,7 @@ async def get_status(
         }
         
         # Send the request to Azure OpenAI
-        response = requests.post(azure_url, headers=headers, json=payload)
+        response = await run_in_threadpool(requests.post, azure_url, headers=headers, json=payload)
         
         # Check if the request was successful
         if response.status_code != 200:
@@ -7,6 +7,8 @@ from app.api.endpoints.auth import get_current_user
 from app.db.session import get_db
 from app.models.user import Permission, User, Role
 from app.schemas.permission import PermissionResponse, PermissionCreate
+from app.core.access_cache import user_access_cache
+from app.core.permission_index import permission_index
 from app.core.tenant_utils import (
     resolve_tenant_context,
     get_user_role_name_in_tenant,
@@ -103,6 +105,9 @@ def create_permission(
         
         db.add(new_permission)
         db.commit()
+        # Roles gained a permission, so compiled role masks and access maps are stale
+        permission_index.invalidate_roles()
+        user_access_cache.clear()
         db.refresh(new_permission)
         
         return PermissionResponse(
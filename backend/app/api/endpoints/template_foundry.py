@@ -9,7 +9,7 @@ from app.models.template_foundry import TemplateFoundry
 from app.models.template_foundry_versions import TemplateFoundryVersion
 from app.schemas.template_foundry import (
     TemplateFoundryResponse, TemplateFoundryCreate, TemplateFoundryUpdate,
-    TemplateFoundryVersionCreate, TemplateFoundryVersionResponse
+    TemplateFoundryVersionCreate, TemplateFoundryVersionResponse, TemplateFoundryVersionCodeResponse
 )
 from app.core.tenant_utils import (
     resolve_tenant_context,
@@ -17,6 +17,7 @@ from app.core.tenant_utils import (
     user_has_admin_or_msp_role,
     user_has_any_permission
 )
+from app.services.code_blob_service import latest_code_digest, load_code, store_code
 
 router = APIRouter()
 
@@ -201,7 +202,7 @@ def create_template(
         initial_version = TemplateFoundryVersion(
             version=template.version,
             changes="Initial version",
-            code=template.code,
+            code_digest=store_code(db, template.code),
             template_id=new_template.id,
             created_by_id=current_user.id
         )
@@ -299,7 +300,7 @@ def update_template(
             new_version = TemplateFoundryVersion(
                 version=template.version,
                 changes=f"Updated to version {template.version}",
-                code=template.code,
+                code_digest=store_code(db, template.code, latest_code_digest(db, TemplateFoundryVersion, template.id)),
                 template_id=template.id,
                 created_by_id=current_user.id
             )
@@ -416,7 +417,7 @@ def create_template_version(
         new_version = TemplateFoundryVersion(
             version=version.version,
             changes=version.changes,
-            code=version.code,
+            code_digest=store_code(db, version.code, latest_code_digest(db, TemplateFoundryVersion, template.id)),
             template_id=template.id,
             created_by_id=current_user.id
         )
@@ -497,6 +498,67 @@ def get_template_versions(
         )
 
 
+@router.get("/{template_id}/versions/{version_id}", response_model=TemplateFoundryVersionCodeResponse)
+def get_template_version(
+    template_id: str,
+    version_id: int,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    Get a specific version of a template, with its code
+    """
+    # Check if user has permission to view templates
+    has_permission = user_has_any_permission(current_user, ["list:template-foundry"], current_user.tenant_id)
+    if not has_permission:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    try:
+        # Get the template
+        template = db.query(TemplateFoundry).filter(TemplateFoundry.template_id == template_id).first()
+        
+        if not template:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Template with ID {template_id} not found"
+            )
+        
+        # Check if user has access to this template's tenant
+        if template.tenant_id != current_user.tenant_id:
+            # Admin users can view all templates
+            if not user_has_admin_or_msp_role(current_user, template.tenant_id):
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="Not authorized to access this template"
+                )
+        
+        version = db.query(TemplateFoundryVersion).filter(
+            TemplateFoundryVersion.template_id == template.id,
+            TemplateFoundryVersion.id == version_id
+        ).first()
+        
+        if not version:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Template version with ID {version_id} not found"
+            )
+        
+        response = TemplateFoundryVersionCodeResponse.model_validate(version)
+        response.code = load_code(db, version.code_digest)
+        return response
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error retrieving template version: {str(e)}"
+        )
+
+
 @router.options("/")
 def options_templates():
     """
@@ -1,24 +1,32 @@
 from typing import Any, List, Optional, Dict
-from fastapi import APIRouter, Depends, HTTPException, status, Response, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Request, Response, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select, tuple_
+import hashlib
 import uuid
 import logging
 from datetime import datetime
 
-from app.api.deps import get_db, get_current_user
+from app.api.deps import get_db, get_current_user, get_current_user_async
+from app.db.async_session import get_async_db
 from app.models.user import User, Tenant
 from app.models.deployment import Template, Deployment, TemplateVersion
 from app.schemas.deployment import (
     TemplateResponse, TemplateCreate, TemplateUpdate,
     CloudTemplateResponse, TemplateVersionCreate, TemplateVersionResponse
 )
+from app.core.utils import encode_cursor, decode_cursor, parse_if_none_match
 from app.core.tenant_utils import (
     resolve_tenant_context,
     get_user_role_name_in_tenant,
     user_has_admin_or_msp_role,
     user_has_any_permission
 )
+from app.services.widget_data_service import TenantAggregates, invalidate_widget_data
+from app.services.tenant_stats_service import TenantStatDeltas, count_templates_by_category
+from app.services.code_blob_service import latest_code_digest, load_code, store_code
+from app.services.template_compile_service import precompile_template
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -31,6 +39,10 @@ def get_template_categories(
 ):
     """
     Get all available template.category with their template counts
+    
+    A tenant's counts are read from the tenant_stats rollup through the widget
+    aggregate cache, which template changes invalidate. Without a tenant scope the
+    categories of all templates are counted in SQL.
     """
     try:
         # Check if user has permission to view templates or catalog
@@ -41,9 +53,6 @@ def get_template_categories(
                 detail="Not enough permissions"
             )
 
-        # Get templates that the user has access to
-        query = db.query(Template)
-
         # Handle tenant filtering
         if tenant_id:
             # Check if user has access to the specified tenant
@@ -62,48 +71,51 @@ def get_template_categories(
                         detail="Not authorized to view templates for this tenant"
                     )
 
-            # Only return templates that belong to the specified tenant
-            query = query.filter(Template.tenant_id == tenant.tenant_id)
+            # Only count templates that belong to the specified tenant
+            scope_tenant_id = tenant.tenant_id
         else:
             # No tenant specified, default to user's primary tenant
-            primary_tenant_id = current_user.get_primary_tenant_id()
-            if primary_tenant_id:
-                query = query.filter(Template.tenant_id == primary_tenant_id)
-
-        templates = query.all()
-
-        # Aggregate categories and count templates
-        category_counts = {}
-        for template in templates:
-            if template.category and isinstance(template.category, list):
-                for category in template.category:
-                    if category.strip():  # Only count non-empty categories
-                        category_counts[category.strip()] = category_counts.get(category.strip(), 0) + 1
+            scope_tenant_id = current_user.get_primary_tenant_id()
 
-        return category_counts
+        if scope_tenant_id:
+            return TenantAggregates(db, scope_tenant_id).template_category_counts()
+        return count_templates_by_category(db)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error retrieving template.category: {str(e)}"
         )
 
+# Large fields of the template list that can be left out through ?fields= or ?include_code=false
+TEMPLATE_LIST_OPTIONAL_FIELDS = {"code", "parameters", "variables"}
+
 @router.get("/", response_model=List[CloudTemplateResponse])
-def get_templates(
+async def get_templates(
+    request: Request,
+    response: Response,
     tenant_id: Optional[str] = Query(None, description="Filter by tenant ID"),
     group_by_category: Optional[bool] = Query(False, description="Group templates by categories"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    include_code: bool = Query(True, description="Include each template's code"),
+    fields: Optional[str] = Query(None, description="Comma-separated large fields to include: code, parameters, variables (default: all)"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Page size; all templates are returned when omitted"),
+    cursor: Optional[str] = Query(None, description="Cursor from the X-Next-Cursor header of the previous page"),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """
     Get all templates for the current user's tenant or a specific tenant
-    """
-    # Add CORS headers
-    response = Response()
-    response.headers["Access-Control-Allow-Origin"] = "*"
-    response.headers["Access-Control-Allow-Methods"] = "GET, OPTIONS"
-    response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
     
+    Templates are returned newest first. When limit is given and more templates exist,
+    the cursor for the next page is returned in the X-Next-Cursor header. Catalog pages
+    can leave out the code (include_code=false) or pick the large fields they need (fields).
+    
+    Responses carry an ETag derived from the templates' latest update, their number and
+    their deployments; a request whose If-None-Match matches is answered with 304
+    without loading the templates.
+    """
     # Check if user has permission to view templates or catalog
     has_permission = user_has_any_permission(current_user, ["list:templates", "list:catalog"], tenant_id)
     if not has_permission:
@@ -112,13 +124,22 @@ def get_templates(
             detail="Not enough permissions"
         )
     
+    if fields is not None:
+        requested_fields = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown_fields = requested_fields - TEMPLATE_LIST_OPTIONAL_FIELDS
+        if unknown_fields:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown fields: {', '.join(sorted(unknown_fields))}"
+            )
+    else:
+        requested_fields = set(TEMPLATE_LIST_OPTIONAL_FIELDS)
+    if not include_code:
+        requested_fields.discard("code")
+    
     try:
-        # Get templates that the user has access to
-        query = db.query(Template)
-        
-        # Get user's primary tenant for default filtering
-        
         # Filter by tenant if specified
+        scope = []
         if tenant_id:
             # Handle different tenant ID formats
             try:
@@ -129,12 +150,12 @@ def get_templates(
                 # Try to parse as UUID
                 try:
                     uuid_obj = uuid.UUID(tenant_id)
-                    tenant = db.query(Tenant).filter(Tenant.tenant_id == str(uuid_obj)).first()
+                    tenant = (await db.execute(select(Tenant).where(Tenant.tenant_id == str(uuid_obj)))).scalars().first()
                 except ValueError:
                     # Not a valid UUID, try to find by numeric ID
                     try:
                         id_value = int(tenant_id)
-                        tenant = db.query(Tenant).filter(Tenant.id == id_value).first()
+                        tenant = (await db.execute(select(Tenant).where(Tenant.id == id_value))).scalars().first()
                     except (ValueError, TypeError):
                         tenant = None
                 
@@ -152,7 +173,7 @@ def get_templates(
                     )
                 
                 # Only return templates that belong to the specified tenant
-                query = query.filter(Template.tenant_id == tenant.tenant_id)
+                scope.append(Template.tenant_id == tenant.tenant_id)
             except Exception as e:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -162,71 +183,108 @@ def get_templates(
             # No tenant specified, default to user's primary tenant
             primary_tenant_id = current_user.get_primary_tenant_id()
             if primary_tenant_id:
-                query = query.filter(Template.tenant_id == primary_tenant_id)
-
-        templates = query.all()
-        
-        # Get deployment counts for each template
-        template_ids = [template.id for template in templates]
-        deployment_counts = {}
-        if template_ids:
-            counts = db.query(
-                Deployment.template_id,
-                func.count(Deployment.id).label("count")
-            ).filter(
-                Deployment.template_id.in_(template_ids)
-            ).group_by(
-                Deployment.template_id
-            ).all()
-            
-            deployment_counts = {template_id: count for template_id, count in counts}
+                scope.append(Template.tenant_id == primary_tenant_id)
+        
+        # Answer conditional requests from the catalog's version before loading it
+        scoped_template_ids = select(Template.id).where(*scope)
+        version = (await db.execute(
+            select(
+                func.max(Template.updated_at),
+                func.count(Template.id),
+                select(func.count(Deployment.id))
+                .where(Deployment.template_id.in_(scoped_template_ids))
+                .scalar_subquery()
+            ).where(*scope)
+        )).one()
+        etag_source = "|".join(str(part) for part in (
+            *version, current_user.id, sorted(requested_fields), limit, cursor
+        ))
+        etag = '"' + hashlib.sha256(etag_source.encode()).hexdigest()[:32] + '"'
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "private, no-cache"
+        client_etags = parse_if_none_match(request.headers.get("if-none-match", ""))
+        if etag in client_etags or "*" in client_etags:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=dict(response.headers))
+        
+        # Project only the columns the list needs, with deployment counts joined in the same statement
+        deployment_counts = (
+            select(Deployment.template_id, func.count(Deployment.id).label("deployment_count"))
+            .where(Deployment.template_id.in_(scoped_template_ids))
+            .group_by(Deployment.template_id)
+            .subquery()
+        )
+        columns = [
+            Template.id,
+            Template.template_id,
+            Template.name,
+            Template.description,
+            Template.type,
+            Template.provider,
+            Template.category,
+            Template.is_public,
+            Template.current_version,
+            Template.tenant_id,
+            Template.created_at,
+            Template.updated_at,
+            func.coalesce(deployment_counts.c.deployment_count, 0).label("deployment_count")
+        ]
+        for field in sorted(requested_fields):
+            columns.append(getattr(Template, field))
+        
+        query = select(*columns).outerjoin(
+            deployment_counts, deployment_counts.c.template_id == Template.id
+        ).where(*scope)
+        
+        # Keyset pagination on (created_at, id), newest first
+        if cursor:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            query = query.where(
+                tuple_(Template.created_at, Template.id) < tuple_(cursor_created_at, cursor_id)
+            )
+        query = query.order_by(Template.created_at.desc(), Template.id.desc())
+        
+        if limit:
+            rows = (await db.execute(query.limit(limit + 1))).all()
+            if len(rows) > limit:
+                rows = rows[:limit]
+                response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
+        else:
+            rows = (await db.execute(query)).all()
+        
+        # The last user who updated the template
+        last_updated_by = current_user.full_name or current_user.username
         
         # Convert to frontend-compatible format
         result = []
-        for template in templates:
-            # Get tenant ID for the template
-            tenant_id = "public"
-            if template.tenant_id:
-                tenant = db.query(Tenant).filter(Tenant.tenant_id == template.tenant_id).first()
-                if tenant:
-                    tenant_id = tenant.tenant_id
-            
-            # Get the template's code
-            template_code = template.code or ""
-            
-            # Get deployment count
-            deployment_count = deployment_counts.get(template.id, 0)
-            
+        for row in rows:
             # Convert category to categories list
-            categories = []
-            if template.category:
-                categories = template.category if isinstance(template.category, list) else []
-            
-            # Get the last user who updated the template
-            last_updated_by = current_user.full_name or current_user.username
+            categories = row.category if isinstance(row.category, list) else []
             
             result.append(CloudTemplateResponse(
-                id=template.template_id,
-                template_id=template.template_id,  # Explicitly include template_id
-                name=template.name,
-                description=template.description or "",
-                type=template.type,  # Use the actual template type from the database
-                provider=template.provider,
-                code=template_code,
-                deploymentCount=deployment_count,
-                uploadedAt=template.created_at.isoformat() if hasattr(template, 'created_at') else "",
-                updatedAt=template.updated_at.isoformat() if hasattr(template, 'updated_at') else "",
+                id=row.template_id,
+                template_id=row.template_id,  # Explicitly include template_id
+                name=row.name,
+                description=row.description or "",
+                type=row.type,  # Use the actual template type from the database
+                provider=row.provider,
+                code=(row.code or "") if "code" in requested_fields else "",
+                deploymentCount=row.deployment_count,
+                uploadedAt=row.created_at.isoformat() if row.created_at else "",
+                updatedAt=row.updated_at.isoformat() if row.updated_at else "",
                 categories=categories,
-                isPublic=template.is_public,
-                currentVersion=template.current_version,
-                parameters=template.parameters,
-                variables=template.variables,
-                tenantId=tenant_id,
+                isPublic=row.is_public,
+                currentVersion=row.current_version,
+                parameters=row.parameters if "parameters" in requested_fields else None,
+                variables=row.variables if "variables" in requested_fields else None,
+                # The foreign key guarantees the tenant exists
+                tenantId=row.tenant_id or "public",
                 lastUpdatedBy=last_updated_by
             ))
         
         return result
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -292,12 +350,8 @@ def get_template(
         code = template.code or ""
         
         # If no code in the template, try to get it from the latest version
-        if not code and template.versions:
-            # Sort versions by created_at in descending order
-            sorted_versions = sorted(template.versions, key=lambda v: v.created_at, reverse=True)
-            if sorted_versions:
-                latest_version = sorted_versions[0]
-                code = latest_version.code or ""
+        if not code:
+            code = load_code(db, latest_code_digest(db, TemplateVersion, template.id)) or ""
         
         # Get the last user who updated the template
         last_updated_by = current_user.full_name or current_user.username
@@ -334,6 +388,7 @@ def get_template(
 @router.post("/", response_model=CloudTemplateResponse)
 def create_template(
     template: TemplateCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
     tenant_id: Optional[str] = None
@@ -415,6 +470,7 @@ def create_template(
         logger.debug(f"New template object: type={new_template.type}, category={new_template.category}")
         
         db.add(new_template)
+        TenantStatDeltas().template(new_template.tenant_id, new_template.provider, new_template.category).apply(db)
         db.commit()
         db.refresh(new_template)
         
@@ -426,7 +482,7 @@ def create_template(
         initial_version = TemplateVersion(
             template_id=new_template.id,
             version="1.0.0",
-            code=template.code,
+            code_digest=store_code(db, template.code),
             changes="Initial version",
             created_at=datetime.utcnow(),
             created_by_id=current_user.id
@@ -434,6 +490,11 @@ def create_template(
         
         db.add(initial_version)
         db.commit()
+        invalidate_widget_data(new_template.tenant_id)
+        background_tasks.add_task(
+            precompile_template, new_template.template_id, new_template.current_version,
+            new_template.type, new_template.code, current_user.access_token
+        )
         
         # Get tenant ID for the template
         tenant_id = "public"
@@ -480,6 +541,7 @@ def create_template(
 def update_template(
     template_id: str,
     template_update: TemplateUpdate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> Any:
@@ -524,6 +586,11 @@ def update_template(
             template.description = template_update.description
         
         if template_update.provider is not None:
+            TenantStatDeltas().template(
+                template.tenant_id, template.provider, sign=-1
+            ).template(
+                template.tenant_id, template_update.provider
+            ).apply(db)
             template.provider = template_update.provider
         
         if template_update.type is not None:
@@ -533,6 +600,11 @@ def update_template(
             template.is_public = template_update.is_public
         
         if template_update.categories is not None:
+            TenantStatDeltas().template_categories(
+                template.tenant_id, template.category, sign=-1
+            ).template_categories(
+                template.tenant_id, template_update.categories
+            ).apply(db)
             template.category = template_update.categories
         
         if template_update.parameters is not None:
@@ -566,7 +638,7 @@ def update_template(
                 new_version = TemplateVersion(
                     template_id=template.id,
                     version=new_version_number,
-                    code=template_update.code,
+                    code_digest=store_code(db, template_update.code, latest_code_digest(db, TemplateVersion, template.id)),
                     changes="Updated template code",
                     created_at=datetime.utcnow(),
                     created_by_id=current_user.id
@@ -581,6 +653,12 @@ def update_template(
         
         db.commit()
         db.refresh(template)
+        invalidate_widget_data(template.tenant_id)
+        if template_update.code is not None:
+            background_tasks.add_task(
+                precompile_template, template.template_id, template.current_version,
+                template.type, template.code, current_user.access_token
+            )
         
         # Get tenant ID for the template
         tenant_id = "public"
@@ -683,8 +761,11 @@ def delete_template(
         db.query(TemplateVersion).filter(TemplateVersion.template_id == template.id).delete()
         
         # Delete template
+        template_tenant_id = template.tenant_id
+        TenantStatDeltas().template(template_tenant_id, template.provider, template.category, sign=-1).apply(db)
         db.delete(template)
         db.commit()
+        invalidate_widget_data(template_tenant_id)
         
         return Response(status_code=status.HTTP_204_NO_CONTENT)
     
@@ -736,22 +817,28 @@ def get_template_versions(
                         detail="Not authorized to access this template"
                     )
         
-        # Get all versions
-        versions = db.query(TemplateVersion).filter(TemplateVersion.template_id == template.id).all()
-        
-        # Sort versions by created_at in descending order
-        versions = sorted(versions, key=lambda v: v.created_at, reverse=True)
+        # Get all versions with their authors, newest first, without their code
+        versions = db.query(
+            TemplateVersion.id,
+            TemplateVersion.version,
+            TemplateVersion.changes,
+            TemplateVersion.created_at,
+            User.username.label("created_by")
+        ).outerjoin(
+            User, User.id == TemplateVersion.created_by_id
+        ).filter(
+            TemplateVersion.template_id == template.id
+        ).order_by(TemplateVersion.created_at.desc(), TemplateVersion.id.desc()).all()
         
         # Convert to response format
         result = []
         for version in versions:
-            created_by = db.query(User).filter(User.id == version.created_by_id).first()
             result.append({
                 "id": version.id,
                 "version": version.version,
                 "changes": version.changes,
                 "created_at": version.created_at.isoformat(),
-                "created_by": created_by.username if created_by else "Unknown",
+                "created_by": version.created_by or "Unknown",
                 "is_current": version.version == template.current_version
             })
         
@@ -770,6 +857,7 @@ def get_template_versions(
 def create_template_version(
     template_id: str,
     version: TemplateVersionCreate,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ) -> Any:
@@ -828,7 +916,7 @@ def create_template_version(
         new_version = TemplateVersion(
             template_id=template.id,
             version=new_version_number,
-            code=version.code,
+            code_digest=store_code(db, version.code, latest_code_digest(db, TemplateVersion, template.id)),
             changes=version.commit_message or f"Updated to version {new_version_number}",
             created_at=datetime.utcnow(),
             created_by_id=current_user.id
@@ -843,6 +931,10 @@ def create_template_version(
         
         db.commit()
         db.refresh(new_version)
+        background_tasks.add_task(
+            precompile_template, template.template_id, new_version_number,
+            template.type, version.code, current_user.access_token
+        )
         
         # Get created_by user
         created_by = db.query(User).filter(User.id == new_version.created_by_id).first()
@@ -924,7 +1016,7 @@ def get_template_version(
             "id": version.id,
             "version": version.version,
             "changes": version.changes,
-            "code": version.code,
+            "code": load_code(db, version.code_digest),
             "created_at": version.created_at.isoformat(),
             "created_by": created_by.username if created_by else "Unknown",
             "is_current": version.version == template.current_version
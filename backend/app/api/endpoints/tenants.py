@@ -10,6 +10,7 @@ from app.db.session import get_db
 from app.models.user import Tenant, User
 from app.schemas.tenant import TenantResponse, TenantCreate, TenantUpdate
 from app.core.permissions import get_user_accessible_tenants
+from app.core.access_cache import user_access_cache, active_tenants_cache
 from app.core.tenant_utils import (
     resolve_tenant_context,
     get_user_role_name_in_tenant,
@@ -168,6 +169,9 @@ def create_tenant(
         
         db.add(new_tenant)
         db.commit()
+        active_tenants_cache.invalidate()
+        # All-tenants assignments apply in the new tenant too
+        user_access_cache.clear()
         db.refresh(new_tenant)
         
         return TenantResponse(
@@ -221,6 +225,7 @@ def update_tenant(
         tenant.date_modified = datetime.datetime.utcnow()
         
         db.commit()
+        active_tenants_cache.invalidate()
         db.refresh(tenant)
         
         return TenantResponse(
@@ -317,6 +322,8 @@ def delete_tenant(
         # Delete tenant
         db.delete(tenant)
         db.commit()
+        active_tenants_cache.invalidate()
+        user_access_cache.clear()
         
         return Response(status_code=status.HTTP_204_NO_CONTENT)
     
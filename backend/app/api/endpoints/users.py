@@ -9,6 +9,7 @@ from app.models.user import User, Tenant, Role
 from app.models.user_tenant_assignment import UserTenantAssignment
 from app.schemas.user import UserCreate, UserUpdate, UserResponse, TenantAssignmentCreate, TenantAssignmentResponse
 from app.core.security import get_password_hash
+from app.core.access_cache import user_access_cache
 from app.core.permissions import (
     has_permission_in_tenant, 
     get_user_accessible_tenants,
@@ -373,15 +374,17 @@ def create_user(
                             )
                             db.add(additional_assignment)
         else:
-            # MSP users get assignments to all tenants
-            all_tenants = db.query(Tenant).filter(Tenant.is_active == True).all()
-            for i, tenant in enumerate(all_tenants):
+            # MSP users get a single wildcard assignment covering all tenants,
+            # anchored to the first active tenant as their primary tenant
+            home_tenant = db.query(Tenant.tenant_id).filter(Tenant.is_active == True).order_by(Tenant.id).first()
+            if home_tenant:
                 msp_assignment = UserTenantAssignment(
                     user_id=new_user.id,  # Use integer primary key instead of UUID
-                    tenant_id=tenant.tenant_id,
+                    tenant_id=home_tenant.tenant_id,
                     role_id=role.id,
-                    is_primary=(i == 0),  # First tenant is primary
-                    is_active=True
+                    is_primary=True,
+                    is_active=True,
+                    applies_to_all_tenants=True
                 )
                 db.add(msp_assignment)
         
@@ -488,10 +491,28 @@ def update_user(
             assignment_tenant_ids = [assignment.tenant_id for assignment in user_update.tenant_assignments]
             validate_admin_tenant_assignment_permission(current_user, assignment_tenant_ids, db)
             
-            # Remove existing assignments
+            # An all-tenants assignment carries over to the new assignment with the same
+            # tenant and role; one the update does not list again is kept as it is
+            wildcard_assignments = db.query(UserTenantAssignment).filter(
+                UserTenantAssignment.user_id == user.id,
+                UserTenantAssignment.applies_to_all_tenants == True
+            ).all()
+            listed = {(assignment.tenant_id, assignment.role_id) for assignment in user_update.tenant_assignments}
+            wildcard_keys = set()
+            for wildcard_assignment in wildcard_assignments:
+                key = (wildcard_assignment.tenant_id, wildcard_assignment.role_id)
+                if key in listed:
+                    wildcard_keys.add(key)
+                    db.delete(wildcard_assignment)
+                elif any(assignment.is_primary for assignment in user_update.tenant_assignments):
+                    wildcard_assignment.is_primary = False
+            
+            # Remove the other existing assignments
             db.query(UserTenantAssignment).filter(
-                UserTenantAssignment.user_id == user.id
+                UserTenantAssignment.user_id == user.id,
+                UserTenantAssignment.applies_to_all_tenants == False
             ).delete()
+            db.flush()
             
             # Create new assignments
             for assignment in user_update.tenant_assignments:
@@ -510,6 +531,7 @@ def update_user(
                     role_id=assignment.role_id,
                     is_primary=assignment.is_primary,
                     is_active=True,
+                    applies_to_all_tenants=(assignment.tenant_id, assignment.role_id) in wildcard_keys,
                     # SSO_FUTURE: Preserve provisioning information during updates
                     provisioned_via="manual",  # Manual updates always marked as manual
                     external_group_id=assignment.external_group_id,
@@ -526,6 +548,7 @@ def update_user(
             ensure_single_primary_tenant(user.id, user_update.tenant_id, db)
         
         db.commit()
+        user_access_cache.invalidate_user(user.id)
         db.refresh(user)
         
         # Convert role object to role name
@@ -623,8 +646,10 @@ def delete_user(
         ).delete()
         
         # Delete the user
+        user_pk = user.id
         db.delete(user)
         db.commit()
+        user_access_cache.invalidate_user(user_pk)
         
         return {"message": f"User {user_id} deleted successfully"}
         
@@ -1,154 +1,184 @@
 from typing import Any, Dict, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from datetime import datetime, timedelta
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.session import get_db
+from app.db.async_session import get_async_db
 from app.api.endpoints.auth import get_current_user
-from app.models.user import User, Tenant
-from app.models.deployment import Deployment, CloudAccount, Template
-from app.models.cloud_settings import CloudSettings
-from app.schemas.dashboard import WidgetDataRequest, WidgetDataResponse
+from app.api.deps import get_current_user_async
+from app.models.user import User
+from app.schemas.dashboard import (
+    WidgetDataRequest, WidgetDataResponse,
+    WidgetDataBatchRequest, WidgetDataBatchItem, WidgetDataBatchResponse
+)
+from app.services.widget_data_service import TenantAggregates
 
 router = APIRouter()
 
 
 @router.post("/data", response_model=WidgetDataResponse)
-def get_widget_data(
+async def get_widget_data(
     request: WidgetDataRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get data for a specific widget"""
     
-    # Use tenant from request or current user's tenant
-    tenant_id = request.tenant_id or current_user.tenant_id
+    # The widget queries run on the async connection without occupying a threadpool thread
+    return await db.run_sync(lambda session: _get_widget_data(request, current_user, session))
+
+
+@router.post("/data/batch", response_model=WidgetDataBatchResponse)
+async def get_widget_data_batch(
+    batch: WidgetDataBatchRequest,
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get data for many widgets at once, e.g. every widget on a dashboard.
     
+    Widgets of the same tenant share their aggregate queries. A widget that fails is
+    reported with an error in its own result without failing the others.
+    """
+    return await db.run_sync(lambda session: _get_widget_data_batch(batch, current_user, session))
+
+
+def _get_widget_data(request: WidgetDataRequest, current_user: User, db: Session) -> WidgetDataResponse:
+    """Resolve a widget data request against a synchronous session"""
     try:
-        if request.data_source == "/api/deployments/stats":
-            data = get_deployment_stats(db, tenant_id, request.config)
-        elif request.data_source == "/api/cloud-accounts/stats":
-            data = get_cloud_account_stats(db, tenant_id, request.config)
-        elif request.data_source == "/api/templates/stats":
-            data = get_template_stats(db, tenant_id, request.config)
-        elif request.data_source == "/api/deployments/by-provider":
-            data = get_deployments_by_provider(db, tenant_id, request.config)
-        elif request.data_source == "/api/deployments/status-overview":
-            data = get_deployment_status_overview(db, tenant_id, request.config)
-        elif request.data_source == "/api/deployments/timeline":
-            data = get_deployment_timeline(db, tenant_id, request.config)
-        elif request.data_source == "/api/deployments/recent":
-            data = get_recent_deployments(db, tenant_id, request.config)
-        elif request.data_source == "/api/cloud-accounts/status":
-            data = get_cloud_account_status(db, tenant_id, request.config)
-        elif request.data_source == "/api/getting-started/status":
-            data = get_getting_started_status(db, tenant_id, request.config)
-        elif request.data_source == "static":
-            data = get_static_widget_data(request.config)
-        elif request.widget_type == "cloud_accounts_status":
-            accounts = db.query(CloudAccount).filter(
-                CloudAccount.tenant_id == current_user.tenant.tenant_id
-            ).all()
-            
-            account_data = []
-            for account in accounts:
-                account_data.append({
-                    "id": account.account_id,  # Use account_id instead of cloud_account_id
-                    "name": account.name,
-                    "provider": account.provider,
-                    "status": account.status,
-                    "description": account.description
-                })
-            
-            return WidgetDataResponse(
+        return _resolve_widget_data(request, current_user, db, {})
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching widget data: {str(e)}"
+        )
+
+
+def _get_widget_data_batch(batch: WidgetDataBatchRequest, current_user: User, db: Session) -> WidgetDataBatchResponse:
+    """Resolve widget data requests against a synchronous session, sharing aggregates per tenant"""
+    aggregates_by_tenant: Dict[str, TenantAggregates] = {}
+    results = []
+    for request in batch.requests:
+        try:
+            response = _resolve_widget_data(request, current_user, db, aggregates_by_tenant)
+            results.append(WidgetDataBatchItem(**response.model_dump()))
+        except HTTPException as e:
+            results.append(WidgetDataBatchItem(widget_type=request.widget_type, error=str(e.detail)))
+        except Exception as e:
+            results.append(WidgetDataBatchItem(
                 widget_type=request.widget_type,
-                data={"accounts": account_data},
-                last_updated=datetime.utcnow()
-            )
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Unknown data source: {request.data_source}"
-            )
+                error=f"Error fetching widget data: {str(e)}"
+            ))
+    return WidgetDataBatchResponse(results=results)
+
+
+def _resolve_widget_data(
+    request: WidgetDataRequest,
+    current_user: User,
+    db: Session,
+    aggregates_by_tenant: Dict[str, TenantAggregates]
+) -> WidgetDataResponse:
+    """
+    Build the data for one widget.
+    
+    Args:
+        request: The widget data request
+        current_user: The user the data is for
+        db: Database session
+        aggregates_by_tenant: Aggregates already read in this request, by tenant ID
         
+    Returns:
+        The widget data, with the age of the cached aggregates it was built from
+    """
+    if request.data_source == "static":
         return WidgetDataResponse(
             widget_type=request.widget_type,
-            data=data,
+            data=get_static_widget_data(request.config),
             last_updated=datetime.utcnow()
         )
     
-    except Exception as e:
+    widget_data = WIDGET_DATA_SOURCES.get(request.data_source)
+    if widget_data is not None:
+        # Use tenant from request or current user's tenant
+        tenant_id = request.tenant_id or current_user.tenant_id
+    elif request.widget_type == "cloud_accounts_status":
+        widget_data = get_cloud_account_status
+        tenant_id = current_user.tenant_id
+    else:
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error fetching widget data: {str(e)}"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown data source: {request.data_source}"
         )
+    
+    if tenant_id and not current_user.has_tenant_access(tenant_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have access to this tenant"
+        )
+    
+    aggregates = aggregates_by_tenant.get(tenant_id)
+    if aggregates is None:
+        aggregates = aggregates_by_tenant[tenant_id] = TenantAggregates(db, tenant_id)
+    
+    aggregates.begin_widget()
+    data = widget_data(aggregates, request.config)
+    
+    now = datetime.utcnow()
+    computed_at = aggregates.oldest_computed_at or now
+    return WidgetDataResponse(
+        widget_type=request.widget_type,
+        data=data,
+        last_updated=computed_at,
+        cache_age_seconds=round((now - computed_at).total_seconds(), 3)
+    )
 
 
-def get_deployment_stats(db: Session, tenant_id: str, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+def get_deployment_stats(aggregates: TenantAggregates, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """Get deployment statistics for widgets"""
     
-    # Base query for deployments in the tenant
-    base_query = db.query(Deployment).filter(Deployment.tenant_id == tenant_id)
+    status_counts = aggregates.deployment_status_counts()
     
     # Apply filters if specified in config
     filter_type = config.get("filter", "") if config else ""
     if filter_type == "status:running":
-        query = base_query.filter(Deployment.status == "running")
+        count = status_counts.get("running", 0)
     elif filter_type == "status:failed":
-        query = base_query.filter(Deployment.status == "failed")
+        count = status_counts.get("failed", 0)
     elif filter_type == "status:completed":
-        query = base_query.filter(Deployment.status == "completed")
+        count = status_counts.get("completed", 0)
     else:
-        query = base_query
-    
-    count = query.count()
+        count = sum(status_counts.values())
     
     return {"count": count}
 
 
-def get_cloud_account_stats(db: Session, tenant_id: str, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+def get_cloud_account_stats(aggregates: TenantAggregates, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """Get cloud account statistics for count widgets"""
     
-    query = db.query(CloudAccount).filter(CloudAccount.tenant_id == tenant_id)
-    total_count = query.count()
-    
-    return {"count": total_count}
+    return {"count": aggregates.cloud_account_count()}
 
 
-def get_template_stats(db: Session, tenant_id: str, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+def get_template_stats(aggregates: TenantAggregates, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """Get template statistics"""
     
-    query = db.query(Template).filter(Template.tenant_id == tenant_id)
-    total_count = query.count()
-    
     # Get provider breakdown
-    provider_counts = db.query(
-        Template.provider,
-        func.count(Template.id)
-    ).filter(Template.tenant_id == tenant_id).group_by(Template.provider).all()
+    provider_counts = aggregates.template_provider_counts()
     
     return {
-        "total": total_count,
-        "provider_breakdown": {provider: count for provider, count in provider_counts}
+        "total": sum(provider_counts.values()),
+        "provider_breakdown": dict(provider_counts)
     }
 
 
-def get_deployments_by_provider(db: Session, tenant_id: str, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+def get_deployments_by_provider(aggregates: TenantAggregates, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """Get deployment distribution by cloud provider"""
     
-    # Get deployments with their environment and cloud account relationships
-    deployments = db.query(Deployment).filter(
-        Deployment.tenant_id == tenant_id
-    ).all()
-    
-    provider_counts = {}
-    for deployment in deployments:
-        provider = "unknown"
-        if deployment.environment and deployment.environment.cloud_accounts:
-            provider = deployment.environment.cloud_accounts[0].provider
-        
-        provider_counts[provider] = provider_counts.get(provider, 0) + 1
+    provider_counts = aggregates.deployment_provider_counts()
     
     # Format for chart visualization
     chart_data = [
@@ -158,50 +188,37 @@ def get_deployments_by_provider(db: Session, tenant_id: str, config: Optional[Di
     
     return {
         "chart_data": chart_data,
-        "provider_counts": provider_counts
+        "provider_counts": dict(provider_counts)
     }
 
 
-def get_deployment_status_overview(db: Session, tenant_id: str, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+def get_deployment_status_overview(aggregates: TenantAggregates, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """Get deployment status distribution"""
     
-    status_counts = db.query(
-        Deployment.status,
-        func.count(Deployment.id)
-    ).filter(Deployment.tenant_id == tenant_id).group_by(Deployment.status).all()
+    status_counts = aggregates.deployment_status_counts()
     
     return {
         "chart_data": [
             {"name": status.title(), "value": count}
-            for status, count in status_counts
+            for status, count in status_counts.items()
         ],
-        "total": sum(count for _, count in status_counts)
+        "total": sum(status_counts.values())
     }
 
 
-def get_deployment_timeline(db: Session, tenant_id: str, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+def get_deployment_timeline(aggregates: TenantAggregates, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """Get deployment activity timeline"""
     
     # Default to 30 days
     time_range = config.get("time_range", "30d") if config else "30d"
     days = int(time_range.replace("d", ""))
     
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    # Get deployments created in the time range, grouped by date
-    deployments = db.query(
-        func.date(Deployment.created_at).label("date"),
-        func.count(Deployment.id).label("count")
-    ).filter(
-        and_(
-            Deployment.tenant_id == tenant_id,
-            Deployment.created_at >= start_date
-        )
-    ).group_by(func.date(Deployment.created_at)).order_by("date").all()
+    # Deployments created in the time range, grouped by date
+    deployments = aggregates.deployment_timeline(days)
     
     return {
         "chart_data": [
-            {"date": str(date), "deployments": count}
+            {"date": date, "deployments": count}
             for date, count in deployments
         ],
         "time_range": time_range,
@@ -209,79 +226,29 @@ def get_deployment_timeline(db: Session, tenant_id: str, config: Optional[Dict[s
     }
 
 
-def get_recent_deployments(db: Session, tenant_id: str, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+def get_recent_deployments(aggregates: TenantAggregates, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """Get recent deployments for status widgets"""
     
     limit = config.get("limit", 5) if config else 5
     
-    # Get recent deployments with environment and cloud account info
-    deployments = db.query(Deployment).filter(
-        Deployment.tenant_id == tenant_id
-    ).order_by(Deployment.created_at.desc()).limit(limit).all()
-    
-    deployment_data = []
-    for deployment in deployments:
-        # Get provider from environment's cloud accounts
-        provider = "unknown"
-        if deployment.environment and deployment.environment.cloud_accounts:
-            provider = deployment.environment.cloud_accounts[0].provider
-        
-        deployment_data.append({
-            "id": deployment.deployment_id,
-            "name": deployment.name,
-            "status": deployment.status,
-            "environment": deployment.environment.name if deployment.environment else "Unknown",
-            "provider": provider,
-            "created_at": deployment.created_at.isoformat() if deployment.created_at else None
-        })
-    
-    return {"deployments": deployment_data}
+    return {"deployments": [dict(deployment) for deployment in aggregates.recent_deployments(limit)]}
 
 
-def get_cloud_account_status(db: Session, tenant_id: str, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+def get_cloud_account_status(aggregates: TenantAggregates, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """Get cloud account status information for status widgets"""
     
-    accounts = db.query(CloudAccount).filter(
-        CloudAccount.tenant_id == tenant_id
-    ).all()
-    
-    account_data = []
-    for account in accounts:
-        account_data.append({
-            "id": account.account_id,  # Use account_id instead of cloud_account_id
-            "name": account.name,
-            "provider": account.provider,
-            "status": account.status,
-            "description": account.description
-        })
-    
-    return {"accounts": account_data}
+    return {"accounts": [dict(account) for account in aggregates.cloud_accounts()]}
 
 
-def get_getting_started_status(db: Session, tenant_id: str, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+def get_getting_started_status(aggregates: TenantAggregates, config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
     """Get getting started status information for status widgets"""
     
-    # Check if cloud settings are configured
-    cloud_settings_count = db.query(func.count(CloudSettings.id)).filter(
-        CloudSettings.tenant_id == tenant_id,
-        CloudSettings.is_active == True
-    ).scalar() or 0
-    
-    # Check if cloud accounts are configured
-    cloud_accounts_count = db.query(func.count(CloudAccount.id)).filter(
-        CloudAccount.tenant_id == tenant_id
-    ).scalar() or 0
-    
-    # Check if environments are configured
-    from app.models.deployment import Environment
-    environments_count = db.query(func.count(Environment.id)).filter(
-        Environment.tenant_id == tenant_id
-    ).scalar() or 0
-    
-    # Check if templates are configured
-    templates_count = db.query(func.count(Template.id)).filter(
-        Template.tenant_id == tenant_id
-    ).scalar() or 0
+    # Count configured cloud settings, cloud accounts, environments and templates
+    setup_counts = aggregates.setup_counts()
+    cloud_settings_count = setup_counts["cloud_settings"] or 0
+    cloud_accounts_count = setup_counts["cloud_accounts"] or 0
+    environments_count = setup_counts["environments"] or 0
+    templates_count = setup_counts["templates"] or 0
     
     # Define the tasks and their completion status
     tasks = [
@@ -355,3 +322,17 @@ def get_static_widget_data(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
             "content": config.get("content", "Static content"),
             "type": "static"
         }
+
+
+# Widget data sources (other than "static"), by data_source identifier
+WIDGET_DATA_SOURCES = {
+    "/api/deployments/stats": get_deployment_stats,
+    "/api/cloud-accounts/stats": get_cloud_account_stats,
+    "/api/templates/stats": get_template_stats,
+    "/api/deployments/by-provider": get_deployments_by_provider,
+    "/api/deployments/status-overview": get_deployment_status_overview,
+    "/api/deployments/timeline": get_deployment_timeline,
+    "/api/deployments/recent": get_recent_deployments,
+    "/api/cloud-accounts/status": get_cloud_account_status,
+    "/api/getting-started/status": get_getting_started_status
+}
@@ -0,0 +1,343 @@
+"""
+Compiled user access maps, and short-lived caches for them, for the list of
+active tenants MSP users can access and for session bootstrap ETags.
+
+Resolving a user's role and permissions in a tenant walks tenant_assignments ->
+role -> permissions. The helpers in tenant_utils do this several times per request,
+so the result is compiled once into an immutable UserAccess and cached per token.
+Permissions are held as masks from the permission index.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Iterable, List, Mapping, NamedTuple, Optional, Set
+
+from sqlalchemy.orm import object_session
+
+from app.core.config import settings
+from app.core.permission_index import permission_index
+
+# Roles whose permissions count towards an MSP user's global permissions
+GLOBAL_PERMISSION_ROLES = ("admin", "msp")
+
+
+class TenantAccess(NamedTuple):
+    role: Optional[str]
+    mask: int
+
+    @property
+    def permissions(self) -> FrozenSet[str]:
+        return permission_index.names(self.mask)
+
+
+NO_ACCESS = TenantAccess(None, 0)
+
+
+@dataclass(frozen=True)
+class UserAccess:
+    """
+    A user's roles and permissions, resolved for every tenant they are assigned to.
+
+    Attributes:
+        user_id: The user's internal ID
+        is_msp_user: Whether the user is an MSP user
+        tenants: Role and permissions per tenant, from active assignments
+        primary_tenant_id: Tenant of the active primary assignment, if any
+        default: Role and permissions used when no tenant is given
+        global_mask: Permissions from admin/msp assignments, for global permission checks
+        wildcard: Role and permissions from an all-tenants assignment, used in tenants
+            without an assignment of their own
+        wildcard_tenants: Active tenants the all-tenants assignment applies in
+    """
+    user_id: int
+    is_msp_user: bool
+    tenants: Mapping[str, TenantAccess]
+    primary_tenant_id: Optional[str]
+    default: TenantAccess
+    global_mask: int = 0
+    wildcard: Optional[TenantAccess] = None
+    wildcard_tenants: FrozenSet[str] = frozenset()
+
+    def for_tenant(self, tenant_id: Optional[str] = None) -> TenantAccess:
+        """Get the role and permissions in a tenant (or the default when tenant_id is None)."""
+        if not tenant_id:
+            return self.default
+        access = self.tenants.get(tenant_id)
+        if access is None:
+            access = self.wildcard if self._wildcard_applies(tenant_id) else NO_ACCESS
+        return access
+
+    def _wildcard_applies(self, tenant_id: str) -> bool:
+        return self.wildcard is not None and tenant_id in self.wildcard_tenants
+
+    def has_tenant_access(self, tenant_id: str) -> bool:
+        """Check if the user has access to a tenant."""
+        return self.is_msp_user or tenant_id in self.tenants or self._wildcard_applies(tenant_id)
+
+    def has_any_permission(self, mask: int, tenant_id: Optional[str] = None) -> bool:
+        """Check if the user holds any permission of a mask in a tenant."""
+        return bool(self.for_tenant(tenant_id).mask & mask)
+
+    def tenants_with_permission(self, mask: int, tenant_ids: Iterable[str]) -> Dict[str, bool]:
+        """Check a permission mask across many tenants at once."""
+        return {tenant_id: bool(self.for_tenant(tenant_id).mask & mask) for tenant_id in tenant_ids}
+
+
+def _assignment_access(assignment) -> TenantAccess:
+    role = assignment.role
+    if not role:
+        return NO_ACCESS
+    return TenantAccess(role.name, permission_index.role_mask(role))
+
+
+def compile_user_access(user, active_tenant_ids: Optional[Iterable[str]] = None) -> UserAccess:
+    """
+    Compile a user's tenant assignments into a UserAccess.
+
+    Resolution follows get_user_role_in_tenant and get_user_permissions_in_tenant: the
+    first active assignment for a tenant wins, and without a tenant MSP users resolve to
+    their MSP assignment, other users to their primary (or first) active assignment.
+    An all-tenants assignment of an MSP user applies in every other active tenant.
+
+    Args:
+        user: The user, with its tenant assignments and their roles
+        active_tenant_ids: IDs of the active tenants; loaded through the user's session
+            when not given and the user has an all-tenants assignment
+    """
+    active = user.get_tenant_assignments()
+
+    tenants: Dict[str, TenantAccess] = {}
+    wildcard = None
+    for assignment in active:
+        if assignment.tenant_id not in tenants:
+            tenants[assignment.tenant_id] = _assignment_access(assignment)
+        if wildcard is None and assignment.applies_to_all_tenants and user.is_msp_user:
+            wildcard = _assignment_access(assignment)
+
+    primary = next((assignment for assignment in active if assignment.is_primary), None)
+
+    default = None
+    if user.is_msp_user:
+        msp_assignment = next(
+            (assignment for assignment in active if assignment.role and assignment.role.name == "msp"),
+            None
+        )
+        if msp_assignment:
+            default = _assignment_access(msp_assignment)
+    if default is None and primary and primary.role:
+        default = _assignment_access(primary)
+    if default is None:
+        fallback = next((assignment for assignment in active if assignment.role), None)
+        default = _assignment_access(fallback) if fallback else NO_ACCESS
+
+    wildcard_tenants = frozenset()
+    if wildcard is not None:
+        if active_tenant_ids is None:
+            from app.core.permissions import get_active_tenant_ids
+            session = object_session(user)
+            active_tenant_ids = get_active_tenant_ids(session) if session is not None else []
+        wildcard_tenants = frozenset(active_tenant_ids)
+
+    global_mask = 0
+    for access in [*tenants.values(), wildcard or NO_ACCESS]:
+        if access.role in GLOBAL_PERMISSION_ROLES:
+            global_mask |= access.mask
+
+    return UserAccess(
+        user_id=user.id,
+        is_msp_user=bool(user.is_msp_user),
+        tenants=MappingProxyType(tenants),
+        primary_tenant_id=primary.tenant_id if primary else None,
+        default=default,
+        global_mask=global_mask,
+        wildcard=wildcard,
+        wildcard_tenants=wildcard_tenants
+    )
+
+
+def get_user_access(user) -> UserAccess:
+    """
+    Get the compiled access for a user.
+
+    The authenticated user carries the access resolved by get_current_user; any other
+    user (e.g. the target of a user update) is compiled from its current assignments.
+    """
+    access = getattr(user, "resolved_access", None)
+    if access is None:
+        access = compile_user_access(user)
+    return access
+
+
+class UserAccessCache:
+    """
+    Caches compiled UserAccess by (token subject, token issued-at) for a short TTL.
+
+    The cache is per process, so changes made through another process become visible
+    after at most ttl seconds; changes made through this process invalidate it directly.
+    """
+
+    def __init__(self, ttl: int, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: Dict[Hashable, Any] = {}  # key -> (UserAccess, expires monotonic time)
+        self._keys_by_user: Dict[int, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[UserAccess]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                access, expires = entry
+                if time.monotonic() < expires:
+                    self._hits += 1
+                    return access
+                self._remove(key)
+            self._misses += 1
+            return None
+
+    def put(self, key: Hashable, access: UserAccess):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if len(self._entries) >= self.max_size and key not in self._entries:
+                # Drop the entry closest to expiry
+                self._remove(min(self._entries, key=lambda k: self._entries[k][1]))
+            self._entries[key] = (access, time.monotonic() + self.ttl)
+            self._keys_by_user.setdefault(access.user_id, set()).add(key)
+
+    def invalidate_user(self, user_id: int):
+        """Drop all cached access for a user (by internal ID)."""
+        with self._lock:
+            for key in self._keys_by_user.pop(user_id, set()):
+                self._entries.pop(key, None)
+            self._invalidations += 1
+
+    def clear(self):
+        """Drop all cached access, e.g. after role permissions change."""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+            self._invalidations += 1
+
+    @property
+    def version(self) -> int:
+        """Counter that changes whenever cached access is invalidated."""
+        return self._invalidations
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "invalidations": self._invalidations
+            }
+
+    def _remove(self, key: Hashable):
+        access, _ = self._entries.pop(key)
+        keys = self._keys_by_user.get(access.user_id)
+        if keys:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[access.user_id]
+
+
+class ActiveTenantsCache:
+    """
+    Caches the IDs of all active tenants, which MSP users can access, for a short TTL.
+
+    Tenant changes made through this process invalidate it directly; other processes
+    see them after at most ttl seconds.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._tenant_ids: Optional[List[str]] = None
+        self._expires = 0.0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, load: Callable[[], List[str]]) -> List[str]:
+        """
+        Get the active tenant IDs, calling load() to query them when not cached.
+        """
+        with self._lock:
+            if self._tenant_ids is not None and time.monotonic() < self._expires:
+                return list(self._tenant_ids)
+            generation = self._generation
+
+        tenant_ids = load()
+        with self._lock:
+            # Don't store a list loaded before a concurrent invalidation
+            if self.ttl > 0 and generation == self._generation:
+                self._tenant_ids = list(tenant_ids)
+                self._expires = time.monotonic() + self.ttl
+        return tenant_ids
+
+    def invalidate(self):
+        """Drop the cached tenant IDs, e.g. after a tenant is created or removed."""
+        with self._lock:
+            self._tenant_ids = None
+            self._generation += 1
+
+    @property
+    def version(self) -> int:
+        """Counter that changes whenever the tenant list is invalidated."""
+        return self._generation
+
+
+class BootstrapETagCache:
+    """
+    Remembers the ETag of the last session bootstrap response per token for a short
+    TTL, so conditional requests can be answered without touching the database.
+
+    Entries are ignored once user access or the active tenant list has been
+    invalidated; other data in the response (such as counts) may be up to ttl
+    seconds old when a 304 is returned.
+    """
+
+    def __init__(self, ttl: int, max_size: int, access_cache: UserAccessCache, tenants_cache: ActiveTenantsCache):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._access_cache = access_cache
+        self._tenants_cache = tenants_cache
+        self._entries: Dict[Hashable, Any] = {}  # key -> (etag, expires monotonic time, versions)
+        self._lock = threading.Lock()
+
+    def _versions(self):
+        return (self._access_cache.version, self._tenants_cache.version)
+
+    def get(self, key: Hashable) -> Optional[str]:
+        """Get the current ETag for a token, if it is still valid."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            etag, expires, versions = entry
+            if time.monotonic() >= expires or versions != self._versions():
+                del self._entries[key]
+                return None
+            return etag
+
+    def put(self, key: Hashable, etag: str):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if len(self._entries) >= self.max_size and key not in self._entries:
+                # Drop the oldest entry
+                del self._entries[next(iter(self._entries))]
+            self._entries[key] = (etag, time.monotonic() + self.ttl, self._versions())
+
+
+user_access_cache = UserAccessCache(settings.USER_ACCESS_CACHE_TTL, settings.USER_ACCESS_CACHE_SIZE)
+active_tenants_cache = ActiveTenantsCache(settings.ACTIVE_TENANTS_CACHE_TTL)
+bootstrap_etag_cache = BootstrapETagCache(
+    settings.BOOTSTRAP_ETAG_TTL, settings.USER_ACCESS_CACHE_SIZE, user_access_cache, active_tenants_cache
+)
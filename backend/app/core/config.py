@@ -13,6 +13,28 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 days
     
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12  # stored hashes with another cost are rehashed on login
+    PASSWORD_HASH_WORKERS: int = 0  # threads for bcrypt work; 0 uses one per CPU core
+    PASSWORD_HASH_MAX_PENDING: int = 64  # logins queued for verification before 503s
+    
+    # Compiled user access (roles and permissions) cache
+    USER_ACCESS_CACHE_TTL: int = 30  # seconds; 0 disables caching
+    USER_ACCESS_CACHE_SIZE: int = 4096
+    ACTIVE_TENANTS_CACHE_TTL: int = 60  # seconds; 0 disables caching
+    ROLE_MASK_TTL: int = 60  # seconds a compiled role permission mask is used before it is recompiled; 0 recompiles on every use
+    BOOTSTRAP_ETAG_TTL: int = 60  # seconds a bootstrap ETag is honoured without a database check
+    
+    # Dashboard widget aggregates cache
+    WIDGET_DATA_CACHE_TTL: int = 30  # seconds; 0 disables caching
+    
+    # MSP platform analytics snapshots
+    PLATFORM_ANALYTICS_REFRESH_SECONDS: int = 300  # snapshot refresh interval; 0 disables snapshots
+    PLATFORM_ANALYTICS_SNAPSHOT_RANGES: List[int] = [0, 30]  # time ranges in days kept as snapshots; 0 is all time
+    
+    # Template version code storage
+    CODE_BLOB_MAX_DELTA_DEPTH: int = 10  # deltas read to rebuild a version's code at most; 0 stores every version in full
+    
     # Database Settings
     POSTGRES_SERVER: str = "localhost"
     POSTGRES_PORT: str = "5432"
@@ -20,6 +42,15 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: str = "cmppassword"
     POSTGRES_DB: str = "cmpdb"
     
+    # Database Connection Pool Settings
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # seconds to wait for a connection
+    DB_POOL_RECYCLE: int = 1800  # seconds; -1 disables recycling
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # 0 disables the statement timeout
+    DB_PGBOUNCER_MODE: bool = False  # no server-side session state, for PgBouncer transaction pooling
+    
     # Azure OpenAI Settings
     AZURE_OPENAI_API_KEY: Optional[str] = None
     AZURE_OPENAI_ENDPOINT: Optional[str] = None
@@ -42,6 +73,11 @@ class Settings(BaseSettings):
     def SQLALCHEMY_DATABASE_URI(self) -> str:
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
     
+    # Async Database URL (asyncpg driver)
+    @property
+    def SQLALCHEMY_ASYNC_DATABASE_URI(self) -> str:
+        return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+    
     class Config:
         case_sensitive = True
         env_file = ".env"
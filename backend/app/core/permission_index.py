@@ -0,0 +1,124 @@
+"""
+Bit index of permissions and compiled role permission masks.
+
+Every known permission is given a bit, so a role's permissions compile to a single
+integer and permission checks become mask ANDs instead of scans over name lists.
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import settings
+from app.core.permissions import GLOBAL_PERMISSIONS, TENANT_SCOPED_PERMISSIONS
+from app.models.user import Permission, Role
+
+logger = logging.getLogger(__name__)
+
+
+class PermissionIndex:
+    """
+    Registry assigning a bit to each permission name and a mask to each role.
+
+    Permissions declared in GLOBAL_PERMISSIONS and TENANT_SCOPED_PERMISSIONS get their
+    bits at import time; permissions only found in the permissions table get theirs
+    when load() runs at startup, or when they are first seen on a role afterwards.
+
+    Role masks are kept for role_mask_ttl seconds, so role permission changes made
+    through another process (or by scripts such as init_db) are picked up after at
+    most that long; changes made through this process call invalidate_roles().
+    """
+
+    def __init__(self, permission_names: Iterable[str] = (), role_mask_ttl: int = 0):
+        self.role_mask_ttl = role_mask_ttl
+        self._lock = threading.Lock()
+        self._bits: Dict[str, int] = {}
+        self._role_masks: Dict[int, Tuple[int, float]] = {}  # role ID -> (mask, expires monotonic time)
+        self._names_by_mask: Dict[int, FrozenSet[str]] = {}
+        for name in sorted(permission_names):
+            self._allocate(name)
+
+    def _allocate(self, name: str) -> int:
+        bit = self._bits.get(name)
+        if bit is None:
+            bit = 1 << len(self._bits)
+            self._bits[name] = bit
+        return bit
+
+    def bit(self, name: str) -> int:
+        """Get the bit of a permission (0 for permissions no role can hold)."""
+        return self._bits.get(name, 0)
+
+    def mask(self, names: Iterable[str]) -> int:
+        """Get the mask of a set of permissions, ignoring unknown names."""
+        bits = self._bits
+        result = 0
+        for name in names:
+            result |= bits.get(name, 0)
+        return result
+
+    def compile(self, names: Iterable[str]) -> int:
+        """Get the mask of a set of permissions, registering unknown names."""
+        with self._lock:
+            result = 0
+            for name in names:
+                result |= self._allocate(name)
+            return result
+
+    def names(self, mask: int) -> FrozenSet[str]:
+        """Get the permission names in a mask."""
+        names = self._names_by_mask.get(mask)
+        if names is None:
+            names = frozenset(name for name, bit in list(self._bits.items()) if mask & bit)
+            self._names_by_mask[mask] = names
+        return names
+
+    def role_mask(self, role: Optional[Role]) -> int:
+        """
+        Get the compiled mask of a role.
+
+        Masks are answered from the registry until they expire; roles not compiled
+        yet, or whose mask expired, are compiled from role.permissions.
+        """
+        if role is None:
+            return 0
+        entry = self._role_masks.get(role.id)
+        if entry is not None and time.monotonic() < entry[1]:
+            return entry[0]
+        mask = self.compile(permission.name for permission in role.permissions)
+        self._role_masks[role.id] = (mask, time.monotonic() + self.role_mask_ttl)
+        return mask
+
+    def load(self, db: Session):
+        """
+        Register all permissions in the database and compile every role's mask.
+
+        Args:
+            db: Database session
+        """
+        permission_names = [name for (name,) in db.query(Permission.name).order_by(Permission.id)]
+        roles = db.query(Role).options(selectinload(Role.permissions)).all()
+
+        with self._lock:
+            for name in permission_names:
+                self._allocate(name)
+        expires = time.monotonic() + self.role_mask_ttl
+        role_masks = {
+            role.id: (self.compile(permission.name for permission in role.permissions), expires)
+            for role in roles
+        }
+        with self._lock:
+            self._role_masks = role_masks
+
+        logger.info(f"Permission index loaded: {len(self._bits)} permissions, {len(role_masks)} roles")
+
+    def invalidate_roles(self):
+        """Forget compiled role masks, e.g. after permissions were assigned to roles."""
+        with self._lock:
+            self._role_masks = {}
+
+
+permission_index = PermissionIndex(GLOBAL_PERMISSIONS | TENANT_SCOPED_PERMISSIONS, settings.ROLE_MASK_TTL)
@@ -181,20 +181,12 @@ def has_global_permission(user: User, permission_name: str) -> bool:
         return False
     
     # Check if user has the global permission through any of their tenant assignments
-    # MSP users typically have admin/msp roles that include global permissions
-    from app.core.tenant_utils import get_user_role_in_tenant
-    
-    # For MSP users, check if they have admin/msp role in any tenant
-    for assignment in user.get_tenant_assignments():
-        role_name = get_user_role_in_tenant(user, assignment.tenant_id)
-        if role_name in ["admin", "msp"]:
-            # Get role permissions from the assignment
-            if assignment.role and assignment.role.permissions:
-                user_permissions = {p.name for p in assignment.role.permissions}
-                if permission_name in user_permissions:
-                    return True
+    # MSP users typically have admin/msp roles that include global permissions; their
+    # permissions are compiled into a single mask when the user's access is resolved
+    from app.core.access_cache import get_user_access
+    from app.core.permission_index import permission_index
     
-    return False
+    return bool(get_user_access(user).global_mask & permission_index.bit(permission_name))
 
 
 def get_user_permissions_in_tenant(user: User, tenant_id: str) -> Set[str]:
@@ -233,9 +225,7 @@ def get_user_accessible_tenants(user: User, db: Session) -> List[str]:
     """
     # MSP users have access to all tenants
     if user.is_msp_user:
-        from app.models.user import Tenant
-        all_tenants = db.query(Tenant).filter(Tenant.is_active == True).all()
-        return [tenant.tenant_id for tenant in all_tenants]
+        return get_active_tenant_ids(db)
     
     # Regular users only have access to their assigned tenants
     accessible_tenants = []
@@ -245,6 +235,27 @@ def get_user_accessible_tenants(user: User, db: Session) -> List[str]:
     return accessible_tenants
 
 
+def get_active_tenant_ids(db: Session) -> List[str]:
+    """
+    Get the IDs of all active tenants, from the active tenants cache when possible.
+    
+    Args:
+        db: Database session
+        
+    Returns:
+        List[str]: Active tenant IDs
+    """
+    from app.core.access_cache import active_tenants_cache
+    from app.models.user import Tenant
+    
+    return active_tenants_cache.get(
+        lambda: [
+            tenant_id for (tenant_id,) in
+            db.query(Tenant.tenant_id).filter(Tenant.is_active == True).order_by(Tenant.id)
+        ]
+    )
+
+
 def can_user_switch_to_tenant(user: User, tenant_id: str) -> bool:
     """
     Check if a user can switch to a specific tenant.
@@ -1,14 +1,34 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Optional, Union
+from typing import Any, Optional, Tuple, Union
 
+from fastapi import HTTPException, status
 from jose import jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.models.user import User
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes whose cost differs from BCRYPT_ROUNDS (in either direction) need an update
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+)
+
+# bcrypt releases the GIL while hashing, so a dedicated thread pool verifies passwords
+# in parallel across cores without tying up the request threadpool
+PASSWORD_HASH_WORKERS = settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_password_pending = 0
+_password_pending_lock = threading.Lock()
 
 
 def create_access_token(
@@ -24,7 +44,7 @@ def create_access_token(
             minutes=settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES
         )
     
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode = {"exp": expire, "iat": datetime.utcnow(), "sub": str(subject)}
     encoded_jwt = jwt.encode(
         to_encode, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM
     )
@@ -38,6 +58,43 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password and rehash it if the stored hash uses another cost factor
+    
+    Returns:
+        Tuple of whether the password matched and the new hash to store, if any
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Run verify_and_update_password on the password hashing executor
+    
+    Raises:
+        HTTPException: 503 if PASSWORD_HASH_MAX_PENDING verifications are already queued
+    """
+    global _password_pending
+    with _password_pending_lock:
+        if _password_pending >= settings.PASSWORD_HASH_MAX_PENDING:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many logins in progress, please retry",
+                headers={"Retry-After": "1"}
+            )
+        _password_pending += 1
+    
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            _password_executor, verify_and_update_password, plain_password, hashed_password
+        )
+    finally:
+        with _password_pending_lock:
+            _password_pending -= 1
+
+
 def get_password_hash(password: str) -> str:
     """
     Hash a password
@@ -45,14 +102,24 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
     """
     Authenticate a user
+    
+    The password is verified on the password hashing executor. A hash stored with a
+    cost factor other than BCRYPT_ROUNDS is replaced after a successful login.
     """
-    user = db.query(User).filter(User.email == email).first()
-    if not user:
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalars().first()
+    if not user or not user.hashed_password:
         return None
-    if not verify_password(password, user.hashed_password):
+    
+    verified, new_hash = await verify_and_update_password_async(password, user.hashed_password)
+    if not verified:
         return None
+    
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
@@ -5,12 +5,14 @@ This module provides helper functions to resolve user roles and permissions
 in a multi-tenant context, replacing direct access to user.role.
 """
 
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from app.models.user import User, Tenant
 from app.models.user_tenant_assignment import UserTenantAssignment
-from app.core.permissions import has_permission_in_tenant
+from app.core.permissions import has_permission_in_tenant, get_active_tenant_ids
+from app.core.access_cache import get_user_access, user_access_cache
+from app.core.permission_index import permission_index
 
 def get_user_role_in_tenant(user: User, tenant_id: Optional[str] = None) -> Optional[str]:
     """
@@ -25,47 +27,8 @@ def get_user_role_in_tenant(user: User, tenant_id: Optional[str] = None) -> Opti
     """
     if not user:
         return None
-        
-    # If no tenant_id specified, try to get from user's primary tenant
-    if not tenant_id:
-        # For MSP users, they typically have a global role
-        if user.is_msp_user:
-            # Find any MSP role assignment
-            for assignment in user.get_tenant_assignments():
-                if assignment.role and assignment.role.name == "msp":
-                    return "msp"
-        
-        # Get primary tenant assignment
-        primary_assignment = next(
-            (assignment for assignment in user.get_tenant_assignments() 
-             if assignment.is_primary), 
-            None
-        )
-        if primary_assignment and primary_assignment.role:
-            return primary_assignment.role.name
-            
-        # Fallback to first active assignment
-        active_assignment = next(
-            (assignment for assignment in user.get_tenant_assignments() 
-             if assignment.is_active and assignment.role), 
-            None
-        )
-        if active_assignment:
-            return active_assignment.role.name
-            
-        return None
     
-    # Get role for specific tenant
-    tenant_assignment = next(
-        (assignment for assignment in user.get_tenant_assignments() 
-         if assignment.tenant_id == tenant_id), 
-        None
-    )
-    
-    if tenant_assignment and tenant_assignment.role:
-        return tenant_assignment.role.name
-        
-    return None
+    return get_user_access(user).for_tenant(tenant_id).role
 
 
 def get_user_permissions_in_tenant(user: User, tenant_id: Optional[str] = None) -> List[str]:
@@ -81,47 +44,8 @@ def get_user_permissions_in_tenant(user: User, tenant_id: Optional[str] = None)
     """
     if not user:
         return []
-        
-    # If no tenant_id specified, try to get from user's primary tenant
-    if not tenant_id:
-        # For MSP users, they typically have a global role
-        if user.is_msp_user:
-            # Find any MSP role assignment
-            for assignment in user.get_tenant_assignments():
-                if assignment.role and assignment.role.name == "msp":
-                    return [p.name for p in assignment.role.permissions]
-        
-        # Get primary tenant assignment
-        primary_assignment = next(
-            (assignment for assignment in user.get_tenant_assignments() 
-             if assignment.is_primary), 
-            None
-        )
-        if primary_assignment and primary_assignment.role:
-            return [p.name for p in primary_assignment.role.permissions]
-            
-        # Fallback to first active assignment
-        active_assignment = next(
-            (assignment for assignment in user.get_tenant_assignments() 
-             if assignment.is_active and assignment.role), 
-            None
-        )
-        if active_assignment:
-            return [p.name for p in active_assignment.role.permissions]
-            
-        return []
     
-    # Get permissions for specific tenant
-    tenant_assignment = next(
-        (assignment for assignment in user.get_tenant_assignments() 
-         if assignment.tenant_id == tenant_id), 
-        None
-    )
-    
-    if tenant_assignment and tenant_assignment.role:
-        return [p.name for p in tenant_assignment.role.permissions]
-        
-    return []
+    return sorted(get_user_access(user).for_tenant(tenant_id).permissions)
 
 
 def user_has_permission_in_tenant(user: User, permission: str, tenant_id: Optional[str] = None) -> bool:
@@ -136,8 +60,28 @@ def user_has_permission_in_tenant(user: User, permission: str, tenant_id: Option
     Returns:
         True if user has the permission, False otherwise
     """
-    permissions = get_user_permissions_in_tenant(user, tenant_id)
-    return permission in permissions
+    if not user:
+        return False
+    
+    return get_user_access(user).has_any_permission(permission_index.bit(permission), tenant_id)
+
+
+def user_has_permission_in_tenants(user: User, permission: str, tenant_ids: Iterable[str]) -> Dict[str, bool]:
+    """
+    Check a permission for a user across many tenants in one call.
+    
+    Args:
+        user: The user object
+        permission: The permission name to check
+        tenant_ids: The tenant IDs to check
+        
+    Returns:
+        Dict mapping each tenant ID to whether the user has the permission there
+    """
+    if not user:
+        return {tenant_id: False for tenant_id in tenant_ids}
+    
+    return get_user_access(user).tenants_with_permission(permission_index.bit(permission), tenant_ids)
 
 
 def user_has_role_in_tenant(user: User, role: str, tenant_id: Optional[str] = None) -> bool:
@@ -281,8 +225,13 @@ def user_has_any_permission(user: "User", permission_names: List[str], tenant_id
     Returns:
         bool: True if user has any of the permissions
     """
-    user_permissions = get_user_permissions_list(user, tenant_id)
-    return any(perm in user_permissions for perm in permission_names)
+    if tenant_id is None:
+        tenant_id = get_user_access(user).primary_tenant_id
+    
+    if not tenant_id:
+        return False
+    
+    return get_user_access(user).has_any_permission(permission_index.mask(permission_names), tenant_id)
 
 
 def resolve_tenant_context(user: "User", request_tenant_id: str = None) -> str:
@@ -317,8 +266,7 @@ def get_user_accessible_tenant_ids(user: User, db: Session) -> List[str]:
     """
     if user.is_msp_user:
         # MSP users have access to all active tenants
-        all_tenants = db.query(Tenant).filter(Tenant.is_active == True).all()
-        return [tenant.tenant_id for tenant in all_tenants]
+        return get_active_tenant_ids(db)
     
     # Regular users only have access to their assigned tenants
     accessible_tenants = []
@@ -392,3 +340,4 @@ def ensure_single_primary_tenant(user_id: int, new_primary_tenant_id: str, db: S
     ).update({"is_primary": True})
     
     db.commit()
+    user_access_cache.invalidate_user(user_id)
@@ -1,7 +1,11 @@
 """
 Utility functions for the application.
 """
-from typing import Any, Dict, List, Optional
+import base64
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
 
 def format_error_response(error: Exception) -> Dict[str, Any]:
     """
@@ -33,3 +37,33 @@ def format_error_response(error: Exception) -> Dict[str, Any]:
     
     # For other errors, return a generic message
     return {"detail": f"An error occurred: {error_message}"}
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode a keyset position (created_at, id) as an opaque cursor."""
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor into (created_at, id)."""
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def parse_if_none_match(header: str) -> List[str]:
+    """Get the entity tags listed in an If-None-Match header, ignoring weakness."""
+    tags = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag:
+            tags.append(tag)
+    return tags
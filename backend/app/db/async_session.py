@@ -0,0 +1,24 @@
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from shared.db_pool import create_pooled_async_engine
+
+async_engine = create_pooled_async_engine(
+    settings.SQLALCHEMY_ASYNC_DATABASE_URI,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    statement_timeout_ms=settings.DB_STATEMENT_TIMEOUT_MS,
+    pgbouncer_mode=settings.DB_PGBOUNCER_MODE
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+
+async def get_async_db():
+    """
+    Get an async database session
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -32,6 +32,9 @@ from app.models.nexus_ai import NexusAIConfig, NexusAILog
 from app.models.ai_assistant import AIAssistantConfig, AIAssistantLog
 from app.models.dashboard import Dashboard, DashboardWidget, UserWidget
 from app.models.user_tenant_assignment import UserTenantAssignment
+from app.models.tenant_stats import TenantStat
+from app.services.tenant_stats_service import rebuild_tenant_stats
+from app.services.code_blob_service import store_code
 
 logger = logging.getLogger(__name__)
 
@@ -531,29 +534,14 @@ def init_db(db: Session) -> None:
                     role_id=role.id,
                     is_primary=True,
                     is_active=True,
+                    # MSP users' primary assignment applies to all tenants
+                    applies_to_all_tenants=bool(user_data.get("is_msp_user", False)),
                     # SSO_FUTURE: Provisioning tracking for manual vs SSO users
                     provisioned_via="manual",  # All init users are manually provisioned
                     external_group_id=None,  # No Azure AD groups for init users
                     external_role_mapping=None  # No external role mapping for init users
                 )
                 db.add(primary_assignment)
-                
-                # For MSP users, create assignments to all tenants
-                if user_data.get("is_msp_user", False):
-                    for tenant_id, tenant_obj in tenants.items():
-                        if isinstance(tenant_id, str) and tenant_id != tenant.tenant_id:  # Skip primary tenant
-                            msp_assignment = UserTenantAssignment(
-                                user_id=user.id,  # Use integer primary key instead of UUID
-                                tenant_id=tenant_id,
-                                role_id=role.id,
-                                is_primary=False,
-                                is_active=True,
-                                # SSO_FUTURE: MSP assignments also tracked for provisioning
-                                provisioned_via="manual",
-                                external_group_id=None,
-                                external_role_mapping=None
-                            )
-                            db.add(msp_assignment)
     
     # Create default AI configurations
     logger.info("Creating default AI configurations...")
@@ -1089,10 +1077,11 @@ resource "google_compute_instance" "example" {
             templates.append(template)
             
             # Create initial version
+            initial_code_digest = store_code(db, template_data["code"])
             initial_version = TemplateVersion(
                 template_id=template.id,
                 version="1.0.0",
-                code=template_data["code"],
+                code_digest=initial_code_digest,
                 changes="Initial version",
                 created_at=template.created_at,
                 created_by_id=users_by_tenant[tenant.tenant_id][0].id if tenant.tenant_id in users_by_tenant else None
@@ -1107,7 +1096,7 @@ resource "google_compute_instance" "example" {
                 second_version = TemplateVersion(
                     template_id=template.id,
                     version="1.0.1",
-                    code=updated_code,
+                    code_digest=store_code(db, updated_code, initial_code_digest),
                     changes="Updated resource names",
                     created_at=template.updated_at,
                     created_by_id=users_by_tenant[tenant.tenant_id][0].id if tenant.tenant_id in users_by_tenant else None
@@ -1335,4 +1324,8 @@ output storageAccountId string = storageAccount.id
     
     # Commit all changes
     db.commit()
+    
+    # Count the sample cloud accounts and templates in the dashboard rollup
+    rebuild_tenant_stats(db)
+    db.commit()
     logger.info("Comprehensive sample data created successfully")
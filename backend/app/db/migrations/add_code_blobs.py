@@ -0,0 +1,72 @@
+"""Move template and foundry version code into content-addressed code blobs
+
+Revision ID: add_code_blobs
+Revises: add_template_category_stats
+Create Date: 2026-10-16 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.orm import Session
+
+from app.services.code_blob_service import load_code, store_code
+
+# revision identifiers, used by Alembic.
+revision = 'add_code_blobs'
+down_revision = 'add_template_category_stats'
+depends_on = None
+
+VERSION_TABLES = ('template_versions', 'template_foundry_versions')
+
+
+def upgrade():
+    op.create_table(
+        'code_blobs',
+        sa.Column('digest', sa.String(64), primary_key=True),
+        sa.Column('encoding', sa.String(), nullable=False),
+        sa.Column('base_digest', sa.String(64), sa.ForeignKey('code_blobs.digest'), nullable=True),
+        sa.Column('depth', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True)
+    )
+    for table in VERSION_TABLES:
+        op.add_column(table, sa.Column('code_digest', sa.String(64), sa.ForeignKey('code_blobs.digest'), nullable=True))
+
+    # Store each template's versions in order, so every version can be a delta against the previous one
+    session = Session(bind=op.get_bind())
+    for table in VERSION_TABLES:
+        previous_digests = {}
+        rows = session.execute(sa.text(
+            f"SELECT id, template_id, code FROM {table} ORDER BY template_id, created_at, id"
+        )).fetchall()
+        for version_id, template_id, code in rows:
+            digest = store_code(session, code, previous_digests.get(template_id))
+            session.execute(
+                sa.text(f"UPDATE {table} SET code_digest = :digest WHERE id = :id"),
+                {"digest": digest, "id": version_id}
+            )
+            previous_digests[template_id] = digest
+
+    for table in VERSION_TABLES:
+        op.drop_column(table, 'code')
+
+
+def downgrade():
+    op.add_column('template_versions', sa.Column('code', sa.String(), nullable=True))
+    op.add_column('template_foundry_versions', sa.Column('code', sa.Text(), nullable=True))
+
+    session = Session(bind=op.get_bind())
+    for table in VERSION_TABLES:
+        rows = session.execute(sa.text(
+            f"SELECT id, code_digest FROM {table} WHERE code_digest IS NOT NULL"
+        )).fetchall()
+        for version_id, digest in rows:
+            session.execute(
+                sa.text(f"UPDATE {table} SET code = :code WHERE id = :id"),
+                {"code": load_code(session, digest), "id": version_id}
+            )
+
+    for table in VERSION_TABLES:
+        op.drop_column(table, 'code_digest')
+    op.drop_table('code_blobs')
@@ -0,0 +1,22 @@
+"""Add index for deployment history lookups
+
+Revision ID: add_deployment_history_index
+Revises: add_deployment_list_indexes
+Create Date: 2026-10-16 12:30:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_deployment_history_index'
+down_revision = 'add_deployment_list_indexes'
+depends_on = None
+
+
+def upgrade():
+    # Log pages and streams read a deployment's history by deployment
+    op.create_index('ix_deployment_history_deployment_id', 'deployment_history', ['deployment_id'])
+
+
+def downgrade():
+    op.drop_index('ix_deployment_history_deployment_id', table_name='deployment_history')
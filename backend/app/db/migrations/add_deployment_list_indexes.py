@@ -0,0 +1,26 @@
+"""Add indexes for deployment list pagination and details lookups
+
+Revision ID: add_deployment_list_indexes
+Revises: add_tenant_to_ai_assistant
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'add_deployment_list_indexes'
+down_revision = 'add_tenant_to_ai_assistant'
+depends_on = None
+
+
+def upgrade():
+    # Keyset pagination of a tenant's deployments, newest first
+    op.create_index('ix_deployments_tenant_created', 'deployments', ['tenant_id', 'created_at', 'id'])
+
+    # The list outer-joins each deployment's details
+    op.create_index('ix_deployment_details_deployment_id', 'deployment_details', ['deployment_id'])
+
+
+def downgrade():
+    op.drop_index('ix_deployment_details_deployment_id', table_name='deployment_details')
+    op.drop_index('ix_deployments_tenant_created', table_name='deployments')
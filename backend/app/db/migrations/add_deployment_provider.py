@@ -0,0 +1,34 @@
+"""Store the provider deployments are counted under
+
+Revision ID: add_deployment_provider
+Revises: add_code_blobs
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_deployment_provider'
+down_revision = 'add_code_blobs'
+depends_on = None
+
+
+def upgrade():
+    op.add_column('deployments', sa.Column('provider', sa.String(), nullable=True))
+
+    # Same provider the deployments_by_provider counters were built with
+    op.execute("""
+        UPDATE deployments d SET provider = COALESCE((
+            SELECT ca.provider
+            FROM cloud_accounts ca
+            JOIN environment_cloud_account eca ON eca.cloud_account_id = ca.id
+            WHERE eca.environment_id = d.environment_id
+            ORDER BY ca.id
+            LIMIT 1
+        ), 'unknown')
+    """)
+
+
+def downgrade():
+    op.drop_column('deployments', 'provider')
@@ -0,0 +1,72 @@
+"""Replace per-tenant MSP assignments with wildcard assignments
+
+Revision ID: add_msp_wildcard_assignments
+Revises: add_deployment_history_index
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_msp_wildcard_assignments'
+down_revision = 'add_deployment_history_index'
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user_tenant_assignments',
+                  sa.Column('applies_to_all_tenants', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+    # Assignments are loaded per user on every authenticated request
+    op.create_index('ix_user_tenant_assignments_user_active', 'user_tenant_assignments', ['user_id', 'is_active'])
+
+    # Keep one MSP role assignment per MSP user (the primary one if any) as the wildcard
+    op.execute("""
+        UPDATE user_tenant_assignments
+        SET applies_to_all_tenants = true
+        FROM (
+            SELECT DISTINCT ON (uta.user_id) uta.id
+            FROM user_tenant_assignments uta
+            JOIN users u ON u.id = uta.user_id
+            JOIN roles r ON r.id = uta.role_id
+            WHERE u.is_msp_user AND r.name = 'msp' AND uta.is_active
+            ORDER BY uta.user_id, uta.is_primary DESC, uta.id
+        ) home
+        WHERE user_tenant_assignments.id = home.id
+    """)
+
+    # ...and drop the per-tenant copies it replaces
+    op.execute("""
+        DELETE FROM user_tenant_assignments uta
+        USING users u, roles r
+        WHERE u.id = uta.user_id
+          AND r.id = uta.role_id
+          AND u.is_msp_user
+          AND r.name = 'msp'
+          AND NOT uta.applies_to_all_tenants
+          AND EXISTS (
+              SELECT 1 FROM user_tenant_assignments home
+              WHERE home.user_id = uta.user_id AND home.applies_to_all_tenants
+          )
+    """)
+
+
+def downgrade():
+    # Recreate the per-tenant copies of each wildcard assignment in every active tenant
+    # the user has no assignment in; assignments of since deactivated tenants are not restored
+    op.execute("""
+        INSERT INTO user_tenant_assignments
+            (user_id, tenant_id, role_id, is_primary, is_active, provisioned_via, created_at, updated_at)
+        SELECT home.user_id, t.tenant_id, home.role_id, false, true, home.provisioned_via, now(), now()
+        FROM user_tenant_assignments home
+        JOIN tenants t ON t.is_active
+        WHERE home.applies_to_all_tenants
+          AND NOT EXISTS (
+              SELECT 1 FROM user_tenant_assignments uta
+              WHERE uta.user_id = home.user_id AND uta.tenant_id = t.tenant_id
+          )
+    """)
+
+    op.drop_index('ix_user_tenant_assignments_user_active', table_name='user_tenant_assignments')
+    op.drop_column('user_tenant_assignments', 'applies_to_all_tenants')
@@ -0,0 +1,27 @@
+"""Add platform analytics snapshots
+
+Revision ID: add_platform_analytics_snapshots
+Revises: add_tenant_stats
+Create Date: 2026-10-16 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_platform_analytics_snapshots'
+down_revision = 'add_tenant_stats'
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'platform_analytics_snapshots',
+        sa.Column('range_days', sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.Column('data', sa.JSON(), nullable=False)
+    )
+
+
+def downgrade():
+    op.drop_table('platform_analytics_snapshots')
@@ -0,0 +1,33 @@
+"""Add template category counters to tenant_stats
+
+Revision ID: add_template_category_stats
+Revises: add_platform_analytics_snapshots
+Create Date: 2026-10-16 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_template_category_stats'
+down_revision = 'add_platform_analytics_snapshots'
+depends_on = None
+
+
+def upgrade():
+    # Backfill from the templates; same counters as tenant_stats_service.template_category_counts_query
+    op.execute("""
+        INSERT INTO tenant_stats (tenant_id, metric, dimension, value)
+        SELECT tenant_id, 'templates_by_category', category, COUNT(DISTINCT id)
+        FROM (
+            SELECT id, tenant_id, btrim(json_array_elements_text(category)) AS category
+            FROM templates
+            WHERE tenant_id IS NOT NULL AND json_typeof(category) = 'array'
+        ) template_categories
+        WHERE category <> ''
+        GROUP BY 1, 3
+    """)
+
+
+def downgrade():
+    op.execute("DELETE FROM tenant_stats WHERE metric = 'templates_by_category'")
@@ -0,0 +1,64 @@
+"""Add tenant_stats rollup of dashboard counters
+
+Revision ID: add_tenant_stats
+Revises: add_msp_wildcard_assignments
+Create Date: 2026-10-16 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = 'add_tenant_stats'
+down_revision = 'add_msp_wildcard_assignments'
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'tenant_stats',
+        sa.Column('tenant_id', postgresql.UUID(as_uuid=False),
+                  sa.ForeignKey('tenants.tenant_id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('metric', sa.String(), primary_key=True),
+        sa.Column('dimension', sa.String(), primary_key=True, server_default=''),
+        sa.Column('value', sa.BigInteger(), nullable=False, server_default='0')
+    )
+
+    # Backfill from the base tables; same counters as tenant_stats_service.rebuild_tenant_stats
+    op.execute("""
+        INSERT INTO tenant_stats (tenant_id, metric, dimension, value)
+        SELECT tenant_id, 'deployments_by_status', COALESCE(status, 'unknown'), COUNT(*)
+        FROM deployments WHERE tenant_id IS NOT NULL
+        GROUP BY 1, 3
+        UNION ALL
+        SELECT tenant_id, 'deployments_by_provider', provider, COUNT(*)
+        FROM (
+            SELECT d.tenant_id, COALESCE((
+                SELECT ca.provider
+                FROM cloud_accounts ca
+                JOIN environment_cloud_account eca ON eca.cloud_account_id = ca.id
+                WHERE eca.environment_id = d.environment_id
+                ORDER BY ca.id
+                LIMIT 1
+            ), 'unknown') AS provider
+            FROM deployments d WHERE d.tenant_id IS NOT NULL
+        ) deployment_providers
+        GROUP BY 1, 3
+        UNION ALL
+        SELECT tenant_id, 'deployments_by_day', to_char(created_at, 'YYYY-MM-DD'), COUNT(*)
+        FROM deployments WHERE tenant_id IS NOT NULL AND created_at IS NOT NULL
+        GROUP BY 1, 3
+        UNION ALL
+        SELECT tenant_id, 'templates_by_provider', COALESCE(provider, 'unknown'), COUNT(*)
+        FROM templates WHERE tenant_id IS NOT NULL
+        GROUP BY 1, 3
+        UNION ALL
+        SELECT tenant_id, 'cloud_accounts', '', COUNT(*)
+        FROM cloud_accounts WHERE tenant_id IS NOT NULL
+        GROUP BY 1
+    """)
+
+
+def downgrade():
+    op.drop_table('tenant_stats')
@@ -1,10 +1,19 @@
-from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
+from shared.db_pool import create_pooled_engine
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI)
+engine = create_pooled_engine(
+    settings.SQLALCHEMY_DATABASE_URI,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    statement_timeout_ms=settings.DB_STATEMENT_TIMEOUT_MS,
+    pgbouncer_mode=settings.DB_PGBOUNCER_MODE
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
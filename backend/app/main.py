@@ -1,3 +1,5 @@
+import logging
+
 from fastapi import FastAPI, Request, Response, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
@@ -5,7 +7,12 @@ from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
 
 from app.core.config import settings
+from app.core.permission_index import permission_index
 from app.api.api import api_router
+from app.db.session import SessionLocal
+from app.services.platform_analytics_service import PlatformAnalyticsRefresher
+
+logger = logging.getLogger(__name__)
 
 
 class CORSMiddlewareWithOptions(BaseHTTPMiddleware):
@@ -47,6 +54,37 @@ app.add_middleware(CORSMiddlewareWithOptions)
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
+@app.on_event("startup")
+def load_permission_index():
+    """
+    Compile role permission masks once at startup
+    """
+    db = SessionLocal()
+    try:
+        permission_index.load(db)
+    except Exception as e:
+        # Roles are compiled on first use instead
+        logger.error(f"Error loading permission index: {e}")
+    finally:
+        db.close()
+
+
+platform_analytics_refresher = PlatformAnalyticsRefresher(settings.PLATFORM_ANALYTICS_REFRESH_SECONDS, SessionLocal)
+
+
+@app.on_event("startup")
+def start_platform_analytics_refresher():
+    """
+    Refresh the MSP platform analytics snapshots in the background
+    """
+    platform_analytics_refresher.start()
+
+
+@app.on_event("shutdown")
+def stop_platform_analytics_refresher():
+    platform_analytics_refresher.stop()
+
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """
@@ -9,3 +9,6 @@ from app.models.integration import IntegrationConfig
 from app.models.nexus_ai import NexusAIConfig, NexusAILog
 from app.models.cloud_settings import CloudSettings
 from app.models.dashboard import Dashboard, DashboardWidget, UserWidget
+from app.models.tenant_stats import TenantStat
+from app.models.platform_analytics import PlatformAnalyticsSnapshot
+from app.models.code_blob import CodeBlob
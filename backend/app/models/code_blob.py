@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, ForeignKey
+from datetime import datetime
+
+from app.models.base_models import Base
+
+
+class CodeBlob(Base):
+    """
+    Template code stored once by the SHA-256 of its content, shared by every template
+    and foundry version (of any tenant) with the same code.
+
+    The data is zlib-compressed, either the full code (encoding "zlib") or a line
+    delta against the base blob (encoding "delta"); see app.services.code_blob_service.
+    """
+    __tablename__ = "code_blobs"
+
+    digest = Column(String(64), primary_key=True)  # SHA-256 hex of the code
+    encoding = Column(String, nullable=False)  # zlib, delta
+    base_digest = Column(String(64), ForeignKey("code_blobs.digest"), nullable=True)  # Base of a delta
+    depth = Column(Integer, nullable=False, default=0)  # Number of deltas to apply to read the code
+    data = Column(LargeBinary, nullable=False)
+    size = Column(Integer, nullable=False)  # Size of the code in bytes
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Table, DateTime, JSON, Text, Float
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Table, DateTime, JSON, Text, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime
@@ -117,7 +117,7 @@ class TemplateVersion(Base):
     id = Column(Integer, primary_key=True, index=True)
     version = Column(String)
     changes = Column(String, nullable=True)
-    code = Column(String, nullable=True)
+    code_digest = Column(String(64), ForeignKey("code_blobs.digest"), nullable=True)  # See code_blob_service
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -130,6 +130,10 @@ class TemplateVersion(Base):
 
 class Deployment(Base):
     __tablename__ = "deployments"
+    __table_args__ = (
+        # Keyset pagination of a tenant's deployments, newest first
+        Index("ix_deployments_tenant_created", "tenant_id", "created_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     deployment_id = Column(UUID(as_uuid=False), unique=True, index=True, default=generate_uuid)
@@ -141,6 +145,7 @@ class Deployment(Base):
     region = Column(String, nullable=True)  # Store deployment region
     cloud_deployment_id = Column(String, nullable=True)  # ID from the cloud provider
     deployment_type = Column(String, default="arm")  # arm, terraform, etc.
+    provider = Column(String, nullable=True)  # Provider the deployment is counted under, fixed at creation
     template_version = Column(String, nullable=True)  # Store the template version used for deployment
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -173,7 +178,7 @@ class DeploymentHistory(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
-    deployment_id = Column(Integer, ForeignKey("deployments.id"))
+    deployment_id = Column(Integer, ForeignKey("deployments.id"), index=True)
     deployment = relationship("Deployment", back_populates="history")
     
     user_id = Column(Integer, ForeignKey("users.id"))
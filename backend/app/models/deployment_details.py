@@ -34,7 +34,7 @@ class DeploymentDetails(Base):
     completed_at = Column(DateTime, nullable=True)
     
     # Relationships
-    deployment_id = Column(Integer, ForeignKey("deployments.id"))
+    deployment_id = Column(Integer, ForeignKey("deployments.id"), index=True)
     deployment = relationship("Deployment", back_populates="details")
 
 # Add relationship to Deployment model
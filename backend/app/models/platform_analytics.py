@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, DateTime, JSON
+from datetime import datetime
+
+from app.models.base_models import Base
+
+
+class PlatformAnalyticsSnapshot(Base):
+    """
+    The latest MSP platform analytics computed for a time range, refreshed on a
+    schedule by app.services.platform_analytics_service.
+    """
+    __tablename__ = "platform_analytics_snapshots"
+    
+    range_days = Column(Integer, primary_key=True, autoincrement=False)  # 0 for all time
+    computed_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    data = Column(JSON, nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -13,7 +13,7 @@ class TemplateFoundryVersion(Base):
     version_id = Column(UUID(as_uuid=False), unique=True, index=True, default=generate_uuid)
     version = Column(String)
     changes = Column(String, nullable=True)
-    code = Column(Text)  # The actual template code
+    code_digest = Column(String(64), ForeignKey("code_blobs.digest"), nullable=True)  # See code_blob_service
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
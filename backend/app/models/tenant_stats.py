@@ -0,0 +1,19 @@
+from sqlalchemy import Column, String, ForeignKey, BigInteger
+from sqlalchemy.dialects.postgresql import UUID
+
+from app.models.base_models import Base
+
+
+class TenantStat(Base):
+    """
+    One counter of the tenant_stats rollup, e.g. the number of a tenant's deployments
+    in status "running" (metric "deployments_by_status", dimension "running").
+
+    Counters are maintained incrementally by app.services.tenant_stats_service.
+    """
+    __tablename__ = "tenant_stats"
+    
+    tenant_id = Column(UUID(as_uuid=False), ForeignKey("tenants.tenant_id", ondelete="CASCADE"), primary_key=True)
+    metric = Column(String, primary_key=True)  # deployments_by_status, deployments_by_provider, ...
+    dimension = Column(String, primary_key=True, default="")  # status, provider, category, YYYY-MM-DD or ""
+    value = Column(BigInteger, nullable=False, default=0)
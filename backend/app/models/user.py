@@ -128,6 +128,9 @@ class User(Base):
     
     def get_primary_tenant_id(self):
         """Get the user's primary tenant ID - replaces direct tenant_id access"""
+        resolved_access = getattr(self, "resolved_access", None)
+        if resolved_access is not None:
+            return resolved_access.primary_tenant_id
         primary_assignment = self.get_primary_tenant_assignment()
         return primary_assignment.tenant_id if primary_assignment else None
     
@@ -136,6 +139,11 @@ class User(Base):
         if self.is_msp_user:
             return True  # MSP users have access to all tenants
         
+        # Use the access compiled during authentication when available
+        resolved_access = getattr(self, "resolved_access", None)
+        if resolved_access is not None:
+            return resolved_access.has_tenant_access(tenant_id)
+        
         for assignment in self.tenant_assignments:
             if assignment.is_active and assignment.tenant_id == tenant_id:
                 return True
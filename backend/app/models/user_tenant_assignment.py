@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import datetime
@@ -27,6 +27,10 @@ class UserTenantAssignment(Base):
     is_primary = Column(Boolean, default=False, nullable=False)  # Mark user's primary tenant
     is_active = Column(Boolean, default=True, nullable=False)    # Allow deactivating assignments
     
+    # Wildcard assignment: the role applies in every active tenant, including tenants created later.
+    # Used for MSP users instead of one row per tenant; tenant_id holds their home tenant.
+    applies_to_all_tenants = Column(Boolean, default=False, nullable=False)
+    
     # SSO_FUTURE: Provisioning tracking for automated user management
     # These fields will track how users were assigned to tenants (manual vs SSO)
     provisioned_via = Column(String, default="manual", nullable=False)  # "manual", "sso_auto", "sso_jit"
@@ -52,6 +56,8 @@ class UserTenantAssignment(Base):
     
     # Ensure unique user-tenant combinations
     __table_args__ = (
+        # A user's assignments are loaded with every authenticated request
+        Index("ix_user_tenant_assignments_user_active", "user_id", "is_active"),
         {"schema": None}  # Use default schema
     )
     
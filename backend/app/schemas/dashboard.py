@@ -135,11 +135,28 @@ class WidgetDataResponse(BaseModel):
     widget_type: str
     data: Dict[str, Any]
     last_updated: datetime
+    cache_age_seconds: float = Field(0, description="Age of the oldest cached aggregate the data was built from")
     
     class Config:
         from_attributes = True
 
 
+class WidgetDataBatchRequest(BaseModel):
+    requests: List[WidgetDataRequest] = Field(..., description="Widget data requests, e.g. for every widget on a dashboard")
+
+
+class WidgetDataBatchItem(BaseModel):
+    widget_type: str
+    data: Optional[Dict[str, Any]] = None
+    last_updated: Optional[datetime] = None
+    cache_age_seconds: float = 0
+    error: Optional[str] = None
+
+
+class WidgetDataBatchResponse(BaseModel):
+    results: List[WidgetDataBatchItem]  # In request order
+
+
 # Bulk Operations
 class BulkUserWidgetUpdate(BaseModel):
     widgets: List[Dict[str, Any]] = Field(..., description="List of widget updates with user_widget_id and update data")
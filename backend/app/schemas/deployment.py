@@ -164,6 +164,7 @@ class CloudDeploymentResponse(BaseModel):
     updatedAt: str
     parameters: Dict[str, Any] = {}
     resources: List[Dict[str, Any]] = []
+    resourceCount: Optional[int] = None  # Number of resources, returned even when resources are not
     tenantId: str
     region: Optional[str] = None
     details: Optional[Dict[str, Any]] = None  # Add details field for outputs
@@ -172,6 +173,27 @@ class CloudDeploymentResponse(BaseModel):
         orm_mode = True
         from_attributes = True
 
+# Deployment engine status ingestion schemas
+class EngineStatusUpdate(BaseModel):
+    deployment_id: str
+    status: Optional[str] = None
+    resources: Optional[List[Dict[str, Any]]] = None
+    outputs: Optional[Dict[str, Any]] = None
+    logs: Optional[List[Dict[str, Any]]] = None
+    deployment_result: Optional[Dict[str, Any]] = None
+
+class EngineStatusBatch(BaseModel):
+    updates: List[EngineStatusUpdate]
+
+class EngineStatusResult(BaseModel):
+    deployment_id: str
+    result: str  # applied, not_found, forbidden
+    status: Optional[str] = None
+
+class EngineStatusBatchResponse(BaseModel):
+    applied: int
+    results: List[EngineStatusResult]
+
 # Deployment schemas
 class DeploymentCreate(DeploymentBase):
     environment_id: int
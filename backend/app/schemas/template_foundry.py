@@ -6,15 +6,15 @@ from pydantic import BaseModel
 class TemplateFoundryVersionBase(BaseModel):
     version: str
     changes: Optional[str] = None
-    code: str
 
 
 class TemplateFoundryVersionCreate(TemplateFoundryVersionBase):
-    pass
+    code: str
 
 
 class TemplateFoundryVersionResponse(TemplateFoundryVersionBase):
     id: int
+    code_digest: Optional[str] = None  # SHA-256 of the code; fetch the code from the version endpoint
     created_at: datetime
     created_by_id: Optional[int] = None
     
@@ -22,6 +22,10 @@ class TemplateFoundryVersionResponse(TemplateFoundryVersionBase):
         from_attributes = True
 
 
+class TemplateFoundryVersionCodeResponse(TemplateFoundryVersionResponse):
+    code: Optional[str] = None
+
+
 class TemplateFoundryBase(BaseModel):
     name: str
     description: Optional[str] = None
@@ -73,6 +73,30 @@ class LoginResponse(BaseModel):
     user: User  # Now User is defined above, no need for forward reference
 
 
+class BootstrapTenantCounts(BaseModel):
+    """Number of resources of each kind in a tenant"""
+    environments: int = 0
+    cloud_accounts: int = 0
+    templates: int = 0
+    deployments: int = 0
+
+
+class BootstrapTenant(BaseModel):
+    """A tenant the user can access, with the user's role and permissions in it"""
+    tenant_id: str
+    name: Optional[str] = None
+    description: Optional[str] = None
+    role: Optional[str] = None
+    permissions: List[str] = []
+    counts: BootstrapTenantCounts = BootstrapTenantCounts()
+
+
+class SessionBootstrap(BaseModel):
+    """Everything the frontend needs on load: the user, their tenants and permissions"""
+    user: User
+    tenants: List[BootstrapTenant] = []
+
+
 class UserCreate(UserBase):
     password: Optional[str] = None  # SSO_FUTURE: Made optional for SSO users
     role: Optional[str] = None  # Made optional since roles are now per-tenant
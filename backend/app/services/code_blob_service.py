@@ -0,0 +1,159 @@
+"""
+Code blob service storing template and foundry version code by content.
+
+Every version's code is stored once in code_blobs under the SHA-256 of its content,
+so identical code across versions, templates and tenants shares one row. Blobs are
+zlib-compressed; a version whose code is close to its previous version's is stored
+as a line delta against it, up to CODE_BLOB_MAX_DELTA_DEPTH deltas deep. Blobs are
+immutable, version rows only hold the digest.
+"""
+import difflib
+import hashlib
+import json
+import zlib
+from typing import List, Optional, Union
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.code_blob import CodeBlob
+
+ENCODING_ZLIB = "zlib"
+ENCODING_DELTA = "delta"
+
+# A delta is only kept when it is smaller than this share of the compressed code
+DELTA_MAX_RATIO = 0.5
+
+# A delta is a list of copied base line ranges ([start, end]) and inserted text
+Delta = List[Union[List[int], str]]
+
+
+def code_digest(code: str) -> str:
+    """The SHA-256 hex digest a code is stored under."""
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def _compress(value: str) -> bytes:
+    return zlib.compress(value.encode("utf-8"), 9)
+
+
+def _decompress(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+
+def make_delta(base: str, code: str) -> Delta:
+    """Line delta turning base into code."""
+    base_lines = base.splitlines(keepends=True)
+    code_lines = code.splitlines(keepends=True)
+    delta: Delta = []
+    matcher = difflib.SequenceMatcher(None, base_lines, code_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append([i1, i2])
+        elif j2 > j1:
+            delta.append("".join(code_lines[j1:j2]))
+    return delta
+
+
+def apply_delta(base: str, delta: Delta) -> str:
+    """Rebuild code from its base and the delta made by make_delta()."""
+    base_lines = base.splitlines(keepends=True)
+    return "".join(
+        "".join(base_lines[op[0]:op[1]]) if isinstance(op, list) else op
+        for op in delta
+    )
+
+
+def store_code(db: Session, code: Optional[str], base_digest: Optional[str] = None) -> Optional[str]:
+    """
+    Store code unless a blob with the same content exists.
+
+    Args:
+        db: Database session; the blob is committed with it
+        code: The code (None stores nothing)
+        base_digest: Digest of the previous version's code, to store the code as a delta against
+
+    Returns:
+        The digest to reference the code by, or None for no code
+    """
+    if code is None:
+        return None
+
+    digest = code_digest(code)
+    if db.query(CodeBlob.digest).filter(CodeBlob.digest == digest).first():
+        return digest
+
+    row = {
+        "digest": digest,
+        "encoding": ENCODING_ZLIB,
+        "base_digest": None,
+        "depth": 0,
+        "data": _compress(code),
+        "size": len(code.encode("utf-8"))
+    }
+
+    if base_digest and settings.CODE_BLOB_MAX_DELTA_DEPTH > 0:
+        base = db.query(CodeBlob.depth).filter(CodeBlob.digest == base_digest).first()
+        if base and base.depth < settings.CODE_BLOB_MAX_DELTA_DEPTH:
+            delta_data = _compress(json.dumps(make_delta(load_code(db, base_digest), code), separators=(",", ":")))
+            if len(delta_data) < len(row["data"]) * DELTA_MAX_RATIO:
+                row.update(encoding=ENCODING_DELTA, base_digest=base_digest, depth=base.depth + 1, data=delta_data)
+
+    # Another transaction may store the same code concurrently
+    db.execute(insert(CodeBlob).values(**row).on_conflict_do_nothing(index_elements=[CodeBlob.digest]))
+    return digest
+
+
+def latest_code_digest(db: Session, version_model, template_id: int) -> Optional[str]:
+    """
+    Digest of the code of a template's latest version, the base to store its next version against.
+
+    Args:
+        db: Database session
+        version_model: TemplateVersion or TemplateFoundryVersion
+        template_id: The template's primary key
+
+    Returns:
+        The digest, or None if the template has no version with code
+    """
+    row = db.query(version_model.code_digest).filter(
+        version_model.template_id == template_id,
+        version_model.code_digest.isnot(None)
+    ).order_by(version_model.created_at.desc(), version_model.id.desc()).first()
+    return row.code_digest if row else None
+
+
+def load_code(db: Session, digest: Optional[str]) -> Optional[str]:
+    """
+    Load the code stored under a digest.
+
+    Args:
+        db: Database session
+        digest: The digest returned by store_code()
+
+    Returns:
+        The code, or None for no digest
+
+    Raises:
+        LookupError: If no blob is stored under the digest (or its delta base)
+    """
+    if digest is None:
+        return None
+
+    # Walk the delta chain down to the full code, then apply the deltas back up
+    chain = []
+    next_digest = digest
+    while next_digest is not None:
+        blob = db.query(CodeBlob.encoding, CodeBlob.base_digest, CodeBlob.data).filter(
+            CodeBlob.digest == next_digest
+        ).first()
+        if blob is None:
+            raise LookupError(f"Code blob {next_digest} not found")
+        chain.append(blob)
+        next_digest = blob.base_digest if blob.encoding == ENCODING_DELTA else None
+
+    code = _decompress(chain.pop().data)
+    for blob in reversed(chain):
+        code = apply_delta(code, json.loads(_decompress(blob.data)))
+    return code
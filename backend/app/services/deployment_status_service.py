@@ -0,0 +1,420 @@
+"""
+Deployment status service for applying status updates reported by the deployment engine.
+"""
+import asyncio
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert, update
+from sqlalchemy.orm import Session
+
+from app.models.user import User
+from app.models.deployment import Deployment, DeploymentHistory
+from app.models.deployment_details import DeploymentDetails
+from app.core.tenant_utils import user_has_permission_in_tenants
+from app.services.tenant_stats_service import TenantStatDeltas
+
+TERMINAL_STATUSES = ["succeeded", "failed", "canceled"]
+
+# Sentinel for output keys that did not exist in the previous state
+_MISSING = object()
+
+# History entry levels, derived from the status recorded with the entry
+HISTORY_LEVEL_STATUSES = {
+    "error": ["failed"],
+    "warning": ["canceled"]
+}
+
+# Deployments whose latest history version is kept; older ones are dropped first
+HISTORY_VERSIONS_MAX = 10000
+
+# Wakes up log streams in this process when new history entries are committed. Versions
+# come from one counter, so a deployment dropped from _history_versions and signalled
+# again never gets back a version a stream is waiting on.
+_history_lock = threading.Lock()
+_history_counter = 0
+_history_versions: "OrderedDict[str, int]" = OrderedDict()
+_history_waiters: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+
+
+def history_level(status_value: Optional[str]) -> str:
+    """Get the level (error, warning or info) of a history entry from its status."""
+    for level, statuses in HISTORY_LEVEL_STATUSES.items():
+        if status_value in statuses:
+            return level
+    return "info"
+
+
+def history_level_filter(level: str):
+    """
+    Build a SQL filter matching history entries of a level.
+
+    Raises:
+        ValueError: If the level is unknown
+    """
+    if level in HISTORY_LEVEL_STATUSES:
+        return DeploymentHistory.status.in_(HISTORY_LEVEL_STATUSES[level])
+    if level == "info":
+        excluded = [s for statuses in HISTORY_LEVEL_STATUSES.values() for s in statuses]
+        return DeploymentHistory.status.is_(None) | DeploymentHistory.status.notin_(excluded)
+    raise ValueError(f"Unknown level: {level}")
+
+
+def notify_history_written(deployment_ids: List[str]):
+    """
+    Signal that history entries were committed for deployments.
+
+    Must be called after the transaction that wrote them commits.
+    """
+    global _history_counter
+    with _history_lock:
+        for deployment_id in deployment_ids:
+            _history_counter += 1
+            _history_versions[deployment_id] = _history_counter
+            _history_versions.move_to_end(deployment_id)
+            for loop, event in _history_waiters.get(deployment_id, []):
+                loop.call_soon_threadsafe(event.set)
+        while len(_history_versions) > HISTORY_VERSIONS_MAX:
+            _history_versions.popitem(last=False)
+
+
+async def wait_for_history(deployment_id: str, version: Optional[int], timeout: float) -> int:
+    """
+    Wait until new history is signalled for a deployment or the timeout passes.
+
+    The wait does not hold a thread. Streams served by another backend process are
+    not signalled, so callers must still re-query after a timeout. A deployment whose
+    version was dropped returns immediately, which only costs the caller a re-query.
+
+    Args:
+        deployment_id: The deployment's public ID
+        version: Version returned by the previous call, or None to return immediately
+        timeout: Maximum seconds to wait
+
+    Returns:
+        The current version, to pass to the next call
+    """
+    with _history_lock:
+        current = _history_versions.get(deployment_id, 0)
+        if version is None or current != version:
+            return current
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        _history_waiters.setdefault(deployment_id, []).append(waiter)
+
+    try:
+        await asyncio.wait_for(waiter[1].wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        with _history_lock:
+            waiters = _history_waiters.get(deployment_id, [])
+            if waiter in waiters:
+                waiters.remove(waiter)
+            if not waiters:
+                _history_waiters.pop(deployment_id, None)
+
+    with _history_lock:
+        return _history_versions.get(deployment_id, 0)
+
+
+def _coalesce_updates(updates: List[Dict[str, Any]]) -> "OrderedDict[str, Dict[str, Any]]":
+    """Merge multiple updates for the same deployment; later non-null fields win."""
+    merged = OrderedDict()
+    for update_data in updates:
+        fields = {key: value for key, value in update_data.items() if value is not None}
+        merged.setdefault(update_data["deployment_id"], {}).update(fields)
+    return merged
+
+
+def apply_status_updates(db: Session, current_user: User, updates: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Apply status updates for many deployments in a single transaction.
+
+    Deployments, their details rows and history entries are read and written with
+    one statement per table rather than one round trip per deployment. A history
+    entry is written only when the update changes the status, resources, outputs or
+    logs, and it stores just that change (see compute_status_delta). The deployment
+    rows are locked in ID order until the transaction ends, so concurrent updates of
+    the same deployment move its status counters once per actual transition.
+
+    Args:
+        db: Database session
+        current_user: The user the engine is acting for
+        updates: Update dicts with deployment_id and optional status, resources,
+            outputs, logs and deployment_result
+
+    Returns:
+        List of per-deployment results with "deployment_id" and a "result" of
+        "applied", "not_found" or "forbidden"; applied results also carry the
+        deployment's "tenant_id" and whether the update changed its status
+        ("status_changed")
+    """
+    merged = _coalesce_updates(updates)
+    if not merged:
+        return []
+
+    rows = db.query(
+        Deployment.id,
+        Deployment.deployment_id,
+        Deployment.tenant_id,
+        Deployment.status,
+        Deployment.region,
+        Deployment.deployment_type,
+        Deployment.cloud_deployment_id
+    ).filter(
+        Deployment.deployment_id.in_(list(merged))
+    ).order_by(Deployment.id).with_for_update(of=Deployment).all()
+    rows_by_deployment_id = {row.deployment_id: row for row in rows}
+
+    # Check update permission once per tenant rather than once per deployment
+    tenant_allowed = user_has_permission_in_tenants(
+        current_user, "update:deployments", {row.tenant_id for row in rows}
+    )
+
+    results = []
+    applicable = []
+    for deployment_id, update_data in merged.items():
+        row = rows_by_deployment_id.get(deployment_id)
+        if not row:
+            results.append({"deployment_id": deployment_id, "result": "not_found"})
+        elif not tenant_allowed[row.tenant_id]:
+            results.append({"deployment_id": deployment_id, "result": "forbidden"})
+        else:
+            status_value = update_data.get("status")
+            status_changed = bool(status_value) and status_value != row.status
+            applicable.append((row, update_data, status_changed))
+            results.append({
+                "deployment_id": deployment_id,
+                "result": "applied",
+                "status": status_value,
+                "tenant_id": row.tenant_id,
+                "status_changed": status_changed
+            })
+
+    if not applicable:
+        return results
+
+    now = datetime.utcnow()
+
+    # Load the current details state the deltas are computed against
+    details_rows = db.query(
+        DeploymentDetails.deployment_id,
+        DeploymentDetails.id,
+        DeploymentDetails.cloud_resources,
+        DeploymentDetails.outputs,
+        DeploymentDetails.logs
+    ).filter(
+        DeploymentDetails.deployment_id.in_([row.id for row, _, _ in applicable])
+    ).all()
+    details_by_deployment = {details.deployment_id: details for details in details_rows}
+
+    # Create missing deployment details rows in one INSERT
+    details_ids = {deployment_pk: details.id for deployment_pk, details in details_by_deployment.items()}
+    missing = [row for row, _, _ in applicable if row.id not in details_ids]
+    if missing:
+        inserted = db.execute(
+            insert(DeploymentDetails).returning(DeploymentDetails.deployment_id, DeploymentDetails.id),
+            [
+                {
+                    "deployment_id": row.id,
+                    "provider": "azure",
+                    "deployment_type": row.deployment_type or "arm",
+                    "cloud_deployment_id": row.cloud_deployment_id,
+                    "cloud_properties": {"location": row.region} if row.region else None,
+                    "status": "in_progress"
+                }
+                for row in missing
+            ]
+        )
+        details_ids.update({deployment_pk: details_pk for deployment_pk, details_pk in inserted})
+
+    deployment_updates = []
+    details_updates = []
+    history_entries = []
+    stat_deltas = TenantStatDeltas()
+    for row, update_data, status_changed in applicable:
+        status_value = update_data.get("status")
+        resources = update_data.get("resources")
+        outputs = update_data.get("outputs")
+        logs = update_data.get("logs")
+
+        previous = details_by_deployment.get(row.id)
+        delta = compute_status_delta(
+            {
+                "resources": previous.cloud_resources if previous else None,
+                "outputs": previous.outputs if previous else None,
+                "logs": previous.logs if previous else None
+            },
+            {"resources": resources, "outputs": outputs, "logs": logs}
+        )
+
+        # Nothing changed since the last callback: no writes at all
+        if not status_changed and not delta and previous is not None:
+            continue
+
+        details_values = {"id": details_ids[row.id], "updated_at": now}
+        if status_value:
+            details_values["status"] = status_value
+            if status_value in TERMINAL_STATUSES:
+                details_values["completed_at"] = now
+        if status_changed:
+            deployment_updates.append({"id": row.id, "status": status_value, "updated_at": now})
+            stat_deltas.deployment_status(row.tenant_id, row.status, status_value)
+        if "resources" in delta:
+            details_values["cloud_resources"] = resources
+        if "outputs" in delta:
+            details_values["outputs"] = outputs
+        if "logs" in delta:
+            details_values["logs"] = logs
+        details_updates.append(details_values)
+
+        # The first entry for a deployment also records the engine's deployment result
+        if previous is None and update_data.get("deployment_result"):
+            delta["deployment_result"] = update_data["deployment_result"]
+
+        history_entries.append({
+            "deployment_id": row.id,
+            "status": status_value or row.status,
+            "message": _history_message(status_value if status_changed else None, delta),
+            "details": {"delta": delta},
+            "user_id": current_user.id,
+            "created_at": now
+        })
+
+    # Bulk UPDATE by primary key and bulk INSERT of history rows
+    if deployment_updates:
+        db.execute(update(Deployment), deployment_updates)
+        stat_deltas.apply(db)
+    if details_updates:
+        db.execute(update(DeploymentDetails), details_updates)
+    if history_entries:
+        db.execute(insert(DeploymentHistory), history_entries)
+
+    return results
+
+
+def _resource_key(resource: Dict[str, Any]) -> str:
+    """Identify a resource across polls by its ID, falling back to its content."""
+    return str(resource.get("id") or json.dumps(resource, sort_keys=True, default=str))
+
+
+def compute_status_delta(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compute the compact change between two deployment states.
+
+    Only fields present (non-empty) in the current state are compared, matching how
+    status updates are applied to the details row.
+
+    Args:
+        previous: Dict with the stored "resources", "outputs" and "logs"
+        current: Dict with the reported "resources", "outputs" and "logs"
+
+    Returns:
+        Dict with any of "resources" ({"upserted", "removed"}), "outputs" ({"set", "removed"})
+        and "logs" ({"appended"} or {"reset"}); empty if nothing changed
+    """
+    delta = {}
+
+    resources = current.get("resources")
+    if resources:
+        previous_resources = {_resource_key(r): r for r in previous.get("resources") or []}
+        current_resources = {_resource_key(r): r for r in resources}
+        upserted = [r for key, r in current_resources.items() if previous_resources.get(key) != r]
+        removed = [key for key in previous_resources if key not in current_resources]
+        if upserted or removed:
+            delta["resources"] = {"upserted": upserted, "removed": removed}
+
+    outputs = current.get("outputs")
+    if outputs:
+        previous_outputs = previous.get("outputs") or {}
+        changed = {key: value for key, value in outputs.items() if previous_outputs.get(key, _MISSING) != value}
+        removed = [key for key in previous_outputs if key not in outputs]
+        if changed or removed:
+            delta["outputs"] = {"set": changed, "removed": removed}
+
+    logs = current.get("logs")
+    if logs:
+        previous_logs = previous.get("logs") or []
+        if len(logs) >= len(previous_logs) and logs[:len(previous_logs)] == previous_logs:
+            if len(logs) > len(previous_logs):
+                delta["logs"] = {"appended": logs[len(previous_logs):]}
+        else:
+            # The engine's log no longer extends the stored one; store it in full
+            delta["logs"] = {"reset": logs}
+
+    return delta
+
+
+def _history_message(new_status: Optional[str], delta: Dict[str, Any]) -> str:
+    """Summarize a history entry for display."""
+    if new_status:
+        return f"Deployment status updated to {new_status}"
+
+    parts = []
+    if "resources" in delta:
+        parts.append(f"{len(delta['resources']['upserted'])} resources changed")
+    if "outputs" in delta:
+        parts.append("outputs updated")
+    if "logs" in delta:
+        parts.append(f"{len(delta['logs'].get('appended', delta['logs'].get('reset', [])))} new log entries")
+    return "Deployment progress: " + ", ".join(parts) if parts else "Deployment status reported"
+
+
+def rebuild_snapshots(history: List[DeploymentHistory]) -> List[Dict[str, Any]]:
+    """
+    Rebuild the full deployment state after each history entry.
+
+    Entries written before deltas were introduced hold full snapshots in their
+    details and are applied as such.
+
+    Args:
+        history: History entries in chronological order
+
+    Returns:
+        List of snapshots ({"status", "resources", "outputs", "logs"}), one per entry
+    """
+    status_value = None
+    resources = OrderedDict()
+    outputs = {}
+    logs = []
+    snapshots = []
+
+    for entry in history:
+        details = entry.details or {}
+        status_value = entry.status or status_value
+
+        if "delta" in details:
+            delta = details["delta"] or {}
+            if "resources" in delta:
+                for key in delta["resources"].get("removed", []):
+                    resources.pop(key, None)
+                for resource in delta["resources"].get("upserted", []):
+                    resources[_resource_key(resource)] = resource
+            if "outputs" in delta:
+                for key in delta["outputs"].get("removed", []):
+                    outputs.pop(key, None)
+                outputs.update(delta["outputs"].get("set", {}))
+            if "logs" in delta:
+                if "reset" in delta["logs"]:
+                    logs = list(delta["logs"]["reset"])
+                else:
+                    logs.extend(delta["logs"].get("appended", []))
+        else:
+            if details.get("resources"):
+                resources = OrderedDict((_resource_key(r), r) for r in details["resources"])
+            if details.get("outputs"):
+                outputs = dict(details["outputs"])
+            if details.get("logs"):
+                logs = list(details["logs"])
+
+        snapshots.append({
+            "status": status_value,
+            "resources": list(resources.values()),
+            "outputs": dict(outputs),
+            "logs": list(logs)
+        })
+
+    return snapshots
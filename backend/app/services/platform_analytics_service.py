@@ -0,0 +1,282 @@
+"""
+Platform analytics service computing the MSP platform metrics.
+
+Every metric (users per tenant and role, deployments per tenant and status, growth
+over time) is computed over all tenants at once with a few grouped queries, instead
+of one count per tenant or role. Analytics for the time ranges in
+PLATFORM_ANALYTICS_SNAPSHOT_RANGES are stored as snapshots that a background thread
+refreshes every PLATFORM_ANALYTICS_REFRESH_SECONDS, so the analytics page reads one row.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, literal, select, text, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.deployment import Deployment
+from app.models.platform_analytics import PlatformAnalyticsSnapshot
+from app.models.tenant_stats import TenantStat
+from app.models.user import Role, Tenant, User
+from app.models.user_tenant_assignment import UserTenantAssignment
+from app.services.tenant_stats_service import DEPLOYMENTS_BY_STATUS, UNKNOWN
+
+logger = logging.getLogger(__name__)
+
+# Growth is reported per day up to this range, per month beyond it and for all time
+GROWTH_DAILY_MAX_DAYS = 92
+
+# Serialises snapshot refreshes across API processes
+SNAPSHOT_REFRESH_LOCK_ID = 727_001
+
+
+def count_tenant_users(db: Session, tenant_ids: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """
+    Count the active tenant assignments of non-MSP users per tenant, in one query.
+
+    Args:
+        db: Database session
+        tenant_ids: Tenants to count (default: all)
+
+    Returns:
+        Number of users per tenant ID; tenants without users are missing
+    """
+    query = db.query(UserTenantAssignment.tenant_id, func.count(UserTenantAssignment.id)).join(
+        User, User.id == UserTenantAssignment.user_id
+    ).filter(
+        UserTenantAssignment.is_active == True,
+        User.is_msp_user == False
+    )
+    if tenant_ids is not None:
+        query = query.filter(UserTenantAssignment.tenant_id.in_(list(tenant_ids)))
+    return dict(query.group_by(UserTenantAssignment.tenant_id).all())
+
+
+def _deployment_status_counts(db: Session, start: Optional[datetime]) -> List[Any]:
+    """(tenant_id, status, count) rows, from the tenant_stats rollup unless limited to a time range."""
+    if start is None:
+        return db.query(TenantStat.tenant_id, TenantStat.dimension, TenantStat.value).filter(
+            TenantStat.metric == DEPLOYMENTS_BY_STATUS,
+            TenantStat.value != 0
+        ).all()
+
+    deployment_status = func.coalesce(Deployment.status, UNKNOWN)
+    return db.query(Deployment.tenant_id, deployment_status, func.count(Deployment.id)).filter(
+        Deployment.tenant_id.isnot(None),
+        Deployment.created_at >= start
+    ).group_by(Deployment.tenant_id, deployment_status).all()
+
+
+def _growth(db: Session, start: Optional[datetime], bucket: str) -> List[Dict[str, Any]]:
+    """New tenants, tenant users and deployments per period, in one query."""
+    def counted(series: str, created_at, counted_column, *criteria):
+        period = func.date_trunc(bucket, created_at)
+        criteria = [created_at.isnot(None), *criteria]
+        if start is not None:
+            criteria.append(created_at >= start)
+        return select(literal(series), period, func.count(counted_column)).where(*criteria).group_by(period)
+
+    query = union_all(
+        counted("tenants", Tenant.date_created, Tenant.id),
+        counted(
+            "tenant_users",
+            UserTenantAssignment.created_at,
+            UserTenantAssignment.id,
+            UserTenantAssignment.user_id == User.id,
+            User.is_msp_user == False
+        ),
+        counted("deployments", Deployment.created_at, Deployment.id)
+    )
+
+    periods: Dict[str, Dict[str, Any]] = {}
+    for series, period, count in db.execute(query):
+        key = period.date().isoformat()
+        periods.setdefault(key, {"period": key, "tenants": 0, "tenant_users": 0, "deployments": 0})[series] = count
+    return [periods[key] for key in sorted(periods)]
+
+
+def compute_platform_analytics(db: Session, days: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Compute all platform metrics.
+
+    User totals and user distributions describe the platform now; deployment counts
+    and growth are limited to the time range.
+
+    Args:
+        db: Database session
+        days: Only count deployments and growth of the last days (default: all time)
+
+    Returns:
+        JSON-serialisable analytics
+    """
+    now = datetime.utcnow()
+    start = now - timedelta(days=days) if days else None
+    bucket = "day" if days and days <= GROWTH_DAILY_MAX_DAYS else "month"
+
+    tenants = db.query(Tenant.tenant_id, Tenant.name).filter(Tenant.is_active == True).order_by(Tenant.id).all()
+    role_names = dict(db.query(Role.id, Role.name).order_by(Role.id).all())
+
+    total_users, total_msp_users = db.query(
+        func.count(User.id).filter(User.is_msp_user == False),
+        func.count(User.id).filter(User.is_msp_user == True)
+    ).one()
+
+    # Users per tenant and per role from one grouped count
+    assignment_counts = db.query(
+        UserTenantAssignment.tenant_id,
+        UserTenantAssignment.role_id,
+        func.count(UserTenantAssignment.id)
+    ).join(
+        User, User.id == UserTenantAssignment.user_id
+    ).filter(
+        UserTenantAssignment.is_active == True,
+        User.is_msp_user == False
+    ).group_by(UserTenantAssignment.tenant_id, UserTenantAssignment.role_id).all()
+
+    role_distribution = {name: 0 for name in role_names.values()}
+    users_by_tenant: Dict[str, int] = {}
+    for tenant_id, role_id, count in assignment_counts:
+        if role_id in role_names:
+            role_distribution[role_names[role_id]] += count
+        users_by_tenant[tenant_id] = users_by_tenant.get(tenant_id, 0) + count
+
+    deployments_by_tenant: Dict[str, Dict[str, int]] = {}
+    deployments_by_status: Dict[str, int] = {}
+    for tenant_id, deployment_status, count in _deployment_status_counts(db, start):
+        deployments_by_tenant.setdefault(tenant_id, {})[deployment_status] = count
+        deployments_by_status[deployment_status] = deployments_by_status.get(deployment_status, 0) + count
+
+    tenant_stats = []
+    for tenant_id, name in tenants:
+        status_counts = deployments_by_tenant.get(tenant_id, {})
+        tenant_stats.append({
+            "tenant_id": tenant_id,
+            "tenant_name": name,
+            "user_count": users_by_tenant.get(tenant_id, 0),
+            "deployment_count": sum(status_counts.values()),
+            "deployments_by_status": status_counts
+        })
+
+    return {
+        "total_tenants": len(tenants),
+        "total_users": total_users,
+        "total_msp_users": total_msp_users,
+        "total_deployments": sum(deployments_by_status.values()),
+        "role_distribution": role_distribution,
+        "deployments_by_status": deployments_by_status,
+        "tenant_stats": tenant_stats,
+        "growth": {"bucket": bucket, "series": _growth(db, start, bucket)},
+        "time_range": {"days": days, "start": start.isoformat() if start else None},
+        "computed_at": now.isoformat()
+    }
+
+
+def _store_snapshot(db: Session, range_days: int, analytics: Dict[str, Any]):
+    stmt = insert(PlatformAnalyticsSnapshot).values(
+        range_days=range_days,
+        computed_at=datetime.fromisoformat(analytics["computed_at"]),
+        data=analytics
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[PlatformAnalyticsSnapshot.range_days],
+        set_={"computed_at": stmt.excluded.computed_at, "data": stmt.excluded.data}
+    ))
+
+
+def get_platform_analytics(db: Session, days: Optional[int] = None, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Get platform analytics, from a snapshot when one is kept for the time range.
+
+    Snapshots older than two refresh intervals (the refresher is not running) are
+    recomputed rather than served.
+
+    Args:
+        db: Database session
+        days: Time range in days (default: all time)
+        refresh: Compute the analytics now instead of reading the snapshot
+
+    Returns:
+        The analytics, as returned by compute_platform_analytics
+    """
+    range_days = days or 0
+    interval = settings.PLATFORM_ANALYTICS_REFRESH_SECONDS
+    snapshotted = interval > 0 and range_days in settings.PLATFORM_ANALYTICS_SNAPSHOT_RANGES
+
+    if snapshotted and not refresh:
+        snapshot = db.query(PlatformAnalyticsSnapshot).filter(
+            PlatformAnalyticsSnapshot.range_days == range_days
+        ).first()
+        if snapshot and datetime.utcnow() - snapshot.computed_at <= timedelta(seconds=2 * interval):
+            return snapshot.data
+
+    analytics = compute_platform_analytics(db, days)
+    if snapshotted:
+        _store_snapshot(db, range_days, analytics)
+        db.commit()
+    return analytics
+
+
+def refresh_snapshots(db: Session, max_age: float):
+    """
+    Recompute the snapshots older than max_age seconds.
+
+    Only one process refreshes at a time; the others skip the round.
+
+    Args:
+        db: Database session
+        max_age: Age in seconds at which a snapshot is recomputed
+    """
+    locked = db.execute(text("SELECT pg_try_advisory_xact_lock(:lock_id)"), {"lock_id": SNAPSHOT_REFRESH_LOCK_ID}).scalar()
+    if not locked:
+        return
+
+    computed_at = dict(db.query(PlatformAnalyticsSnapshot.range_days, PlatformAnalyticsSnapshot.computed_at).all())
+    stale_before = datetime.utcnow() - timedelta(seconds=max_age)
+    for range_days in settings.PLATFORM_ANALYTICS_SNAPSHOT_RANGES:
+        if range_days in computed_at and computed_at[range_days] > stale_before:
+            continue
+        _store_snapshot(db, range_days, compute_platform_analytics(db, range_days or None))
+        logger.info(f"Platform analytics snapshot refreshed for range {range_days or 'all'} days")
+    db.commit()
+
+
+class PlatformAnalyticsRefresher:
+    """
+    Background thread refreshing the platform analytics snapshots on a schedule.
+    """
+
+    def __init__(self, interval: int, session_factory: Callable[[], Session]):
+        self.interval = interval
+        self.session_factory = session_factory
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="platform-analytics-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            db = self.session_factory()
+            try:
+                # A little early, so snapshots are refreshed every interval rather than every other
+                refresh_snapshots(db, max_age=self.interval * 0.9)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Error refreshing platform analytics snapshots: {e}")
+            finally:
+                db.close()
+            if self._stop.wait(self.interval):
+                return
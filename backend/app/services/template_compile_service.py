@@ -0,0 +1,58 @@
+"""
+Template compile service warming the deployment engine's compiled template cache.
+
+When a template version is saved, the engine is asked to compile it (parse the ARM
+JSON, build Bicep to ARM) so the version's first deployment already finds it compiled.
+"""
+import logging
+from typing import Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Template types the deployment engine compiles
+COMPILED_TEMPLATE_TYPES = {"arm", "bicep"}
+
+# Bicep builds run the Azure CLI and may take a while
+TEMPLATE_COMPILE_TIMEOUT = 120  # seconds
+
+
+def precompile_template(template_id: str, version: Optional[str], template_type: Optional[str],
+                        code: Optional[str], access_token: str):
+    """
+    Have the deployment engine compile a template version into its cache.
+
+    Meant to run as a background task after the version is committed; failures are only
+    logged, since the engine compiles templates it has not cached when they are deployed.
+
+    Args:
+        template_id: The template's template_id
+        version: The version saved
+        template_type: The template's type (only ARM and Bicep templates are compiled)
+        code: The version's code
+        access_token: Token of the user who saved the version
+    """
+    deployment_type = (template_type or "").lower()
+    if deployment_type not in COMPILED_TEMPLATE_TYPES or not code:
+        return
+
+    # Imported here, like the other engine calls outside the deployments endpoints
+    from app.api.endpoints.deployments import DEPLOYMENT_ENGINE_URL
+
+    try:
+        response = requests.post(
+            f"{DEPLOYMENT_ENGINE_URL}/templates/compile",
+            headers={"Authorization": f"Bearer {access_token}"},
+            json={
+                "template_id": template_id,
+                "version": version,
+                "deployment_type": deployment_type,
+                "code": code
+            },
+            timeout=TEMPLATE_COMPILE_TIMEOUT
+        )
+        if response.status_code != 200:
+            logger.warning(f"Deployment engine did not compile template {template_id} {version}: {response.text}")
+    except requests.RequestException as e:
+        logger.warning(f"Error precompiling template {template_id} {version}: {str(e)}")
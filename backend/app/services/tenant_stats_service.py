@@ -0,0 +1,323 @@
+"""
+Tenant statistics service maintaining the tenant_stats rollup.
+
+Dashboard counters (deployments by status, provider and day, templates by provider
+and category, cloud accounts) are kept as per-tenant counters that the endpoints changing those
+resources adjust in the same transaction, so reading them is a primary key lookup
+instead of a COUNT/GROUP BY over the base tables. rebuild_tenant_stats() recomputes
+the counters from the base tables to repair drift (see rebuild_tenant_stats.py).
+"""
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, distinct, func, literal, select, union_all
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.models.deployment import CloudAccount, Deployment, Environment, Template, environment_cloud_account
+from app.models.tenant_stats import TenantStat
+
+logger = logging.getLogger(__name__)
+
+# Metrics of the rollup; each counter is (tenant_id, metric, dimension)
+DEPLOYMENTS_BY_STATUS = "deployments_by_status"
+DEPLOYMENTS_BY_PROVIDER = "deployments_by_provider"
+DEPLOYMENTS_BY_DAY = "deployments_by_day"
+TEMPLATES_BY_PROVIDER = "templates_by_provider"
+TEMPLATES_BY_CATEGORY = "templates_by_category"
+CLOUD_ACCOUNTS = "cloud_accounts"
+
+UNKNOWN = "unknown"
+
+StatKey = Tuple[str, str, str]
+
+
+def deployment_provider(environment: Optional[Environment]) -> str:
+    """The provider a deployment is counted under: its environment's first cloud account's."""
+    if environment and environment.cloud_accounts:
+        return min(environment.cloud_accounts, key=lambda account: account.id).provider or UNKNOWN
+    return UNKNOWN
+
+
+def deployment_provider_expression():
+    """
+    SQL expression of the provider a row of the deployments table is counted under.
+
+    That is the provider stored with the deployment at creation; deployments without
+    one fall back to deployment_provider() of their environment.
+    """
+    first_account_provider = (
+        select(CloudAccount.provider)
+        .join(environment_cloud_account, environment_cloud_account.c.cloud_account_id == CloudAccount.id)
+        .where(environment_cloud_account.c.environment_id == Deployment.environment_id)
+        .order_by(CloudAccount.id)
+        .limit(1)
+        .correlate(Deployment)
+        .scalar_subquery()
+    )
+    return func.coalesce(Deployment.provider, first_account_provider, UNKNOWN)
+
+
+def deployment_provider_counts_query(*criteria):
+    """
+    Set-based count of deployments per (tenant, provider), for deployments matching criteria.
+
+    Rows are (tenant_id, provider, count). The provider is found per deployment by a
+    correlated subquery and grouped outside it.
+    """
+    deployment_providers = (
+        select(Deployment.tenant_id, deployment_provider_expression().label("provider"))
+        .where(*criteria)
+        .subquery()
+    )
+    return (
+        select(deployment_providers.c.tenant_id, deployment_providers.c.provider, func.count().label("deployments"))
+        .group_by(deployment_providers.c.tenant_id, deployment_providers.c.provider)
+    )
+
+
+def template_categories(category: Any) -> List[str]:
+    """The categories a template is counted under: the distinct non-blank entries of its category array."""
+    if not isinstance(category, list):
+        return []
+    return sorted({entry.strip() for entry in category if isinstance(entry, str) and entry.strip()})
+
+
+def template_category_counts_query(*criteria):
+    """
+    Set-based count of templates per (tenant, category), for templates matching criteria.
+
+    Rows are (tenant_id, category, count). The JSON category arrays are unnested in
+    SQL; a template listing a category twice is counted once.
+    """
+    template_categories_subquery = (
+        select(
+            Template.id,
+            Template.tenant_id,
+            func.btrim(func.json_array_elements_text(Template.category)).label("category")
+        )
+        .where(func.json_typeof(Template.category) == "array", *criteria)
+        .subquery()
+    )
+    return (
+        select(
+            template_categories_subquery.c.tenant_id,
+            template_categories_subquery.c.category,
+            func.count(distinct(template_categories_subquery.c.id)).label("templates")
+        )
+        .where(template_categories_subquery.c.category != "")
+        .group_by(template_categories_subquery.c.tenant_id, template_categories_subquery.c.category)
+    )
+
+
+def count_templates_by_category(db: Session, *criteria) -> Dict[str, int]:
+    """
+    Count templates per category from the base tables in one query.
+
+    Args:
+        db: Database session
+        criteria: Filters on the templates to count (default: all templates)
+
+    Returns:
+        Number of templates per category
+    """
+    counts: Dict[str, int] = {}
+    for _, category, count in db.execute(template_category_counts_query(*criteria)):
+        counts[category] = counts.get(category, 0) + count
+    return counts
+
+
+def count_deployments_by_provider(db: Session, tenant_id: str) -> Dict[str, int]:
+    """
+    Count a tenant's deployments per provider from the base tables in one query.
+
+    Args:
+        db: Database session
+        tenant_id: The tenant
+
+    Returns:
+        Number of deployments per provider
+    """
+    query = deployment_provider_counts_query(Deployment.tenant_id == tenant_id)
+    return {provider: count for _, provider, count in db.execute(query)}
+
+
+class TenantStatDeltas:
+    """
+    Accumulates changes to tenant_stats counters so they are applied in one statement.
+    """
+
+    def __init__(self):
+        self._deltas: Dict[StatKey, int] = {}
+
+    def add(self, tenant_id: Optional[str], metric: str, dimension: Optional[str], delta: int) -> "TenantStatDeltas":
+        # Resources without a tenant (e.g. public templates) are not counted
+        if tenant_id is None or not delta:
+            return self
+        key = (tenant_id, metric, dimension if dimension is not None else UNKNOWN)
+        self._deltas[key] = self._deltas.get(key, 0) + delta
+        return self
+
+    def deployment(self, tenant_id: Optional[str], status: Optional[str], provider: str,
+                   created_at: Optional[datetime], sign: int = 1) -> "TenantStatDeltas":
+        """Count a created (sign=1) or deleted (sign=-1) deployment."""
+        self.add(tenant_id, DEPLOYMENTS_BY_STATUS, status, sign)
+        self.add(tenant_id, DEPLOYMENTS_BY_PROVIDER, provider, sign)
+        if created_at is not None:
+            self.add(tenant_id, DEPLOYMENTS_BY_DAY, created_at.date().isoformat(), sign)
+        return self
+
+    def deployment_status(self, tenant_id: Optional[str], old_status: Optional[str],
+                          new_status: Optional[str]) -> "TenantStatDeltas":
+        """Move a deployment from one status counter to another."""
+        if old_status != new_status:
+            self.add(tenant_id, DEPLOYMENTS_BY_STATUS, old_status, -1)
+            self.add(tenant_id, DEPLOYMENTS_BY_STATUS, new_status, 1)
+        return self
+
+    def template(self, tenant_id: Optional[str], provider: Optional[str], category: Any = None,
+                 sign: int = 1) -> "TenantStatDeltas":
+        """Count a created (sign=1) or deleted (sign=-1) template."""
+        self.add(tenant_id, TEMPLATES_BY_PROVIDER, provider, sign)
+        return self.template_categories(tenant_id, category, sign)
+
+    def template_categories(self, tenant_id: Optional[str], category: Any, sign: int = 1) -> "TenantStatDeltas":
+        """Count (sign=1) or uncount (sign=-1) a template under the categories of its category array."""
+        for name in template_categories(category):
+            self.add(tenant_id, TEMPLATES_BY_CATEGORY, name, sign)
+        return self
+
+    def cloud_account(self, tenant_id: Optional[str], sign: int = 1) -> "TenantStatDeltas":
+        """Count a created (sign=1) or deleted (sign=-1) cloud account."""
+        return self.add(tenant_id, CLOUD_ACCOUNTS, "", sign)
+
+    def apply(self, db: Session):
+        """
+        Apply the accumulated changes as part of the session's transaction.
+
+        Args:
+            db: Database session; the changes are committed with it
+        """
+        # Upsert in key order so concurrent transactions lock counters in the same order
+        rows = [
+            {"tenant_id": tenant_id, "metric": metric, "dimension": dimension, "value": delta}
+            for (tenant_id, metric, dimension), delta in sorted(self._deltas.items())
+            if delta
+        ]
+        self._deltas = {}
+        if not rows:
+            return
+        stmt = insert(TenantStat).values(rows)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[TenantStat.tenant_id, TenantStat.metric, TenantStat.dimension],
+            set_={"value": TenantStat.value + stmt.excluded.value}
+        ))
+
+
+def set_deployment_status(db: Session, deployment: Deployment, new_status: Optional[str]):
+    """
+    Set a deployment's status and move it between status counters as part of the session's transaction.
+
+    The deployment row is locked and its current status read from the database, so
+    concurrent updates of the same deployment wait for each other and every
+    transition is counted once.
+    """
+    old_status = db.query(Deployment.status).filter(Deployment.id == deployment.id).with_for_update().scalar()
+    TenantStatDeltas().deployment_status(deployment.tenant_id, old_status, new_status).apply(db)
+    deployment.status = new_status
+
+
+def read_tenant_stats(db: Session, tenant_id: str) -> Dict[str, Dict[str, int]]:
+    """
+    Read all counters of a tenant.
+
+    Args:
+        db: Database session
+        tenant_id: The tenant
+
+    Returns:
+        Non-zero counter values by metric and dimension
+    """
+    stats: Dict[str, Dict[str, int]] = {}
+    rows = db.query(TenantStat.metric, TenantStat.dimension, TenantStat.value).filter(
+        TenantStat.tenant_id == tenant_id,
+        TenantStat.value != 0
+    )
+    for metric, dimension, value in rows:
+        stats.setdefault(metric, {})[dimension] = value
+    return stats
+
+
+def _computed_stats_query(tenant_ids: Optional[List[str]]):
+    """The counters as computed from the base tables, as (tenant_id, metric, dimension, value) rows."""
+    def scoped(model):
+        criteria = [model.tenant_id.isnot(None)]
+        if tenant_ids is not None:
+            criteria.append(model.tenant_id.in_(tenant_ids))
+        return criteria
+
+    def grouped(model, metric, dimension, *criteria):
+        return (
+            select(model.tenant_id, literal(metric), dimension, func.count(model.id))
+            .where(*scoped(model), *criteria)
+            .group_by(model.tenant_id, dimension)
+        )
+
+    by_provider = deployment_provider_counts_query(*scoped(Deployment)).subquery()
+    by_category = template_category_counts_query(*scoped(Template)).subquery()
+
+    day = func.to_char(Deployment.created_at, "YYYY-MM-DD")
+    return union_all(
+        grouped(Deployment, DEPLOYMENTS_BY_STATUS, func.coalesce(Deployment.status, UNKNOWN)),
+        select(by_provider.c.tenant_id, literal(DEPLOYMENTS_BY_PROVIDER), by_provider.c.provider, by_provider.c.deployments),
+        grouped(Deployment, DEPLOYMENTS_BY_DAY, day, Deployment.created_at.isnot(None)),
+        grouped(Template, TEMPLATES_BY_PROVIDER, func.coalesce(Template.provider, UNKNOWN)),
+        select(by_category.c.tenant_id, literal(TEMPLATES_BY_CATEGORY), by_category.c.category, by_category.c.templates),
+        select(CloudAccount.tenant_id, literal(CLOUD_ACCOUNTS), literal(""), func.count(CloudAccount.id))
+        .where(*scoped(CloudAccount))
+        .group_by(CloudAccount.tenant_id)
+    )
+
+
+def rebuild_tenant_stats(db: Session, tenant_ids: Optional[Iterable[str]] = None, dry_run: bool = False) -> int:
+    """
+    Recompute counters from the base tables, replacing the stored ones.
+
+    Args:
+        db: Database session; the caller commits
+        tenant_ids: Tenants to rebuild (default: all)
+        dry_run: Only count the counters that drifted, without changing them
+
+    Returns:
+        Number of counters whose stored value differed from the computed one
+    """
+    tenant_ids = list(tenant_ids) if tenant_ids is not None else None
+
+    computed = {
+        (tenant_id, metric, dimension): value
+        for tenant_id, metric, dimension, value in db.execute(_computed_stats_query(tenant_ids))
+    }
+    stored_query = db.query(TenantStat.tenant_id, TenantStat.metric, TenantStat.dimension, TenantStat.value).filter(
+        TenantStat.value != 0
+    )
+    if tenant_ids is not None:
+        stored_query = stored_query.filter(TenantStat.tenant_id.in_(tenant_ids))
+    stored = {(tenant_id, metric, dimension): value for tenant_id, metric, dimension, value in stored_query}
+
+    drifted = sum(1 for key in computed.keys() | stored.keys() if computed.get(key, 0) != stored.get(key, 0))
+    if drifted:
+        logger.warning(f"Tenant stats: {drifted} counters drifted from the base tables")
+    if dry_run:
+        return drifted
+
+    clear = delete(TenantStat)
+    if tenant_ids is not None:
+        clear = clear.where(TenantStat.tenant_id.in_(tenant_ids))
+    db.execute(clear)
+    if computed:
+        db.execute(insert(TenantStat), [
+            {"tenant_id": tenant_id, "metric": metric, "dimension": dimension, "value": value}
+            for (tenant_id, metric, dimension), value in sorted(computed.items())
+        ])
+    return drifted
@@ -0,0 +1,232 @@
+"""
+Widget data service providing the per-tenant aggregates behind dashboard widgets.
+
+Widgets on a dashboard mostly read the same few aggregates (deployment counts by
+status, cloud accounts, template counts, ...). Each aggregate is computed once per
+tenant and kept in a short-lived cache shared by all widgets and users of the tenant.
+Counters come from the tenant_stats rollup (see tenant_stats_service).
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.cloud_settings import CloudSettings
+from app.models.deployment import CloudAccount, Deployment, Environment, Template
+from app.services.tenant_stats_service import (
+    CLOUD_ACCOUNTS,
+    DEPLOYMENTS_BY_DAY,
+    DEPLOYMENTS_BY_PROVIDER,
+    DEPLOYMENTS_BY_STATUS,
+    TEMPLATES_BY_CATEGORY,
+    TEMPLATES_BY_PROVIDER,
+    deployment_provider_expression,
+    read_tenant_stats
+)
+
+
+class WidgetAggregateCache:
+    """
+    Caches widget aggregates per tenant for a TTL.
+
+    Tenants are invalidated explicitly when their deployments, templates or cloud
+    accounts change in this process; changes made elsewhere show after at most ttl
+    seconds.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._entries: Dict[str, Dict[Hashable, Tuple[Any, float, datetime]]] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get_or_compute(self, tenant_id: str, key: Hashable, compute: Callable[[], Any]) -> Tuple[Any, datetime]:
+        """
+        Get a cached aggregate, computing and caching it on a miss.
+
+        Returns:
+            Tuple of the value and the (UTC) time it was computed
+        """
+        with self._lock:
+            entry = self._entries.get(tenant_id, {}).get(key)
+            if entry and time.monotonic() < entry[1]:
+                self._hits += 1
+                return entry[0], entry[2]
+            self._misses += 1
+            generation = self._generations.get(tenant_id, 0)
+
+        computed_at = datetime.utcnow()
+        value = compute()
+
+        with self._lock:
+            # Don't store a value computed before a concurrent invalidation
+            if self.ttl > 0 and generation == self._generations.get(tenant_id, 0):
+                self._entries.setdefault(tenant_id, {})[key] = (value, time.monotonic() + self.ttl, computed_at)
+        return value, computed_at
+
+    def invalidate_tenants(self, tenant_ids: Iterable[Optional[str]]):
+        """Drop all cached aggregates of tenants."""
+        with self._lock:
+            for tenant_id in set(tenant_ids):
+                self._entries.pop(tenant_id, None)
+                self._generations[tenant_id] = self._generations.get(tenant_id, 0) + 1
+                self._invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tenants": len(self._entries),
+                "entries": sum(len(entries) for entries in self._entries.values()),
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "invalidations": self._invalidations
+            }
+
+
+widget_aggregate_cache = WidgetAggregateCache(settings.WIDGET_DATA_CACHE_TTL)
+
+
+def invalidate_widget_data(*tenant_ids: Optional[str]):
+    """
+    Drop cached widget aggregates of tenants whose deployments, templates or cloud
+    accounts changed. Call after the change is committed.
+    """
+    widget_aggregate_cache.invalidate_tenants(tenant_ids)
+
+
+class TenantAggregates:
+    """
+    The aggregates of one tenant, each computed at most once per request (and per
+    cache TTL) and shared by every widget that needs it.
+
+    oldest_computed_at tracks the oldest aggregate read since the last begin_widget().
+    """
+
+    def __init__(self, db: Session, tenant_id: str, cache: WidgetAggregateCache = widget_aggregate_cache):
+        self.db = db
+        self.tenant_id = tenant_id
+        self.cache = cache
+        self.oldest_computed_at: Optional[datetime] = None
+        self._values: Dict[Hashable, Tuple[Any, datetime]] = {}
+
+    def begin_widget(self):
+        """Start tracking the age of the aggregates read for another widget."""
+        self.oldest_computed_at = None
+
+    def _get(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        if key not in self._values:
+            self._values[key] = self.cache.get_or_compute(self.tenant_id, key, compute)
+        value, computed_at = self._values[key]
+        if self.oldest_computed_at is None or computed_at < self.oldest_computed_at:
+            self.oldest_computed_at = computed_at
+        return value
+
+    def tenant_stats(self) -> Dict[str, Dict[str, int]]:
+        """The tenant's counters from the tenant_stats rollup, by metric and dimension."""
+        return self._get("tenant_stats", lambda: read_tenant_stats(self.db, self.tenant_id))
+
+    def deployment_status_counts(self) -> Dict[str, int]:
+        """Number of deployments per status."""
+        return self.tenant_stats().get(DEPLOYMENTS_BY_STATUS, {})
+
+    def cloud_account_count(self) -> int:
+        """Number of cloud accounts."""
+        return self.tenant_stats().get(CLOUD_ACCOUNTS, {}).get("", 0)
+
+    def cloud_accounts(self) -> List[Dict[str, Any]]:
+        """The tenant's cloud accounts."""
+        return self._get("cloud_accounts", lambda: [
+            {
+                "id": account.account_id,
+                "name": account.name,
+                "provider": account.provider,
+                "status": account.status,
+                "description": account.description
+            }
+            for account in self.db.query(
+                CloudAccount.account_id,
+                CloudAccount.name,
+                CloudAccount.provider,
+                CloudAccount.status,
+                CloudAccount.description
+            ).filter(CloudAccount.tenant_id == self.tenant_id).order_by(CloudAccount.id)
+        ])
+
+    def template_provider_counts(self) -> Dict[str, int]:
+        """Number of templates per provider."""
+        return self.tenant_stats().get(TEMPLATES_BY_PROVIDER, {})
+
+    def template_category_counts(self) -> Dict[str, int]:
+        """Number of templates per category."""
+        return self.tenant_stats().get(TEMPLATES_BY_CATEGORY, {})
+
+    def deployment_provider_counts(self) -> Dict[str, int]:
+        """Number of deployments per cloud provider of their environment."""
+        return self.tenant_stats().get(DEPLOYMENTS_BY_PROVIDER, {})
+
+    def deployment_timeline(self, days: int) -> List[Tuple[str, int]]:
+        """Number of deployments created per day over the last days."""
+        start_date = (datetime.utcnow() - timedelta(days=days)).date().isoformat()
+        return sorted(
+            (date, count)
+            for date, count in self.tenant_stats().get(DEPLOYMENTS_BY_DAY, {}).items()
+            if date >= start_date
+        )
+
+    def recent_deployments(self, limit: int) -> List[Dict[str, Any]]:
+        """The most recently created deployments, with environment and provider, in one query."""
+        def compute():
+            rows = self.db.query(
+                Deployment.deployment_id,
+                Deployment.name,
+                Deployment.status,
+                Environment.name.label("environment"),
+                deployment_provider_expression().label("provider"),
+                Deployment.created_at
+            ).outerjoin(
+                Environment, Environment.id == Deployment.environment_id
+            ).filter(
+                Deployment.tenant_id == self.tenant_id
+            ).order_by(Deployment.created_at.desc()).limit(limit)
+
+            return [
+                {
+                    "id": row.deployment_id,
+                    "name": row.name,
+                    "status": row.status,
+                    "environment": row.environment or "Unknown",
+                    "provider": row.provider,
+                    "created_at": row.created_at.isoformat() if row.created_at else None
+                }
+                for row in rows
+            ]
+
+        return self._get(("recent_deployments", limit), compute)
+
+    def setup_counts(self) -> Dict[str, int]:
+        """Counts of active cloud settings, cloud accounts, environments and templates, in one query."""
+        def compute():
+            def count(model, *criteria):
+                return (
+                    select(func.count(model.id))
+                    .where(model.tenant_id == self.tenant_id, *criteria)
+                    .scalar_subquery()
+                )
+
+            row = self.db.execute(select(
+                count(CloudSettings, CloudSettings.is_active == True).label("cloud_settings"),
+                count(CloudAccount).label("cloud_accounts"),
+                count(Environment).label("environments"),
+                count(Template).label("templates")
+            )).one()
+            return dict(row._mapping)
+
+        return self._get("setup_counts", compute)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark dashboard widget queries against a tenant with many deployments.
+
+Creates a synthetic tenant (cloud accounts, environments, a template and up to
+100k deployments) inside a transaction that is rolled back at the end, and reports
+median latency at each size for:
+
+    row-loading       the former by-provider widget: load every deployment and
+                      its environment's cloud accounts, count in Python
+    set-based         one GROUP BY over deployments joined to their environment's
+                      first cloud account (count_deployments_by_provider)
+    tenant_stats      the rollup lookup the widgets read (read_tenant_stats)
+    recent            the recent deployments widget's joined query
+
+Requires the configured PostgreSQL database.
+
+Usage:
+    python benchmark_widget_queries.py [--sizes 1000,10000,100000] [--repeats 5] [--legacy-limit 100000]
+"""
+
+import argparse
+import random
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app.db.session import SessionLocal
+import app.models  # noqa: F401 - register all models with the mapper
+from app.models.deployment import CloudAccount, Deployment, Environment, Template, environment_cloud_account
+from app.models.user import Tenant
+from app.services.tenant_stats_service import count_deployments_by_provider, read_tenant_stats, rebuild_tenant_stats
+from app.services.widget_data_service import TenantAggregates, WidgetAggregateCache
+
+PROVIDERS = ("azure", "aws", "gcp")
+STATUSES = ("pending", "running", "completed", "failed")
+INSERT_BATCH_SIZE = 5000
+
+
+def create_fixture(db):
+    """Create the synthetic tenant with one environment per provider; returns (tenant_id, environment ids, template id)."""
+    tenant = Tenant(name=f"benchmark-{uuid.uuid4().hex[:8]}", description="Widget query benchmark")
+    db.add(tenant)
+    db.flush()
+
+    environment_ids = []
+    for provider in PROVIDERS:
+        account = CloudAccount(name=f"{provider} account", provider=provider, tenant_id=tenant.tenant_id)
+        environment = Environment(name=f"{provider} environment", provider=provider, tenant_id=tenant.tenant_id)
+        db.add_all([account, environment])
+        db.flush()
+        db.execute(insert(environment_cloud_account).values(environment_id=environment.id, cloud_account_id=account.id))
+        environment_ids.append(environment.id)
+
+    template = Template(name="benchmark template", provider="azure", type="arm", tenant_id=tenant.tenant_id)
+    db.add(template)
+    db.flush()
+    return tenant.tenant_id, environment_ids, template.id
+
+
+def add_deployments(db, tenant_id, environment_ids, template_id, count, rng):
+    """Bulk insert count deployments spread over environments, statuses and the last 90 days."""
+    now = datetime.utcnow()
+    for start in range(0, count, INSERT_BATCH_SIZE):
+        db.execute(insert(Deployment), [
+            {
+                "deployment_id": str(uuid.uuid4()),
+                "name": f"deployment-{start + offset}",
+                "status": rng.choice(STATUSES),
+                "parameters": {"location": "westeurope", "sku": "Standard"},
+                "tenant_id": tenant_id,
+                "environment_id": rng.choice(environment_ids),
+                "template_id": template_id,
+                "created_at": now - timedelta(minutes=rng.randrange(90 * 24 * 60))
+            }
+            for offset in range(min(INSERT_BATCH_SIZE, count - start))
+        ])
+
+
+def legacy_provider_counts(db, tenant_id):
+    """The former by-provider widget, loading every deployment row."""
+    provider_counts = {}
+    for deployment in db.query(Deployment).filter(Deployment.tenant_id == tenant_id).all():
+        provider = "unknown"
+        if deployment.environment and deployment.environment.cloud_accounts:
+            provider = deployment.environment.cloud_accounts[0].provider
+        provider_counts[provider] = provider_counts.get(provider, 0) + 1
+    return provider_counts
+
+
+def measure(db, repeats, query):
+    """Median latency of query in milliseconds, each run on a clean identity map."""
+    timings = []
+    for _ in range(repeats):
+        db.expunge_all()
+        started = time.perf_counter()
+        query()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated deployment counts")
+    parser.add_argument("--repeats", type=int, default=5, help="runs per measurement")
+    parser.add_argument("--legacy-limit", type=int, default=100000, help="largest size to run row-loading at")
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+
+    rng = random.Random(42)
+    db = SessionLocal()
+    try:
+        tenant_id, environment_ids, template_id = create_fixture(db)
+        no_cache = WidgetAggregateCache(ttl=0)
+
+        print(f"{'deployments':>12} {'row-loading':>14} {'set-based':>12} {'tenant_stats':>14} {'recent':>10}")
+        created = 0
+        for size in sizes:
+            add_deployments(db, tenant_id, environment_ids, template_id, size - created, rng)
+            created = size
+            rebuild_tenant_stats(db, [tenant_id])
+            db.flush()
+
+            legacy = (
+                f"{measure(db, args.repeats, lambda: legacy_provider_counts(db, tenant_id)):11.1f} ms"
+                if size <= args.legacy_limit else f"{'skipped':>14}"
+            )
+            set_based = measure(db, args.repeats, lambda: count_deployments_by_provider(db, tenant_id))
+            rollup = measure(db, args.repeats, lambda: read_tenant_stats(db, tenant_id))
+            recent = measure(
+                db, args.repeats, lambda: TenantAggregates(db, tenant_id, cache=no_cache).recent_deployments(5)
+            )
+            print(f"{size:>12} {legacy:>14} {set_based:9.1f} ms {rollup:11.2f} ms {recent:7.2f} ms")
+    finally:
+        # Nothing of the fixture is kept
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -18,6 +18,9 @@ from app.models.template_foundry_versions import TemplateFoundryVersion
 from app.models.nexus_ai import NexusAIConfig, NexusAILog
 from app.models.ai_assistant import AIAssistantConfig, AIAssistantLog
 from app.models.dashboard import Dashboard, DashboardWidget, UserWidget
+from app.models.tenant_stats import TenantStat
+from app.models.platform_analytics import PlatformAnalyticsSnapshot
+from app.models.code_blob import CodeBlob
 from app.db.session import Base
 
 logging.basicConfig(level=logging.INFO)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Rebuild the tenant_stats rollup from the base tables.
+
+The dashboard counters in tenant_stats are maintained incrementally; changes made
+outside the API (manual SQL, restores, failed requests) can make them drift. This
+recomputes them and reports how many counters were off. Running API processes pick
+up the rebuilt counters once their widget data cache expires (WIDGET_DATA_CACHE_TTL).
+
+Usage:
+    python rebuild_tenant_stats.py [--tenant TENANT_ID ...] [--check]
+"""
+
+import argparse
+import logging
+import sys
+
+from app.db.session import SessionLocal
+import app.models  # noqa: F401 - register all models with the mapper
+from app.services.tenant_stats_service import rebuild_tenant_stats
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenant", action="append", dest="tenant_ids", help="tenant to rebuild (default: all)")
+    parser.add_argument("--check", action="store_true", help="only report drifted counters; exit 1 if any")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        drifted = rebuild_tenant_stats(db, args.tenant_ids, dry_run=args.check)
+        if args.check:
+            logger.info(f"{drifted} counters drifted")
+            return 1 if drifted else 0
+        db.commit()
+        logger.info(f"Tenant stats rebuilt; {drifted} counters were corrected")
+        return 0
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,8 +9,17 @@ import uuid
 import logging
 import threading
 import time
-from deploy.azure import AzureDeployer
+import re
+from concurrent.futures import ThreadPoolExecutor
+from deploy.azure import AzureDeployer, compile_template
 from credential_manager import credential_manager
+from shared.db_pool import get_pool_stats
+from status_tracker import DeploymentStatusTracker, progress_fingerprint
+from state_store import DeploymentStateStore
+from token_validator import TokenValidator
+from status_batcher import StatusBatcher
+from template_cache import CompiledTemplateCache
+from bicep_compiler import bicep_compiler
 from azure.mgmt.resourcegraph import ResourceGraphClient
 from azure.mgmt.resourcegraph.models import QueryRequest
 
@@ -32,121 +41,172 @@ app.add_middleware(
 # API settings
 API_URL = os.getenv("API_URL", "http://api:8000")
 
-# In-memory storage for deployments (would be replaced with a database in production)
-deployments = {}
+# Durable deployment state, shared by all engine nodes through the database
+state_store = DeploymentStateStore(credential_manager.engine)
 
-# Active polling threads
-polling_threads = {}
+# Compiled ARM templates, shared by all engine nodes through the database
+compiled_template_cache = CompiledTemplateCache(credential_manager.engine)
 
-def poll_deployment_status(deployment_id, resource_group, azure_deployment_id, access_token, tenant_id):
+# Coalesces status updates for the backend into periodic batches
+status_batcher = StatusBatcher(API_URL)
+
+# Bulk deployment submission
+BULK_DEPLOY_WORKERS = int(os.getenv("BULK_DEPLOY_WORKERS", "8"))  # deployments started concurrently
+BULK_DEPLOY_MAX_ITEMS = int(os.getenv("BULK_DEPLOY_MAX_ITEMS", "100"))
+bulk_deploy_executor = ThreadPoolExecutor(max_workers=BULK_DEPLOY_WORKERS, thread_name_prefix="bulk-deploy")
+
+# How often leases are renewed and orphaned deployments are claimed
+LEASE_RENEW_INTERVAL = max(state_store.lease_seconds // 3, 1)
+
+def poll_deployment_status(tracked):
     """
-    Background task to poll for deployment status updates
+    Poll Azure once for a tracked deployment and forward the status to the backend.
+    Called by the status tracker on one of its worker threads.
     
     Args:
-        deployment_id: The deployment ID from the backend
-        resource_group: The Azure resource group
-        azure_deployment_id: The Azure deployment ID
-        access_token: The user's access token for authentication
-        tenant_id: The user's tenant ID
+        tracked: The TrackedDeployment being polled
+        
+    Returns:
+        dict: The Azure status result, or None if the deployment can no longer be polled
     """
-    logger.info(f"Starting status polling for deployment {deployment_id}")
-    logger.info(f"Resource group: {resource_group}, Azure deployment ID: {azure_deployment_id}")
+    deployment_id = tracked.deployment_id
+    tenant_id = tracked.tenant_id
+    
+    # Get tenant-specific Azure deployer with fresh credentials
+    azure_deployer = credential_manager.create_azure_deployer_for_tenant(
+        tenant_id
+    )
+    if not azure_deployer:
+        logger.error(f"Failed to get Azure deployer for tenant {tenant_id}")
+        return None
+    
+    # Get deployment status from Azure
+    logger.info(f"Polling Azure for deployment status: {tracked.azure_deployment_id}")
+    azure_status = azure_deployer.get_deployment_status(
+        resource_group=tracked.resource_group,
+        deployment_name=tracked.azure_deployment_id
+    )
+    
+    status = azure_status.get("status", "in_progress")
+    resources = azure_status.get("resources", [])
+    outputs = azure_status.get("outputs", {})
+    logs = azure_status.get("logs", [])
     
+    logger.info(f"Deployment {deployment_id} status: {status}")
+    logger.info(f"Resources: {len(resources)}, Outputs: {len(outputs) if outputs else 0}, Logs: {len(logs)}")
+    
+    # Persist and report the state only when the poll shows a change
+    if progress_fingerprint(azure_status) != tracked.last_fingerprint:
+        if state_store.update_status(deployment_id, status, resources, outputs, logs):
+            logger.info(f"Updated stored state for deployment {deployment_id}")
+        else:
+            logger.warning(f"Deployment {deployment_id} not found in state store")
+        
+        update_data = {
+            "status": status,
+            "resources": resources,
+            "outputs": outputs,
+            "logs": logs
+        }
+        
+        # Add deployment_result if available
+        if tracked.deployment_result:
+            update_data["deployment_result"] = tracked.deployment_result
+        
+        # Queue the update; the batcher sends it to the backend with other deployments' updates
+        status_batcher.submit(deployment_id, tracked.access_token, update_data)
+    
+    return azure_status
+
+def abandon_deployment(tracked):
+    """
+    Close the state of a deployment the status tracker gave up polling.
+    
+    The deployment is stored and reported as failed, so no engine node claims it again.
+    
+    Args:
+        tracked: The TrackedDeployment that could not be polled
+    """
+    deployment_id = tracked.deployment_id
+    record = state_store.get(deployment_id)
+    logs = list(record["logs"]) if record else []
+    logs.append({
+        "timestamp": datetime.utcnow().isoformat(),
+        "resource_name": None,
+        "resource_type": None,
+        "message": f"Deployment status could not be retrieved after {tracked.consecutive_errors} attempts; "
+                   "the deployment engine stopped tracking it"
+    })
+    
+    state_store.update_status(deployment_id, "failed", logs=logs)
+    status_batcher.submit(deployment_id, tracked.access_token, {"status": "failed", "logs": logs})
+    logger.warning(f"Marked deployment {deployment_id} as failed after polling was abandoned")
+
+# Single scheduler for all in-flight deployments
+status_tracker = DeploymentStatusTracker(poll_deployment_status, on_give_up=abandon_deployment)
+
+def resume_deployments():
+    """
+    Claim unfinished deployments whose lease is free or expired and resume polling them.
+    Covers deployments left behind by a restart of this node or by a failed node.
+    """
+    for record in state_store.claim_unfinished():
+        deployment_id = record["deployment_id"]
+        if status_tracker.is_tracking(deployment_id):
+            continue
+        logger.info(f"Resuming status polling for deployment {deployment_id}")
+        status_tracker.track(
+            deployment_id,
+            record["resource_group"],
+            record["azure_deployment_id"],
+            record["access_token"],
+            record["tenant_id"],
+            deployment_result=record["deployment_result"]
+        )
+
+def lease_keeper():
+    """
+    Background loop that renews this node's leases and picks up orphaned deployments.
+    Deployments whose lease was taken over by another node stop being polled here.
+    """
+    while True:
+        time.sleep(LEASE_RENEW_INTERVAL)
+        try:
+            tracked_ids = status_tracker.tracked_ids()
+            held = state_store.renew_leases(tracked_ids)
+            for deployment_id in set(tracked_ids) - held:
+                logger.warning(f"Lease for deployment {deployment_id} is held by another node, stopping polling")
+                status_tracker.untrack(deployment_id)
+            resume_deployments()
+        except Exception as e:
+            logger.error(f"Error maintaining deployment leases: {str(e)}", exc_info=True)
+
+@app.on_event("startup")
+def start_status_tracker():
+    bicep_compiler.start()
+    status_batcher.start()
+    status_tracker.start()
     try:
-        # Continue polling until deployment is complete or failed
-        while True:
-            # Get tenant-specific Azure deployer with fresh credentials
-            azure_deployer = credential_manager.create_azure_deployer_for_tenant(
-                tenant_id
-            )
-            if not azure_deployer:
-                logger.error(f"Failed to get Azure deployer for tenant {tenant_id}")
-                break
-            
-            # Get deployment status from Azure
-            logger.info(f"Polling Azure for deployment status: {azure_deployment_id}")
-            azure_status = azure_deployer.get_deployment_status(
-                resource_group=resource_group,
-                deployment_name=azure_deployment_id
-            )
-            
-            status = azure_status.get("status", "in_progress")
-            resources = azure_status.get("resources", [])
-            outputs = azure_status.get("outputs", {})
-            logs = azure_status.get("logs", [])
-            
-            logger.info(f"Deployment {deployment_id} status: {status}")
-            logger.info(f"Resources: {len(resources)}, Outputs: {len(outputs) if outputs else 0}, Logs: {len(logs)}")
-            
-            # Update deployment in memory
-            if deployment_id in deployments:
-                deployments[deployment_id]["status"] = status
-                deployments[deployment_id]["resources"] = resources
-                deployments[deployment_id]["outputs"] = outputs
-                deployments[deployment_id]["logs"] = logs
-                deployments[deployment_id]["updated_at"] = datetime.utcnow().isoformat()
-                logger.info(f"Updated in-memory deployment {deployment_id}")
-            else:
-                logger.warning(f"Deployment {deployment_id} not found in memory")
-            
-            # Send update to backend API
-            try:
-                logger.info(f"Sending status update to backend API for deployment {deployment_id}")
-                headers = {"Authorization": f"Bearer {access_token}"}
-                update_data = {
-                    "status": status,
-                    "resources": resources,
-                    "outputs": outputs,
-                    "logs": logs
-                }
-                
-                # Add deployment_result if available
-                if deployment_id in deployments and "deployment_result" in deployments[deployment_id]:
-                    update_data["deployment_result"] = deployments[deployment_id]["deployment_result"]
-                
-                # Log the request details
-                logger.info(f"Request URL: {API_URL}/api/deployments/engine/{deployment_id}/status")
-                logger.info(f"Request headers: Authorization: Bearer [REDACTED]")
-                logger.info(f"Request data: {json.dumps(update_data, default=str)[:500]}...")
-                
-                response = requests.put(
-                    f"{API_URL}/api/deployments/engine/{deployment_id}/status",
-                    headers=headers,
-                    json=update_data
-                )
-                
-                logger.info(f"Response status code: {response.status_code}")
-                
-                if response.status_code != 200:
-                    logger.error(f"Failed to update deployment status: {response.text}")
-                    # Try to parse the response for more details
-                    try:
-                        error_details = response.json()
-                        logger.error(f"Error details: {json.dumps(error_details, default=str)}")
-                    except:
-                        logger.error("Could not parse error response as JSON")
-                else:
-                    logger.info(f"Successfully updated deployment status in backend")
-            except Exception as e:
-                logger.error(f"Error updating deployment status: {str(e)}", exc_info=True)
-            
-            # If deployment is complete or failed, stop polling
-            if status in ["succeeded", "failed", "canceled"]:
-                logger.info(f"Deployment {deployment_id} {status}, stopping polling")
-                break
-            
-            # Sleep before next poll
-            logger.info(f"Sleeping for 10 seconds before next poll for deployment {deployment_id}")
-            time.sleep(10)  # Poll every 10 seconds
+        compiled_template_cache.create_tables()
     except Exception as e:
-        logger.error(f"Error in status polling thread: {str(e)}", exc_info=True)
-    finally:
-        # Remove thread from active polling threads
-        if deployment_id in polling_threads:
-            del polling_threads[deployment_id]
-        logger.info(f"Stopped status polling for deployment {deployment_id}")
+        logger.error(f"Error creating compiled template cache table: {str(e)}", exc_info=True)
+    try:
+        state_store.create_tables()
+        resume_deployments()
+    except Exception as e:
+        logger.error(f"Error resuming deployments from state store: {str(e)}", exc_info=True)
+    threading.Thread(target=lease_keeper, name="lease-keeper", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_status_tracker():
+    status_tracker.stop()
+    status_batcher.stop()
+    bicep_compiler.stop()
+    bulk_deploy_executor.shutdown(wait=False)
 
 # Authentication dependency
+token_validator = TokenValidator(API_URL)
+
 def get_current_user(authorization: str = Header(None)):
     if not authorization:
         raise HTTPException(status_code=401, detail="Authorization header missing")
@@ -156,49 +216,18 @@ def get_current_user(authorization: str = Header(None)):
         if scheme.lower() != "bearer":
             raise HTTPException(status_code=401, detail="Invalid authentication scheme")
         
-        logger.debug(f"Validating token via backend API")
-        
-        # Use the backend API to validate the token
-        headers = {"Authorization": f"Bearer {token}"}
-        response = requests.get(f"{API_URL}/api/auth/me", headers=headers)
-        
-        if response.status_code != 200:
-            logger.error(f"Token validation failed: {response.text}")
-            raise HTTPException(status_code=401, detail="Invalid token")
-        
-        user_data = response.json()
-        logger.debug(f"User data from API: {user_data}")
-        
-        # Extract user information
-        user_id = user_data.get("id")
-        username = user_data.get("username")
-        tenant_id = user_data.get("tenantId")  # Use camelCase as returned by backend API
+        # Verify the token locally; permission and tenant claims come from the cache
+        claims = token_validator.validate(token)
         
-        # Extract permissions from user data
-        permissions = user_data.get("permissions", [])
-        if not isinstance(permissions, list):
-            permissions = []
-        
-        # Extract role from user data
-        role = user_data.get("role", "user")
-        
-        # Extract multi-tenant access information
-        accessible_tenants = user_data.get("accessibleTenants", [])
-        is_msp_user = user_data.get("isMspUser", False)
-        
-        logger.debug(f"Extracted user info: user_id={user_id}, username={username}, tenant_id={tenant_id}, role={role}")
-        logger.debug(f"Multi-tenant info: accessible_tenants={accessible_tenants}, is_msp_user={is_msp_user}")
+        logger.debug(f"Extracted user info: user_id={claims['user_id']}, username={claims['username']}, tenant_id={claims['tenant_id']}, role={claims['role']}")
+        logger.debug(f"Multi-tenant info: accessible_tenants={claims['accessible_tenants']}, is_msp_user={claims['is_msp_user']}")
         
         return {
-            "user_id": user_id,
-            "username": username,
-            "tenant_id": tenant_id,
-            "permissions": permissions,
-            "role": role,
-            "accessible_tenants": accessible_tenants,
-            "is_msp_user": is_msp_user,
+            **claims,
             "token": token  # Include the token for background tasks
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Authentication error: {str(e)}")
         raise HTTPException(status_code=401, detail=f"Authentication error: {str(e)}")
@@ -225,6 +254,28 @@ def check_permission(required_permission: str):
 def read_root():
     return {"message": "Deployment Engine API"}
 
+@app.get("/metrics", tags=["metrics"])
+def get_metrics():
+    """
+    Get engine runtime metrics, including the status tracker queue.
+    """
+    try:
+        state_store_stats = state_store.stats()
+    except Exception as e:
+        logger.error(f"Error reading state store stats: {str(e)}")
+        state_store_stats = {"error": str(e)}
+    
+    return {
+        "status_tracker": status_tracker.stats(),
+        "status_batcher": status_batcher.stats(),
+        "state_store": state_store_stats,
+        "template_cache": compiled_template_cache.stats(),
+        "bicep_compiler": bicep_compiler.stats(),
+        "deployer_pool": credential_manager.get_pool_stats(),
+        "db_pool": get_pool_stats(credential_manager.engine),
+        "auth_cache": token_validator.stats()
+    }
+
 # Debug endpoint to check token
 @app.get("/debug-token")
 def debug_token(user: dict = Depends(get_current_user)):
@@ -294,6 +345,36 @@ def get_credentials(
         logger.error(f"Error getting credentials for tenant {tenant_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.delete("/credentials/pool", tags=["credentials"])
+def invalidate_credentials(
+    target_tenant_id: Optional[str] = None,
+    user: dict = Depends(check_permission("manage:deployments"))
+):
+    """
+    Drop the pooled Azure deployers of the current tenant or a target tenant.
+    Called by the backend when the tenant's credentials are added or deleted.
+    
+    Args:
+        target_tenant_id (Optional[str]): Target tenant ID (admin/MSP only)
+    """
+    tenant_id = user["tenant_id"]
+    
+    if target_tenant_id and target_tenant_id != user["tenant_id"]:
+        accessible_tenants = user.get("accessible_tenants", [])
+        is_msp_user = user.get("is_msp_user", False)
+        
+        # MSP users have access to all tenants, or check if target tenant is in accessible list
+        if not is_msp_user and target_tenant_id not in accessible_tenants:
+            raise HTTPException(
+                status_code=403, 
+                detail="Not authorized to manage credentials for other tenants"
+            )
+        tenant_id = target_tenant_id
+    
+    credential_manager.invalidate_tenant(tenant_id)
+    logger.info(f"Dropped pooled Azure deployers for tenant {tenant_id}")
+    return {"message": "Pooled credentials dropped"}
+
 @app.post("/credentials/subscription", tags=["credentials"])
 def set_subscription(
     subscription: Dict[str, str],
@@ -360,197 +441,405 @@ def list_subscriptions(
         logger.error(f"Error listing subscriptions for tenant {tenant_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# Deployment endpoints
-@app.post("/deployments", tags=["deployments"])
-def create_deployment(
-    deployment: Dict[str, Any],
-    background_tasks: BackgroundTasks,
-    target_tenant_id: Optional[str] = None,
-    user: dict = Depends(check_permission("create:deployments"))
+# Template endpoints
+@app.post("/templates/compile", tags=["templates"])
+def compile_template_version(
+    template: Dict[str, Any],
+    user: dict = Depends(get_current_user)
 ):
+    """
+    Compile a template version into the compiled template cache ahead of its deployments.
+
+    Body: template_id, version, deployment_type ('arm' or 'bicep') and code.
+    """
+    code = template.get("code")
+    if not code:
+        raise HTTPException(status_code=400, detail="Template code is required")
+    deployment_type = template.get("deployment_type", "arm")
+    if deployment_type not in ("arm", "bicep"):
+        raise HTTPException(status_code=400, detail=f"Unsupported deployment type: {deployment_type}")
+
     try:
-        # Determine which tenant to use for this deployment
-        deployment_tenant_id = user["tenant_id"]
-        
-        # If target_tenant_id is provided, check if user has permission to deploy for other tenants
-        if target_tenant_id and target_tenant_id != user["tenant_id"]:
-            # Only admin or MSP users can deploy for other tenants
-            accessible_tenants = user.get("accessible_tenants", [])
-            is_msp_user = user.get("is_msp_user", False)
-            
-            # MSP users have access to all tenants, or check if target tenant is in accessible list
-            if not is_msp_user and target_tenant_id not in accessible_tenants:
-                raise HTTPException(
-                    status_code=403, 
-                    detail="Not authorized to create deployments for other tenants"
-                )
-            deployment_tenant_id = target_tenant_id
-            logger.info(f"Using target tenant ID for deployment: {deployment_tenant_id}")
-        else:
-            logger.info(f"Using user's tenant ID for deployment: {deployment_tenant_id}")
-        
-        # Use the deployment ID from the backend if provided, otherwise generate a new one
-        deployment_id = deployment.get("deployment_id")
-        if not deployment_id:
-            deployment_id = str(uuid.uuid4())
-            logger.warning(f"No deployment_id provided by backend, generating new ID: {deployment_id}")
-        else:
-            logger.info(f"Using deployment_id provided by backend: {deployment_id}")
-        
-        logger.info(f"Creating deployment with ID: {deployment_id}")
-        
-        # Extract deployment details
-        name = deployment.get("name", "Unnamed deployment")
-        description = deployment.get("description", "")
-        deployment_type = deployment.get("deployment_type", "arm")
-        
-        logger.info(f"Deployment details: name={name}, type={deployment_type}")
-        
-        # Create a sanitized resource group name (no spaces or special characters)
-        sanitized_name = name.lower().replace(' ', '-')
-        # Remove any other special characters
-        import re
-        sanitized_name = re.sub(r'[^a-z0-9\-]', '', sanitized_name)
-        resource_group = deployment.get("resource_group", f"rg-{sanitized_name}")
-        
-        # Use UUID for Azure deployment name to avoid issues with spaces and special characters
-        azure_deployment_name = f"deploy-{deployment_id}"
-        
-        location = deployment.get("location", "eastus")
-        template = deployment.get("template", {})
-        parameters = deployment.get("parameters", {})
-        
-        logger.info(f"Resource group: {resource_group}, Location: {location}")
-        logger.info(f"Azure deployment name: {azure_deployment_name}")
-        
-        # Extract Azure credentials if provided
-        client_id = deployment.get("client_id")
-        client_secret = deployment.get("client_secret")
-        tenant_id = deployment.get("tenant_id")
-        subscription_id = deployment.get("subscription_id")
-        settings_id = deployment.get("settings_id")  # Optional specific settings ID
-        
-        logger.info(f"Credentials provided: client_id={bool(client_id)}, client_secret={bool(client_secret)}, tenant_id={bool(tenant_id)}, subscription_id={bool(subscription_id)}")
-        
-        # Get tenant-specific Azure deployer with fresh credentials from database
-        azure_deployer = credential_manager.create_azure_deployer_for_tenant(
-            deployment_tenant_id, 
-            settings_id=settings_id
+        compiled_template_cache.get_or_compile(
+            code,
+            deployment_type,
+            compile_template,
+            template_id=template.get("template_id"),
+            version=template.get("version")
         )
-        
-        if not azure_deployer:
-            logger.error(f"Failed to get Azure credentials for tenant {deployment_tenant_id}")
-            raise ValueError("Azure credentials not configured for this tenant")
-        
-        # If credentials are provided in the deployment request, use them to override
-        if client_id and client_secret and tenant_id:
-            logger.info("Using Azure credentials from deployment request")
-            azure_deployer.set_credentials(
-                client_id=client_id,
-                client_secret=client_secret,
-                tenant_id=tenant_id,
-                subscription_id=subscription_id
-            )
-        
-        # Verify credentials are configured
-        cred_status = azure_deployer.get_credential_status()
-        if not cred_status.get("configured", False):
-            logger.error("Azure credentials not properly configured")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    return {"template_id": template.get("template_id"), "version": template.get("version"), "compiled": True}
+
+# Deployment endpoints
+def resolve_deployment_tenant(user: dict, target_tenant_id: Optional[str]) -> str:
+    """
+    Determine which tenant a deployment is created for.
+    
+    Raises:
+        HTTPException: 403 if the user may not deploy for the target tenant
+    """
+    # If target_tenant_id is provided, check if user has permission to deploy for other tenants
+    if target_tenant_id and target_tenant_id != user["tenant_id"]:
+        # Only admin or MSP users can deploy for other tenants
+        accessible_tenants = user.get("accessible_tenants", [])
+        is_msp_user = user.get("is_msp_user", False)
+        
+        # MSP users have access to all tenants, or check if target tenant is in accessible list
+        if not is_msp_user and target_tenant_id not in accessible_tenants:
             raise HTTPException(
-                status_code=400, 
-                detail="Azure credentials not properly configured"
+                status_code=403, 
+                detail="Not authorized to create deployments for other tenants"
             )
-        
-        # Ensure we have a resource client
-        if not azure_deployer.resource_client:
-            logger.info("ResourceManagementClient not available, attempting to ensure resource client")
-            try:
-                azure_deployer._ensure_resource_client()
-            except Exception as e:
-                logger.error(f"Failed to ensure resource client: {str(e)}")
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Failed to configure Azure resource client: {str(e)}"
-                )
-        
-        # Final check - ensure we have a resource client
-        if not azure_deployer.resource_client:
-            logger.error("ResourceManagementClient still not available after ensure_resource_client")
+        logger.info(f"Using target tenant ID for deployment: {target_tenant_id}")
+        return target_tenant_id
+    
+    logger.info(f"Using user's tenant ID for deployment: {user['tenant_id']}")
+    return user["tenant_id"]
+
+def deployer_key(deployment: Dict[str, Any], deployment_tenant_id: str) -> tuple:
+    """Deployments with the same key are deployed with the same AzureDeployer."""
+    if deployment.get("client_id") and deployment.get("client_secret") and deployment.get("tenant_id"):
+        return (deployment_tenant_id, "request", deployment["client_id"], deployment["tenant_id"],
+                deployment.get("subscription_id"))
+    return (deployment_tenant_id, "settings", deployment.get("settings_id"))
+
+def prepare_azure_deployer(deployment: Dict[str, Any], deployment_tenant_id: str) -> AzureDeployer:
+    """
+    Get a configured AzureDeployer with a resource client for a deployment request.
+    
+    Raises:
+        HTTPException: 400 if the credentials are not properly configured
+        ValueError: If the tenant has no Azure credentials
+    """
+    # Extract Azure credentials if provided
+    client_id = deployment.get("client_id")
+    client_secret = deployment.get("client_secret")
+    tenant_id = deployment.get("tenant_id")
+    subscription_id = deployment.get("subscription_id")
+    settings_id = deployment.get("settings_id")  # Optional specific settings ID
+    
+    logger.info(f"Credentials provided: client_id={bool(client_id)}, client_secret={bool(client_secret)}, tenant_id={bool(tenant_id)}, subscription_id={bool(subscription_id)}")
+    
+    # Get tenant-specific Azure deployer with fresh credentials from database
+    azure_deployer = credential_manager.create_azure_deployer_for_tenant(
+        deployment_tenant_id, 
+        settings_id=settings_id
+    )
+    
+    if not azure_deployer:
+        logger.error(f"Failed to get Azure credentials for tenant {deployment_tenant_id}")
+        raise ValueError("Azure credentials not configured for this tenant")
+    
+    # If credentials are provided in the deployment request, use them to override.
+    # Pooled deployers are shared, so the override gets its own instance.
+    if client_id and client_secret and tenant_id:
+        logger.info("Using Azure credentials from deployment request")
+        azure_deployer = AzureDeployer()
+        azure_deployer.set_credentials(
+            client_id=client_id,
+            client_secret=client_secret,
+            tenant_id=tenant_id,
+            subscription_id=subscription_id
+        )
+    
+    # Verify credentials are configured
+    cred_status = azure_deployer.get_credential_status()
+    if not cred_status.get("configured", False):
+        logger.error("Azure credentials not properly configured")
+        raise HTTPException(
+            status_code=400, 
+            detail="Azure credentials not properly configured"
+        )
+    
+    # Ensure we have a resource client. Pooled deployers always have one, so only
+    # request overrides and deployers that were not pooled are set up here.
+    if not azure_deployer.resource_client:
+        logger.info("ResourceManagementClient not available, attempting to ensure resource client")
+        try:
+            azure_deployer._ensure_resource_client()
+        except Exception as e:
+            logger.error(f"Failed to ensure resource client: {str(e)}")
             raise HTTPException(
                 status_code=400, 
-                detail="Azure resource client not configured"
+                detail=f"Failed to configure Azure resource client: {str(e)}"
             )
-        
-        # Prepare template data
-        template_data = {}
-        if template.get("source") == "url" and template.get("url"):
-            template_data["template_url"] = template["url"]
-            logger.info(f"Using template URL: {template['url']}")
-        elif template.get("source") == "code" and template.get("code"):
-            template_data["template_body"] = template["code"]
-            logger.info(f"Using template code (length: {len(template['code'])})")
-        else:
-            logger.error("Invalid template data")
-            raise HTTPException(status_code=400, detail="Invalid template data")
-        
-        # Log parameters
-        logger.info(f"Deployment parameters: {json.dumps(parameters, default=str)[:500]}...")
-        
-        # Deploy to Azure
-        logger.info(f"Starting Azure deployment: {azure_deployment_name}")
-        result = azure_deployer.deploy(
-            resource_group=resource_group,
-            deployment_name=azure_deployment_name,
-            location=location,
-            template_data=template_data,
-            parameters=parameters,
-            deployment_type=deployment_type
+    
+    # Final check - ensure we have a resource client
+    if not azure_deployer.resource_client:
+        logger.error("ResourceManagementClient still not available after ensure_resource_client")
+        raise HTTPException(
+            status_code=400, 
+            detail="Azure resource client not configured"
         )
+    
+    return azure_deployer
+
+def deployment_resource_group(deployment: Dict[str, Any]) -> str:
+    """The resource group a deployment request deploys to."""
+    # Create a sanitized resource group name (no spaces or special characters)
+    sanitized_name = deployment.get("name", "Unnamed deployment").lower().replace(' ', '-')
+    # Remove any other special characters
+    sanitized_name = re.sub(r'[^a-z0-9\-]', '', sanitized_name)
+    return deployment.get("resource_group", f"rg-{sanitized_name}")
+
+def submit_deployment(deployment: Dict[str, Any], deployment_tenant_id: str, user: dict,
+                      azure_deployer: AzureDeployer, ensure_resource_group: bool = True) -> Dict[str, Any]:
+    """
+    Start a deployment in Azure, store it and hand it to the status tracker.
+    
+    Args:
+        deployment: The deployment request
+        deployment_tenant_id: Tenant the deployment is created for
+        user: The authenticated user
+        azure_deployer: Deployer from prepare_azure_deployer
+        ensure_resource_group: Check and create the resource group (False if the caller already did)
         
-        logger.info(f"Azure deployment result: {json.dumps(result, default=str)}")
-        
-        # Store deployment details
-        deployments[deployment_id] = {
-            "deployment_id": deployment_id,  # Use the consistent deployment ID
-            "name": name,
-            "description": description,
-            "resource_group": resource_group,
-            "location": location,
-            "deployment_type": deployment_type,
-            "status": result.get("status", "in_progress"),
-            "azure_deployment_id": azure_deployment_name,
-            "tenant_id": deployment_tenant_id,
-            "created_by": user["user_id"],
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat(),
-            "resources": [],
-            "outputs": {},
-            "logs": [],
-            "deployment_result": result  # Store the full deployment result
-        }
-        
-        logger.info(f"Stored deployment details in memory: {deployment_id}")
-        
-        # Start background polling for deployment status
-        logger.info(f"Starting background polling thread for deployment {deployment_id}")
-        thread = threading.Thread(
-            target=poll_deployment_status,
-            args=(deployment_id, resource_group, azure_deployment_name, user["token"], deployment_tenant_id)
-        )
-        thread.daemon = True
-        thread.start()
-        polling_threads[deployment_id] = thread
+    Returns:
+        dict: deployment_id, status, azure_deployment_id and created_at
         
-        return {
-            "deployment_id": deployment_id,  # Return the consistent deployment ID
-            "status": result.get("status", "in_progress"),
-            "azure_deployment_id": azure_deployment_name,
-            "created_at": deployments[deployment_id]["created_at"]
-        }
+    Raises:
+        HTTPException: 400 for invalid template data
+    """
+    # Use the deployment ID from the backend if provided, otherwise generate a new one
+    deployment_id = deployment.get("deployment_id")
+    if not deployment_id:
+        deployment_id = str(uuid.uuid4())
+        logger.warning(f"No deployment_id provided by backend, generating new ID: {deployment_id}")
+    else:
+        logger.info(f"Using deployment_id provided by backend: {deployment_id}")
+    
+    logger.info(f"Creating deployment with ID: {deployment_id}")
+    
+    # Extract deployment details
+    name = deployment.get("name", "Unnamed deployment")
+    description = deployment.get("description", "")
+    deployment_type = deployment.get("deployment_type", "arm")
+    
+    logger.info(f"Deployment details: name={name}, type={deployment_type}")
+    
+    resource_group = deployment_resource_group(deployment)
+    
+    # Use UUID for Azure deployment name to avoid issues with spaces and special characters
+    azure_deployment_name = f"deploy-{deployment_id}"
+    
+    location = deployment.get("location", "eastus")
+    template = deployment.get("template", {})
+    parameters = deployment.get("parameters", {})
+    
+    logger.info(f"Resource group: {resource_group}, Location: {location}")
+    logger.info(f"Azure deployment name: {azure_deployment_name}")
+    
+    # Prepare template data
+    template_data = {}
+    if template.get("source") == "url" and template.get("url"):
+        template_data["template_url"] = template["url"]
+        logger.info(f"Using template URL: {template['url']}")
+    elif template.get("source") == "code" and template.get("code"):
+        template_data["template_body"] = template["code"]
+        logger.info(f"Using template code (length: {len(template['code'])})")
+        try:
+            template_data["template_json"] = compiled_template_cache.get_or_compile(
+                template["code"],
+                deployment_type,
+                compile_template,
+                template_id=template.get("template_id"),
+                version=template.get("version")
+            )
+        except ValueError as e:
+            # The deployer reports templates that don't compile as a failed deployment
+            logger.warning(f"Template does not compile: {str(e)}")
+    else:
+        logger.error("Invalid template data")
+        raise HTTPException(status_code=400, detail="Invalid template data")
+    
+    # Log parameters
+    logger.info(f"Deployment parameters: {json.dumps(parameters, default=str)[:500]}...")
+    
+    # Deploy to Azure
+    logger.info(f"Starting Azure deployment: {azure_deployment_name}")
+    result = azure_deployer.deploy(
+        resource_group=resource_group,
+        deployment_name=azure_deployment_name,
+        location=location,
+        template_data=template_data,
+        parameters=parameters,
+        deployment_type=deployment_type,
+        ensure_resource_group=ensure_resource_group
+    )
+    
+    logger.info(f"Azure deployment result: {json.dumps(result, default=str)}")
+    
+    # Store deployment details
+    created_at = datetime.utcnow().isoformat()
+    state_store.save({
+        "deployment_id": deployment_id,  # Use the consistent deployment ID
+        "name": name,
+        "description": description,
+        "resource_group": resource_group,
+        "location": location,
+        "deployment_type": deployment_type,
+        "status": result.get("status", "in_progress"),
+        "azure_deployment_id": azure_deployment_name,
+        "tenant_id": deployment_tenant_id,
+        "created_by": user["user_id"],
+        "access_token": user["token"],
+        "resources": [],
+        "outputs": {},
+        "logs": [],
+        "deployment_result": result  # Store the full deployment result
+    })
+    
+    logger.info(f"Stored deployment details in state store: {deployment_id}")
+    
+    # Hand the deployment to the status tracker for background polling
+    logger.info(f"Tracking deployment {deployment_id} for status updates")
+    status_tracker.track(
+        deployment_id,
+        resource_group,
+        azure_deployment_name,
+        user["token"],
+        deployment_tenant_id,
+        deployment_result=result
+    )
+    
+    return {
+        "deployment_id": deployment_id,  # Return the consistent deployment ID
+        "status": result.get("status", "in_progress"),
+        "azure_deployment_id": azure_deployment_name,
+        "created_at": created_at
+    }
+
+@app.post("/deployments", tags=["deployments"])
+def create_deployment(
+    deployment: Dict[str, Any],
+    background_tasks: BackgroundTasks,
+    target_tenant_id: Optional[str] = None,
+    user: dict = Depends(check_permission("create:deployments"))
+):
+    try:
+        # Determine which tenant to use for this deployment
+        deployment_tenant_id = resolve_deployment_tenant(user, target_tenant_id)
+        azure_deployer = prepare_azure_deployer(deployment, deployment_tenant_id)
+        return submit_deployment(deployment, deployment_tenant_id, user, azure_deployer)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating deployment: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+def _error_detail(error: Exception) -> str:
+    return error.detail if isinstance(error, HTTPException) else str(error)
+
+def _ensure_group_resource_groups(azure_deployer: AzureDeployer, deployments: List[Dict[str, Any]]):
+    """Check and create each distinct resource group of a deployer group once, before its deployments start."""
+    failures = {}
+    for resource_group, location in dict.fromkeys(
+        (deployment_resource_group(d), d.get("location", "eastus")) for d in deployments
+    ):
+        if resource_group in failures:
+            continue
+        try:
+            azure_deployer._ensure_resource_group(resource_group, location)
+        except Exception as e:
+            logger.error(f"Error ensuring resource group {resource_group}: {str(e)}")
+            failures[resource_group] = str(e)
+    return failures
+
+@app.post("/deployments/batch", tags=["deployments"])
+def create_deployments_batch(
+    batch: Dict[str, Any],
+    user: dict = Depends(check_permission("create:deployments"))
+):
+    """
+    Submit several deployments in one request.
+    
+    Body: {"deployments": [...]}, each item shaped like a POST /deployments body, plus an
+    optional target_tenant_id. Items are grouped by tenant and credentials, so each group
+    resolves its deployer and checks each of its resource groups once; the deployments
+    are then started on a bounded executor (BULK_DEPLOY_WORKERS).
+    
+    Every item gets a result in request order, with either the fields POST /deployments
+    returns or an error; one item failing does not affect the others.
+    """
+    deployments = batch.get("deployments")
+    if not isinstance(deployments, list) or not deployments:
+        raise HTTPException(status_code=400, detail="deployments must be a non-empty list")
+    if len(deployments) > BULK_DEPLOY_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BULK_DEPLOY_MAX_ITEMS} deployments can be submitted at once"
+        )
+    
+    results: List[Optional[Dict[str, Any]]] = [None] * len(deployments)
+    
+    def fail(index: int, error: str):
+        results[index] = {
+            "index": index,
+            "deployment_id": deployments[index].get("deployment_id") if isinstance(deployments[index], dict) else None,
+            "status": "failed",
+            "error": error
+        }
+    
+    # Group the items by the deployer they need
+    groups: Dict[tuple, List[tuple]] = {}
+    for index, deployment in enumerate(deployments):
+        if not isinstance(deployment, dict):
+            fail(index, "Deployment must be an object")
+            continue
+        try:
+            deployment_tenant_id = resolve_deployment_tenant(user, deployment.get("target_tenant_id"))
+        except HTTPException as e:
+            fail(index, _error_detail(e))
+            continue
+        groups.setdefault(deployer_key(deployment, deployment_tenant_id), []).append(
+            (index, deployment, deployment_tenant_id)
+        )
+    
+    def prepare_group(items):
+        index, deployment, deployment_tenant_id = items[0]
+        azure_deployer = prepare_azure_deployer(deployment, deployment_tenant_id)
+        return azure_deployer, _ensure_group_resource_groups(azure_deployer, [item[1] for item in items])
+    
+    def submit(index, deployment, deployment_tenant_id, azure_deployer):
+        result = submit_deployment(deployment, deployment_tenant_id, user, azure_deployer, ensure_resource_group=False)
+        return {"index": index, **result}
+    
+    # Prepare the groups in parallel, then fan the deployments out
+    prepared = {key: bulk_deploy_executor.submit(prepare_group, items) for key, items in groups.items()}
+    submitted = []
+    for key, items in groups.items():
+        try:
+            azure_deployer, resource_group_failures = prepared[key].result()
+        except Exception as e:
+            logger.error(f"Error preparing deployments for tenant {key[0]}: {_error_detail(e)}")
+            for index, _, _ in items:
+                fail(index, _error_detail(e))
+            continue
+        for index, deployment, deployment_tenant_id in items:
+            resource_group = deployment_resource_group(deployment)
+            if resource_group in resource_group_failures:
+                fail(index, f"Error creating resource group {resource_group}: {resource_group_failures[resource_group]}")
+                continue
+            submitted.append((index, bulk_deploy_executor.submit(
+                submit, index, deployment, deployment_tenant_id, azure_deployer
+            )))
+    
+    for index, future in submitted:
+        try:
+            results[index] = future.result()
+        except Exception as e:
+            logger.error(f"Error creating deployment {index} of batch: {_error_detail(e)}", exc_info=True)
+            fail(index, _error_detail(e))
+    
+    failed = sum(1 for result in results if result.get("status") == "failed")
+    return {
+        "results": results,
+        "submitted": len(results) - failed,
+        "failed": failed
+    }
+
 @app.get("/resources", tags=["resources"])
 def get_resource_details(
     resource_id: str,
@@ -0,0 +1,276 @@
+"""
+Bicep compiler pool for the deployment engine.
+Compiles Bicep to ARM JSON on a fixed set of long-lived worker threads fed through a
+bounded in-memory queue, with per-job timeouts, a content-hash result cache and
+compile latency telemetry.
+"""
+
+import os
+import shutil
+import hashlib
+import logging
+import subprocess
+import tempfile
+import threading
+import time
+import queue
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Compiler configuration
+BICEP_WORKERS = int(os.getenv("BICEP_WORKERS", "2"))
+BICEP_QUEUE_SIZE = int(os.getenv("BICEP_QUEUE_SIZE", "32"))
+BICEP_COMPILE_TIMEOUT = float(os.getenv("BICEP_COMPILE_TIMEOUT", "120"))  # seconds, queueing included
+BICEP_CACHE_SIZE = int(os.getenv("BICEP_CACHE_SIZE", "128"))  # compiled templates kept in memory
+BICEP_LATENCY_WINDOW = 256  # recent compiles the latency percentiles are computed over
+
+
+def find_bicep_cli() -> Optional[str]:
+    """
+    Locate the standalone Bicep CLI, which starts much faster than `az bicep build`.
+
+    Returns:
+        str: Path of the bicep executable (BICEP_CLI, PATH, or where `az bicep install`
+             puts it), or None to compile through the Azure CLI
+    """
+    configured = os.getenv("BICEP_CLI")
+    if configured:
+        return configured
+    on_path = shutil.which("bicep")
+    if on_path:
+        return on_path
+    installed = os.path.expanduser("~/.azure/bin/bicep")
+    return installed if os.access(installed, os.X_OK) else None
+
+
+class _CompileJob:
+    def __init__(self, source: str, content_hash: str, deadline: float):
+        self.source = source
+        self.content_hash = content_hash
+        self.deadline = deadline
+        self.enqueued_at = time.monotonic()
+        self.future = Future()
+
+
+class BicepCompilerPool:
+    """
+    Compiles Bicep templates on long-lived worker threads.
+
+    Callers hand the source to compile(), which answers from the result cache, joins an
+    identical job already in flight, or queues a new job. The queue is bounded: when
+    it is full, compile() fails right away instead of piling up work. Each job must
+    finish within the timeout, time spent queued included. Every worker keeps its own
+    scratch file and has the Bicep CLI write the ARM template to stdout, so no output
+    files are created or read.
+    """
+
+    def __init__(self, workers: int = BICEP_WORKERS, queue_size: int = BICEP_QUEUE_SIZE,
+                 timeout: float = BICEP_COMPILE_TIMEOUT, cache_size: int = BICEP_CACHE_SIZE,
+                 bicep_cli: Optional[str] = None):
+        """
+        Initialize the pool; workers start on start() or the first compile.
+
+        Args:
+            workers: Number of worker threads
+            queue_size: Maximum number of queued jobs
+            timeout: Seconds a job may take from submission to result
+            cache_size: Maximum number of compiled templates kept
+            bicep_cli: Path of the Bicep CLI (default: find_bicep_cli())
+        """
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.bicep_cli = bicep_cli if bicep_cli is not None else find_bicep_cli()
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._threads: List[threading.Thread] = []
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()  # content hash -> ARM template JSON
+        self._in_flight: Dict[str, _CompileJob] = {}
+
+        # Counters exposed through stats()
+        self._cache_hits = 0
+        self._joined = 0
+        self._compiled = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._rejected = 0
+        self._compile_seconds = deque(maxlen=BICEP_LATENCY_WINDOW)
+        self._queue_seconds = deque(maxlen=BICEP_LATENCY_WINDOW)
+
+    def start(self):
+        """Start the worker threads if they are not running."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stop_event.clear()
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"bicep-compiler-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Bicep compiler pool started with {self.workers} workers "
+                    f"({self.bicep_cli or 'az bicep'})")
+
+    def stop(self):
+        """Stop the worker threads once their current job is done."""
+        self._stop_event.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout=5)
+
+    def compile(self, source: str) -> str:
+        """
+        Compile Bicep source to an ARM template.
+
+        Args:
+            source: Bicep template content
+
+        Returns:
+            str: ARM template content
+
+        Raises:
+            ValueError: If the template does not compile, the queue is full or the job timed out
+        """
+        content_hash = hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+        with self._lock:
+            cached = self._cache.get(content_hash)
+            if cached is not None:
+                self._cache.move_to_end(content_hash)
+                self._cache_hits += 1
+                return cached
+
+            job = self._in_flight.get(content_hash)
+            if job is not None:
+                self._joined += 1
+            else:
+                job = _CompileJob(source, content_hash, time.monotonic() + self.timeout)
+                try:
+                    self._queue.put_nowait(job)
+                except queue.Full:
+                    self._rejected += 1
+                    raise ValueError("Error converting Bicep to ARM: compiler queue is full")
+                self._in_flight[content_hash] = job
+
+        if not self._threads:
+            self.start()
+
+        try:
+            return job.future.result(timeout=max(job.deadline - time.monotonic(), 0))
+        except FutureTimeoutError:
+            raise ValueError(f"Error converting Bicep to ARM: timed out after {self.timeout:.0f}s")
+
+    def _run(self):
+        scratch_dir = tempfile.mkdtemp(prefix="bicep-")
+        scratch_path = os.path.join(scratch_dir, "main.bicep")
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    job = self._queue.get(timeout=1)
+                except queue.Empty:
+                    continue
+                try:
+                    self._process(job, scratch_path)
+                finally:
+                    with self._lock:
+                        self._in_flight.pop(job.content_hash, None)
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    def _command(self, path: str) -> List[str]:
+        if self.bicep_cli:
+            return [self.bicep_cli, "build", path, "--stdout"]
+        return ["az", "bicep", "build", "--file", path, "--stdout"]
+
+    def _process(self, job: _CompileJob, scratch_path: str):
+        started = time.monotonic()
+        remaining = job.deadline - started
+        with self._lock:
+            self._queue_seconds.append(started - job.enqueued_at)
+        if remaining <= 0:
+            with self._lock:
+                self._timeouts += 1
+            job.future.set_exception(ValueError("Error converting Bicep to ARM: timed out in the compiler queue"))
+            return
+
+        with open(scratch_path, "w", encoding="utf-8") as scratch_file:
+            scratch_file.write(job.source)
+
+        try:
+            result = subprocess.run(
+                self._command(scratch_path),
+                capture_output=True,
+                text=True,
+                check=True,
+                timeout=remaining
+            )
+        except subprocess.TimeoutExpired:
+            with self._lock:
+                self._timeouts += 1
+            job.future.set_exception(ValueError(f"Error converting Bicep to ARM: timed out after {self.timeout:.0f}s"))
+            return
+        except subprocess.CalledProcessError as e:
+            with self._lock:
+                self._failed += 1
+            job.future.set_exception(ValueError(f"Error converting Bicep to ARM: {e.stderr}"))
+            return
+        except OSError as e:
+            with self._lock:
+                self._failed += 1
+            job.future.set_exception(ValueError(f"Error converting Bicep to ARM: {str(e)}"))
+            return
+
+        with self._lock:
+            self._compiled += 1
+            self._compile_seconds.append(time.monotonic() - started)
+            self._cache[job.content_hash] = result.stdout
+            self._cache.move_to_end(job.content_hash)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        job.future.set_result(result.stdout)
+
+    @staticmethod
+    def _latency(samples) -> Dict[str, Optional[float]]:
+        if not samples:
+            return {"p50_ms": None, "p95_ms": None, "max_ms": None}
+        ordered = sorted(samples)
+        return {
+            "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+            "p95_ms": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000, 1),
+            "max_ms": round(ordered[-1] * 1000, 1)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get compiler pool statistics.
+
+        Returns:
+            dict: Workers, queue and cache sizes, job counters, and compile and queue
+                  latency over the recent compiles
+        """
+        with self._lock:
+            return {
+                "workers": len(self._threads),
+                "bicep_cli": self.bicep_cli or "az bicep",
+                "queue_depth": self._queue.qsize(),
+                "queue_size": self.queue_size,
+                "timeout_seconds": self.timeout,
+                "cache_size": len(self._cache),
+                "cache_hits": self._cache_hits,
+                "joined": self._joined,
+                "compiled": self._compiled,
+                "failed": self._failed,
+                "timeouts": self._timeouts,
+                "rejected": self._rejected,
+                "compile_latency": self._latency(self._compile_seconds),
+                "queue_latency": self._latency(self._queue_seconds)
+            }
+
+
+bicep_compiler = BicepCompilerPool()
@@ -5,14 +5,18 @@ This module handles tenant-specific credential management and database integrati
 
 import os
 import json
+import time
 import logging
+import threading
+from collections import OrderedDict
 from typing import Dict, Optional, Any
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, Boolean, DateTime, JSON
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from datetime import datetime
 from deploy.azure import AzureDeployer
+from db_pool import create_pooled_engine
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +29,10 @@ POSTGRES_DB = os.getenv("POSTGRES_DB", "cmpdb")
 
 DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_SERVER}:{POSTGRES_PORT}/{POSTGRES_DB}"
 
+# Deployer pool configuration
+DEPLOYER_POOL_SIZE = int(os.getenv("DEPLOYER_POOL_SIZE", "64"))
+DEPLOYER_POOL_TTL = int(os.getenv("DEPLOYER_POOL_TTL", "900"))  # seconds
+
 # Database models (minimal definitions for cloud_settings)
 Base = declarative_base()
 
@@ -46,17 +54,31 @@ class MultiTenantCredentialManager:
     """
     Manages Azure credentials for multiple tenants.
     Provides fresh credential loading from database and tenant isolation.
+    
+    Configured AzureDeployer instances are pooled per (tenant_id, settings_id, subscription_id)
+    so AAD tokens and HTTP connection pools are reused across calls. Pool entries are evicted
+    least-recently-used first, expire after DEPLOYER_POOL_TTL seconds, and are rebuilt as soon
+    as the underlying cloud_settings row's updated_at changes.
     """
     
-    def __init__(self):
+    def __init__(self, pool_size: int = DEPLOYER_POOL_SIZE, pool_ttl: int = DEPLOYER_POOL_TTL):
         """Initialize the credential manager with database connection."""
         try:
-            self.engine = create_engine(DATABASE_URL)
+            self.engine = create_pooled_engine(DATABASE_URL)
             self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
             logger.info("Successfully connected to database for credential management")
         except Exception as e:
             logger.error(f"Failed to connect to database: {str(e)}")
             raise
+        
+        # Pool of configured deployers: key -> (deployer, settings updated_at, created monotonic time)
+        self.pool_size = pool_size
+        self.pool_ttl = pool_ttl
+        self._deployer_pool = OrderedDict()
+        self._pool_lock = threading.Lock()
+        self._pool_hits = 0
+        self._pool_misses = 0
+        self._pool_evictions = 0
     
     def get_database_session(self) -> Session:
         """Get a database session."""
@@ -103,7 +125,9 @@ class MultiTenantCredentialManager:
                 "client_id": connection_details.get("client_id", ""),
                 "client_secret": connection_details.get("client_secret", ""),
                 "tenant_id": connection_details.get("tenant_id", ""),
-                "subscription_id": connection_details.get("subscription_id", "")
+                "subscription_id": connection_details.get("subscription_id", ""),
+                "settings_id": str(cloud_settings.settings_id),
+                "updated_at": cloud_settings.updated_at
             }
             
             # Validate that required credentials are present
@@ -122,7 +146,14 @@ class MultiTenantCredentialManager:
     
     def create_azure_deployer_for_tenant(self, tenant_id: str, settings_id: Optional[str] = None) -> Optional[AzureDeployer]:
         """
-        Create a fresh AzureDeployer instance with tenant-specific credentials.
+        Get an AzureDeployer configured with tenant-specific credentials.
+        
+        Returns a pooled deployer when one exists for the same tenant, settings and
+        subscription and the settings have not changed since it was built; otherwise
+        builds a new one and adds it to the pool. Pooled deployers are shared, so they
+        get their resource client (auto-selecting a subscription if none is set) before
+        they are pooled and are not changed afterwards; a deployer whose resource client
+        cannot be set up is returned without being pooled.
         
         Args:
             tenant_id (str): The tenant ID
@@ -137,6 +168,12 @@ class MultiTenantCredentialManager:
             if not credentials:
                 return None
             
+            pool_key = (tenant_id, credentials["settings_id"], credentials.get("subscription_id") or None)
+            deployer = self._get_pooled_deployer(pool_key, credentials["updated_at"])
+            if deployer:
+                logger.debug(f"Reusing pooled Azure deployer for tenant {tenant_id}")
+                return deployer
+            
             # Create new AzureDeployer instance
             deployer = AzureDeployer()
             
@@ -148,6 +185,14 @@ class MultiTenantCredentialManager:
                 subscription_id=credentials.get("subscription_id")
             )
             
+            try:
+                deployer._ensure_resource_client()
+            except ValueError as e:
+                logger.warning(f"Not pooling Azure deployer for tenant {tenant_id}: {str(e)}")
+                return deployer
+            
+            self._add_pooled_deployer(pool_key, deployer, credentials["updated_at"])
+            
             logger.info(f"Created Azure deployer for tenant {tenant_id}")
             return deployer
             
@@ -155,6 +200,61 @@ class MultiTenantCredentialManager:
             logger.error(f"Error creating Azure deployer for tenant {tenant_id}: {str(e)}")
             return None
     
+    def _get_pooled_deployer(self, pool_key: tuple, updated_at: Optional[datetime]) -> Optional[AzureDeployer]:
+        """Return a live pooled deployer for the key, dropping it if stale or expired."""
+        with self._pool_lock:
+            entry = self._deployer_pool.get(pool_key)
+            if entry:
+                deployer, pooled_updated_at, created = entry
+                if pooled_updated_at == updated_at and time.monotonic() - created < self.pool_ttl:
+                    self._deployer_pool.move_to_end(pool_key)
+                    self._pool_hits += 1
+                    return deployer
+                del self._deployer_pool[pool_key]
+                self._pool_evictions += 1
+            self._pool_misses += 1
+            return None
+    
+    def _add_pooled_deployer(self, pool_key: tuple, deployer: AzureDeployer, updated_at: Optional[datetime]):
+        """Add a deployer to the pool, evicting the least recently used entries beyond the size limit."""
+        with self._pool_lock:
+            self._deployer_pool[pool_key] = (deployer, updated_at, time.monotonic())
+            self._deployer_pool.move_to_end(pool_key)
+            while len(self._deployer_pool) > self.pool_size:
+                self._deployer_pool.popitem(last=False)
+                self._pool_evictions += 1
+    
+    def invalidate_tenant(self, tenant_id: str):
+        """
+        Drop all pooled deployers for a tenant.
+        
+        Args:
+            tenant_id (str): The tenant ID
+        """
+        with self._pool_lock:
+            for pool_key in [key for key in self._deployer_pool if key[0] == tenant_id]:
+                del self._deployer_pool[pool_key]
+                self._pool_evictions += 1
+    
+    def get_pool_stats(self) -> dict:
+        """
+        Get deployer pool statistics.
+        
+        Returns:
+            dict: Pool size, limits and hit/miss/eviction counters
+        """
+        with self._pool_lock:
+            lookups = self._pool_hits + self._pool_misses
+            return {
+                "size": len(self._deployer_pool),
+                "max_size": self.pool_size,
+                "ttl_seconds": self.pool_ttl,
+                "hits": self._pool_hits,
+                "misses": self._pool_misses,
+                "evictions": self._pool_evictions,
+                "hit_ratio": self._pool_hits / lookups if lookups else None
+            }
+    
     def get_tenant_credential_status(self, tenant_id: str, settings_id: Optional[str] = None) -> dict:
         """
         Get credential status for a specific tenant.
@@ -0,0 +1,43 @@
+"""
+Database connection pool configuration for the deployment engine.
+Reads the pool settings from the environment. The instrumented pool itself is in
+shared/db_pool.py, which the backend uses too, so both services behave the same
+under load and behind PgBouncer.
+"""
+
+import os
+
+from sqlalchemy.engine import Engine
+
+from shared import db_pool
+
+# Pool configuration
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # seconds
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # seconds; -1 disables recycling
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 disables the timeout
+DB_PGBOUNCER_MODE = os.getenv("DB_PGBOUNCER_MODE", "false").lower() == "true"
+
+
+def create_pooled_engine(url: str) -> Engine:
+    """
+    Create a Postgres engine with an instrumented connection pool configured from the environment.
+
+    Args:
+        url: Database URL
+
+    Returns:
+        The engine; shared.db_pool.get_pool_stats() reports its pool telemetry
+    """
+    return db_pool.create_pooled_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        statement_timeout_ms=DB_STATEMENT_TIMEOUT_MS,
+        pgbouncer_mode=DB_PGBOUNCER_MODE
+    )
@@ -4,10 +4,42 @@ from azure.mgmt.resource.resources.models import DeploymentMode
 import json
 import requests
 import os
-import tempfile
-import subprocess
 import logging
 from datetime import datetime
+from bicep_compiler import bicep_compiler
+
+
+def convert_bicep_to_arm(bicep_content):
+    """
+    Convert Bicep template to ARM template on the Bicep compiler pool
+    
+    Args:
+        bicep_content (str): Bicep template content
+        
+    Returns:
+        str: ARM template content
+    """
+    return bicep_compiler.compile(bicep_content)
+
+
+def compile_template(code, deployment_type):
+    """
+    Compile template code to the ARM template sent to Azure
+    
+    Args:
+        code (str): ARM JSON or Bicep template content
+        deployment_type (str): 'arm' or 'bicep'
+        
+    Returns:
+        dict: The ARM template
+    """
+    if deployment_type == "bicep":
+        code = convert_bicep_to_arm(code)
+    try:
+        return json.loads(code)
+    except json.JSONDecodeError:
+        raise ValueError("Template content is not valid JSON")
+
 
 class AzureDeployer:
     def __init__(self):
@@ -171,7 +203,8 @@ class AzureDeployer:
         
         return result
 
-    def deploy(self, resource_group, deployment_name, location, template_data, parameters=None, deployment_type="arm"):
+    def deploy(self, resource_group, deployment_name, location, template_data, parameters=None, deployment_type="arm",
+               ensure_resource_group=True):
         """
         Deploy an Azure ARM or Bicep template
         
@@ -179,9 +212,12 @@ class AzureDeployer:
             resource_group (str): The resource group name
             deployment_name (str): The deployment name
             location (str): The Azure region
-            template_data (dict): The template data, either URL or template body
+            template_data (dict): The template data: template URL, template body, or
+                the compiled template (template_json) as returned by compile_template
             parameters (dict, optional): Parameters for the template
             deployment_type (str): 'arm' or 'bicep'
+            ensure_resource_group (bool): Create the resource group if it doesn't exist;
+                False when the caller already did
             
         Returns:
             dict: Deployment result with status and details
@@ -201,10 +237,14 @@ class AzureDeployer:
             raise ValueError("Azure credentials not configured")
         
         # Ensure resource group exists
-        self._ensure_resource_group(resource_group, location)
+        if ensure_resource_group:
+            self._ensure_resource_group(resource_group, location)
         
         # Prepare template
-        if deployment_type == "bicep" and "template_body" in template_data:
+        if "template_json" in template_data:
+            # Already compiled (see template_cache)
+            template_content = template_data["template_json"]
+        elif deployment_type == "bicep" and "template_body" in template_data:
             # Convert Bicep to ARM template
             template_content = self._convert_bicep_to_arm(template_data["template_body"])
         elif "template_url" in template_data:
@@ -392,37 +432,7 @@ class AzureDeployer:
         Returns:
             str: ARM template content
         """
-        # Create a temporary file for the Bicep content
-        with tempfile.NamedTemporaryFile(suffix=".bicep", delete=False) as temp_bicep:
-            temp_bicep.write(bicep_content.encode())
-            temp_bicep_path = temp_bicep.name
-        
-        try:
-            # Create a temporary file for the ARM output
-            temp_arm_path = temp_bicep_path.replace(".bicep", ".json")
-            
-            # Run the Bicep CLI to convert to ARM
-            result = subprocess.run(
-                ["az", "bicep", "build", "--file", temp_bicep_path, "--outfile", temp_arm_path],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
-            # Read the ARM template
-            with open(temp_arm_path, "r") as arm_file:
-                arm_content = arm_file.read()
-            
-            return arm_content
-            
-        except subprocess.CalledProcessError as e:
-            raise ValueError(f"Error converting Bicep to ARM: {e.stderr}")
-        finally:
-            # Clean up temporary files
-            if os.path.exists(temp_bicep_path):
-                os.unlink(temp_bicep_path)
-            if os.path.exists(temp_arm_path):
-                os.unlink(temp_arm_path)
+        return convert_bicep_to_arm(bicep_content)
     
     def get_deployment_status(self, resource_group, deployment_name):
         """
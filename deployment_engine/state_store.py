@@ -0,0 +1,276 @@
+"""
+Durable deployment state store for the deployment engine.
+Persists engine-side deployment state in Postgres so in-flight deployments survive
+restarts, and leases deployments to engine nodes so several replicas can share the work.
+"""
+
+import os
+import base64
+import hashlib
+import socket
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+from cryptography.fernet import Fernet, InvalidToken
+from sqlalchemy import Column, String, Text, DateTime, JSON
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+# Lease configuration
+ENGINE_NODE_ID = os.getenv("ENGINE_NODE_ID", f"{socket.gethostname()}-{os.getpid()}")
+ENGINE_LEASE_SECONDS = int(os.getenv("ENGINE_LEASE_SECONDS", "60"))
+
+# Fernet key the stored access tokens are encrypted with; derived from JWT_SECRET when not set
+ENGINE_STATE_KEY = os.getenv("ENGINE_STATE_KEY")
+
+TERMINAL_STATUSES = ["succeeded", "failed", "canceled"]
+
+Base = declarative_base()
+
+
+class EngineDeployment(Base):
+    __tablename__ = "engine_deployments"
+
+    deployment_id = Column(String, primary_key=True)
+    tenant_id = Column(String, index=True)
+    name = Column(String, nullable=True)
+    description = Column(String, nullable=True)
+    resource_group = Column(String)
+    location = Column(String, nullable=True)
+    deployment_type = Column(String, nullable=True)
+    azure_deployment_id = Column(String)
+    status = Column(String, index=True)
+    created_by = Column(String, nullable=True)
+    access_token = Column(Text, nullable=True)  # Encrypted; used for backend status callbacks after a restart
+    deployment_result = Column(JSON, nullable=True)
+    resources = Column(JSON, nullable=True)
+    outputs = Column(JSON, nullable=True)
+    logs = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Lease held by the engine node currently polling this deployment
+    lease_owner = Column(String, nullable=True, index=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+
+
+def state_cipher() -> Fernet:
+    """The cipher for stored access tokens: ENGINE_STATE_KEY, or a key derived from the JWT secret."""
+    if ENGINE_STATE_KEY:
+        return Fernet(ENGINE_STATE_KEY)
+    from token_validator import JWT_SECRET
+    return Fernet(base64.urlsafe_b64encode(hashlib.sha256(JWT_SECRET.encode("utf-8")).digest()))
+
+
+def _decrypt_token(cipher: Fernet, value: Optional[str]) -> Optional[str]:
+    if not value:
+        return value
+    try:
+        return cipher.decrypt(value.encode("utf-8")).decode("utf-8")
+    except InvalidToken:
+        # Rows saved before tokens were encrypted hold the JWT itself
+        if value.startswith("eyJ"):
+            return value
+        logger.warning("Stored access token could not be decrypted; check ENGINE_STATE_KEY")
+        return None
+
+
+def _to_dict(record: EngineDeployment, cipher: Fernet) -> Dict[str, Any]:
+    """Convert a stored deployment into the dictionary shape the engine works with."""
+    return {
+        "deployment_id": record.deployment_id,
+        "tenant_id": record.tenant_id,
+        "name": record.name,
+        "description": record.description,
+        "resource_group": record.resource_group,
+        "location": record.location,
+        "deployment_type": record.deployment_type,
+        "azure_deployment_id": record.azure_deployment_id,
+        "status": record.status,
+        "created_by": record.created_by,
+        "access_token": _decrypt_token(cipher, record.access_token),
+        "deployment_result": record.deployment_result,
+        "resources": record.resources or [],
+        "outputs": record.outputs or {},
+        "logs": record.logs or [],
+        "created_at": record.created_at.isoformat() if record.created_at else None,
+        "updated_at": record.updated_at.isoformat() if record.updated_at else None
+    }
+
+
+class DeploymentStateStore:
+    """
+    Stores engine deployment state and coordinates polling leases between engine nodes.
+
+    Each node claims unfinished deployments whose lease is free or expired, renews the
+    leases of deployments it is still tracking, and lets the rest expire so another node
+    (or itself, after a restart) can pick them up.
+    """
+
+    def __init__(self, engine, node_id: str = ENGINE_NODE_ID, lease_seconds: int = ENGINE_LEASE_SECONDS,
+                 cipher: Optional[Fernet] = None):
+        """
+        Initialize the state store.
+
+        Args:
+            engine: SQLAlchemy engine for the engine's database
+            node_id: Identifier of this engine node, used as the lease owner
+            lease_seconds: How long a claimed lease stays valid without renewal
+            cipher: Cipher access tokens are stored with (default: state_cipher())
+        """
+        self.engine = engine
+        self.cipher = cipher or state_cipher()
+        self.node_id = node_id
+        self.lease_seconds = lease_seconds
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def create_tables(self):
+        """Create the engine_deployments table if it does not exist."""
+        Base.metadata.create_all(bind=self.engine, checkfirst=True)
+        logger.info("Engine deployment state table is ready")
+
+    def _lease_expiry(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+
+    def save(self, deployment: Dict[str, Any]):
+        """
+        Insert or replace a deployment, leased to this node.
+
+        Args:
+            deployment: Deployment state keyed by EngineDeployment column names
+        """
+        with self.SessionLocal() as session:
+            record = session.get(EngineDeployment, deployment["deployment_id"])
+            if record is None:
+                record = EngineDeployment(deployment_id=deployment["deployment_id"])
+                session.add(record)
+
+            for key, value in deployment.items():
+                if key in ("deployment_id", "created_at", "updated_at"):
+                    continue
+                if key == "access_token" and value:
+                    value = self.cipher.encrypt(value.encode("utf-8")).decode("utf-8")
+                if hasattr(EngineDeployment, key):
+                    setattr(record, key, value)
+
+            record.lease_owner = self.node_id
+            record.lease_expires_at = self._lease_expiry()
+            session.commit()
+
+    def get(self, deployment_id: str) -> Optional[Dict[str, Any]]:
+        """Get a stored deployment, or None if it is unknown."""
+        with self.SessionLocal() as session:
+            record = session.get(EngineDeployment, deployment_id)
+            return _to_dict(record, self.cipher) if record else None
+
+    def update_status(self, deployment_id: str, status: str, resources: Optional[List[Dict[str, Any]]] = None,
+                      outputs: Optional[Dict[str, Any]] = None, logs: Optional[List[Dict[str, Any]]] = None) -> bool:
+        """
+        Record a status change for a deployment. Terminal statuses release the lease.
+
+        Returns:
+            bool: True if the deployment exists and was updated
+        """
+        values = {"status": status, "updated_at": datetime.utcnow()}
+        if resources is not None:
+            values["resources"] = resources
+        if outputs is not None:
+            values["outputs"] = outputs
+        if logs is not None:
+            values["logs"] = logs
+        if status in TERMINAL_STATUSES:
+            values["lease_owner"] = None
+            values["lease_expires_at"] = None
+
+        with self.SessionLocal() as session:
+            updated = session.query(EngineDeployment).filter(
+                EngineDeployment.deployment_id == deployment_id
+            ).update(values, synchronize_session=False)
+            session.commit()
+            return updated > 0
+
+    def claim_unfinished(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Claim unfinished deployments whose lease is free or expired.
+
+        Rows are locked with SKIP LOCKED so concurrent nodes never claim the same deployment.
+
+        Args:
+            limit: Maximum number of deployments to claim in one call
+
+        Returns:
+            List[dict]: The claimed deployments
+        """
+        now = datetime.utcnow()
+        with self.SessionLocal() as session:
+            records = session.query(EngineDeployment).filter(
+                EngineDeployment.status.notin_(TERMINAL_STATUSES),
+                (EngineDeployment.lease_expires_at == None) | (EngineDeployment.lease_expires_at < now)
+            ).order_by(
+                EngineDeployment.updated_at
+            ).limit(limit).with_for_update(skip_locked=True).all()
+
+            expiry = self._lease_expiry()
+            for record in records:
+                record.lease_owner = self.node_id
+                record.lease_expires_at = expiry
+
+            claimed = [_to_dict(record, self.cipher) for record in records]
+            session.commit()
+
+        if claimed:
+            logger.info(f"Node {self.node_id} claimed {len(claimed)} unfinished deployments")
+        return claimed
+
+    def renew_leases(self, deployment_ids: Iterable[str]) -> Set[str]:
+        """
+        Extend this node's leases on the given deployments.
+
+        Returns:
+            Set[str]: IDs whose lease is still held by this node. Deployments missing
+            from the result were taken over by another node and should stop being polled.
+        """
+        deployment_ids = list(deployment_ids)
+        if not deployment_ids:
+            return set()
+
+        with self.SessionLocal() as session:
+            session.query(EngineDeployment).filter(
+                EngineDeployment.deployment_id.in_(deployment_ids),
+                EngineDeployment.lease_owner == self.node_id
+            ).update({"lease_expires_at": self._lease_expiry()}, synchronize_session=False)
+
+            held = session.query(EngineDeployment.deployment_id).filter(
+                EngineDeployment.deployment_id.in_(deployment_ids),
+                EngineDeployment.lease_owner == self.node_id
+            ).all()
+            session.commit()
+
+        return {deployment_id for (deployment_id,) in held}
+
+    def release(self, deployment_id: str):
+        """Release this node's lease on a deployment."""
+        with self.SessionLocal() as session:
+            session.query(EngineDeployment).filter(
+                EngineDeployment.deployment_id == deployment_id,
+                EngineDeployment.lease_owner == self.node_id
+            ).update({"lease_owner": None, "lease_expires_at": None}, synchronize_session=False)
+            session.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """Get counts of unfinished deployments and leases held by this node."""
+        with self.SessionLocal() as session:
+            unfinished = session.query(EngineDeployment).filter(
+                EngineDeployment.status.notin_(TERMINAL_STATUSES)
+            ).count()
+            leased = session.query(EngineDeployment).filter(
+                EngineDeployment.lease_owner == self.node_id
+            ).count()
+        return {
+            "node_id": self.node_id,
+            "lease_seconds": self.lease_seconds,
+            "unfinished": unfinished,
+            "leased_by_node": leased
+        }
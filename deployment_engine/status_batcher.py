@@ -0,0 +1,190 @@
+"""
+Status update batcher for the deployment engine.
+Coalesces status updates from all tracked deployments and sends them to the
+backend in periodic batches instead of one request per poll.
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Batcher configuration
+STATUS_BATCH_INTERVAL = float(os.getenv("STATUS_BATCH_INTERVAL", "2"))  # seconds
+STATUS_BATCH_MAX_SIZE = int(os.getenv("STATUS_BATCH_MAX_SIZE", "100"))
+STATUS_BATCH_TIMEOUT = float(os.getenv("STATUS_BATCH_TIMEOUT", "30"))  # seconds
+
+
+class StatusBatcher:
+    """
+    Collects deployment status updates and flushes them to the backend's batch endpoint.
+
+    Pending updates are keyed by deployment ID, so a newer update for a deployment
+    replaces one that has not been sent yet. Updates are grouped by the access token
+    they must be sent with, since each batch request authenticates as one user.
+    Batches that fail with a network or server error are re-queued unless a newer
+    update for the same deployment arrived in the meantime.
+    """
+
+    def __init__(self, api_url: str, interval: float = STATUS_BATCH_INTERVAL,
+                 max_batch_size: int = STATUS_BATCH_MAX_SIZE, timeout: float = STATUS_BATCH_TIMEOUT):
+        """
+        Initialize the batcher.
+
+        Args:
+            api_url: Base URL of the backend API
+            interval: Seconds between flushes
+            max_batch_size: Maximum number of updates per batch request
+            timeout: Timeout in seconds for a batch request
+        """
+        self.api_url = api_url
+        self.interval = interval
+        self.max_batch_size = max_batch_size
+        self.timeout = timeout
+
+        self._pending = OrderedDict()  # deployment_id -> (access_token, update)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # Counters exposed through stats()
+        self._submitted_total = 0
+        self._coalesced_total = 0
+        self._sent_total = 0
+        self._batches_total = 0
+        self._failed_batches_total = 0
+        self._rejected_total = 0
+
+    def start(self):
+        """Start the flusher thread (no-op if already running)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="status-batcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Status batcher started, flushing every {self.interval}s")
+
+    def stop(self):
+        """Stop the flusher thread after sending whatever is still pending."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=self.timeout)
+        self.flush()
+        logger.info("Status batcher stopped")
+
+    def submit(self, deployment_id: str, access_token: str, update: Dict[str, Any]):
+        """
+        Queue a status update for a deployment, replacing any unsent update for it.
+
+        Args:
+            deployment_id: The deployment ID from the backend
+            access_token: Access token used to authenticate the backend call
+            update: Status fields (status, resources, outputs, logs, deployment_result)
+        """
+        with self._lock:
+            self._submitted_total += 1
+            if deployment_id in self._pending:
+                self._coalesced_total += 1
+                del self._pending[deployment_id]
+            self._pending[deployment_id] = (access_token, {**update, "deployment_id": deployment_id})
+
+    def flush(self):
+        """Send all pending updates to the backend."""
+        with self._lock:
+            pending = self._pending
+            self._pending = OrderedDict()
+
+        if not pending:
+            return
+
+        by_token: Dict[str, List[Dict[str, Any]]] = {}
+        for access_token, update in pending.values():
+            by_token.setdefault(access_token, []).append(update)
+
+        for access_token, updates in by_token.items():
+            for start in range(0, len(updates), self.max_batch_size):
+                chunk = updates[start:start + self.max_batch_size]
+                if not self._send(access_token, chunk):
+                    self._requeue(access_token, chunk)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get batcher statistics."""
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "interval_seconds": self.interval,
+                "max_batch_size": self.max_batch_size,
+                "submitted_total": self._submitted_total,
+                "coalesced_total": self._coalesced_total,
+                "sent_total": self._sent_total,
+                "batches_total": self._batches_total,
+                "failed_batches_total": self._failed_batches_total,
+                "rejected_total": self._rejected_total
+            }
+
+    def _run(self):
+        """Flusher loop."""
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing status updates: {str(e)}", exc_info=True)
+
+    def _send(self, access_token: str, updates: List[Dict[str, Any]]) -> bool:
+        """
+        Send one batch to the backend.
+
+        Returns:
+            bool: False if the batch should be retried, True if it was delivered or rejected
+        """
+        headers = {"Authorization": f"Bearer {access_token}"}
+        try:
+            response = requests.post(
+                f"{self.api_url}/api/deployments/engine/status/batch",
+                headers=headers,
+                json={"updates": updates},
+                timeout=self.timeout
+            )
+        except Exception as e:
+            logger.error(f"Error sending status batch of {len(updates)} updates: {str(e)}")
+            with self._lock:
+                self._failed_batches_total += 1
+            return False
+
+        if response.status_code >= 500:
+            logger.error(f"Backend failed to apply status batch: {response.text}")
+            with self._lock:
+                self._failed_batches_total += 1
+            return False
+
+        if response.status_code != 200:
+            # Expired token or validation error; retrying would not help
+            logger.error(f"Backend rejected status batch of {len(updates)} updates: {response.text}")
+            with self._lock:
+                self._batches_total += 1
+                self._rejected_total += len(updates)
+            return True
+
+        rejected = [item for item in response.json().get("results", []) if item.get("result") != "applied"]
+        for item in rejected:
+            logger.warning(f"Status update for deployment {item.get('deployment_id')} not applied: {item.get('result')}")
+
+        with self._lock:
+            self._batches_total += 1
+            self._sent_total += len(updates) - len(rejected)
+            self._rejected_total += len(rejected)
+        logger.info(f"Sent status batch with {len(updates)} updates to backend")
+        return True
+
+    def _requeue(self, access_token: str, updates: List[Dict[str, Any]]):
+        """Put failed updates back unless a newer update for the deployment is pending."""
+        with self._lock:
+            for update in updates:
+                deployment_id = update["deployment_id"]
+                if deployment_id not in self._pending:
+                    self._pending[deployment_id] = (access_token, update)
+                    self._pending.move_to_end(deployment_id, last=False)
@@ -0,0 +1,337 @@
+"""
+Deployment status tracker for the deployment engine.
+Schedules status polls for every in-flight deployment from a single scheduler
+thread backed by a bounded worker pool, instead of one polling thread per deployment.
+"""
+
+import os
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tracker configuration
+TRACKER_WORKERS = int(os.getenv("TRACKER_WORKERS", "8"))
+TRACKER_MAX_CALLS_PER_TENANT = int(os.getenv("TRACKER_MAX_CALLS_PER_TENANT", "4"))
+TRACKER_MIN_INTERVAL = float(os.getenv("TRACKER_MIN_INTERVAL", "5"))
+TRACKER_MAX_INTERVAL = float(os.getenv("TRACKER_MAX_INTERVAL", "60"))
+TRACKER_BACKOFF_FACTOR = float(os.getenv("TRACKER_BACKOFF_FACTOR", "1.5"))
+TRACKER_MAX_CONSECUTIVE_ERRORS = int(os.getenv("TRACKER_MAX_CONSECUTIVE_ERRORS", "5"))
+
+# Delay before retrying a deployment whose tenant is at its concurrency cap
+TENANT_THROTTLE_DELAY = 1.0
+
+TERMINAL_STATUSES = {"succeeded", "failed", "canceled"}
+
+
+class TrackedDeployment:
+    """State the tracker keeps for one in-flight deployment."""
+
+    def __init__(self, deployment_id: str, resource_group: str, azure_deployment_id: str,
+                 access_token: str, tenant_id: str, interval: float,
+                 deployment_result: Optional[Dict[str, Any]] = None):
+        self.deployment_id = deployment_id
+        self.resource_group = resource_group
+        self.azure_deployment_id = azure_deployment_id
+        self.access_token = access_token
+        self.tenant_id = tenant_id
+        self.deployment_result = deployment_result
+        self.interval = interval
+        self.next_poll_at = time.monotonic()
+        self.last_fingerprint = None
+        self.polls = 0
+        self.consecutive_errors = 0
+
+
+def progress_fingerprint(result: Dict[str, Any]) -> tuple:
+    """
+    Summarize a status result so the tracker can tell whether the deployment made progress.
+    A change in status, resource set, resource states or log count counts as progress.
+    """
+    resources = result.get("resources") or []
+    return (
+        result.get("status"),
+        tuple(sorted((str(r.get("id")), str(r.get("status"))) for r in resources)),
+        len(result.get("logs") or [])
+    )
+
+
+class DeploymentStatusTracker:
+    """
+    Polls deployment status for all tracked deployments.
+
+    Deployments are kept in a priority queue keyed by their next poll time. A single
+    scheduler thread pops due deployments and hands them to a bounded worker pool,
+    capping the number of concurrent Azure calls per tenant. Poll intervals back off
+    adaptively: they reset to the minimum whenever a poll shows progress and grow
+    towards the maximum while a long ARM operation shows none.
+    """
+
+    def __init__(
+        self,
+        poll_func: Callable[[TrackedDeployment], Optional[Dict[str, Any]]],
+        workers: int = TRACKER_WORKERS,
+        max_calls_per_tenant: int = TRACKER_MAX_CALLS_PER_TENANT,
+        min_interval: float = TRACKER_MIN_INTERVAL,
+        max_interval: float = TRACKER_MAX_INTERVAL,
+        backoff_factor: float = TRACKER_BACKOFF_FACTOR,
+        on_give_up: Optional[Callable[[TrackedDeployment], None]] = None
+    ):
+        """
+        Initialize the tracker.
+
+        Args:
+            poll_func: Called with a TrackedDeployment; returns the status result dict,
+                or None to stop tracking the deployment
+            workers: Size of the worker pool
+            max_calls_per_tenant: Maximum concurrent polls per tenant
+            min_interval: Poll interval in seconds while a deployment is making progress
+            max_interval: Upper bound for the backed-off poll interval in seconds
+            backoff_factor: Multiplier applied to the interval after a poll without progress
+            on_give_up: Called with a TrackedDeployment dropped after TRACKER_MAX_CONSECUTIVE_ERRORS
+                failed polls, so its stored state can be closed
+        """
+        self.poll_func = poll_func
+        self.workers = workers
+        self.max_calls_per_tenant = max_calls_per_tenant
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.on_give_up = on_give_up
+
+        self._queue = []
+        self._sequence = itertools.count()
+        self._tracked: Dict[str, TrackedDeployment] = {}
+        self._in_flight = set()
+        self._tenant_in_flight: Dict[str, int] = {}
+        self._condition = threading.Condition()
+        self._executor = None
+        self._scheduler = None
+        self._running = False
+
+        # Counters exposed through stats()
+        self._polls_total = 0
+        self._poll_errors_total = 0
+        self._throttled_total = 0
+        self._completed_total = 0
+        self._abandoned_total = 0
+
+    def start(self):
+        """Start the scheduler thread and worker pool (no-op if already running)."""
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="status-poll"
+            )
+            self._scheduler = threading.Thread(
+                target=self._run,
+                name="status-tracker",
+                daemon=True
+            )
+            self._scheduler.start()
+        logger.info(f"Deployment status tracker started with {self.workers} workers")
+
+    def stop(self):
+        """Stop scheduling new polls and shut down the worker pool."""
+        with self._condition:
+            if not self._running:
+                return
+            self._running = False
+            self._condition.notify_all()
+        self._executor.shutdown(wait=False)
+        logger.info("Deployment status tracker stopped")
+
+    def track(self, deployment_id: str, resource_group: str, azure_deployment_id: str,
+              access_token: str, tenant_id: str, delay: float = 0.0,
+              deployment_result: Optional[Dict[str, Any]] = None):
+        """
+        Start tracking a deployment.
+
+        If the deployment is already tracked, its entry is updated and polled again
+        from the minimum interval. While a poll of it is in flight, that poll
+        reschedules it, so a deployment is never polled twice at once.
+
+        Args:
+            deployment_id: The deployment ID from the backend
+            resource_group: The Azure resource group
+            azure_deployment_id: The Azure deployment name
+            access_token: Access token used for backend status callbacks
+            tenant_id: The tenant that owns the deployment
+            delay: Seconds to wait before the first poll
+            deployment_result: Initial result from the Azure deployment call
+        """
+        with self._condition:
+            tracked = self._tracked.get(deployment_id)
+            if tracked is None:
+                tracked = TrackedDeployment(
+                    deployment_id, resource_group, azure_deployment_id,
+                    access_token, tenant_id, self.min_interval,
+                    deployment_result=deployment_result
+                )
+                self._tracked[deployment_id] = tracked
+            else:
+                # The tenant is kept: it counts the entry's in-flight poll
+                tracked.resource_group = resource_group
+                tracked.azure_deployment_id = azure_deployment_id
+                tracked.access_token = access_token
+                tracked.deployment_result = deployment_result
+                tracked.interval = self.min_interval
+                tracked.last_fingerprint = None
+                tracked.consecutive_errors = 0
+            if deployment_id not in self._in_flight:
+                self._schedule(tracked, delay)
+        logger.info(f"Tracking deployment {deployment_id} (tenant {tenant_id})")
+
+    def untrack(self, deployment_id: str):
+        """Stop tracking a deployment. An in-flight poll is allowed to finish."""
+        with self._condition:
+            self._tracked.pop(deployment_id, None)
+
+    def is_tracking(self, deployment_id: str) -> bool:
+        """Check whether a deployment is currently tracked."""
+        with self._condition:
+            return deployment_id in self._tracked
+
+    def tracked_ids(self) -> List[str]:
+        """Get the IDs of all tracked deployments."""
+        with self._condition:
+            return list(self._tracked)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get tracker statistics.
+
+        Returns:
+            dict: Queue depth, in-flight polls, per-tenant concurrency and counters
+        """
+        with self._condition:
+            now = time.monotonic()
+            next_due = min((t.next_poll_at for t in self._tracked.values()
+                            if t.deployment_id not in self._in_flight), default=None)
+            return {
+                "running": self._running,
+                "tracked": len(self._tracked),
+                "queue_depth": len(self._tracked) - len(self._in_flight),
+                "in_flight": len(self._in_flight),
+                "in_flight_by_tenant": dict(self._tenant_in_flight),
+                "next_poll_in_seconds": max(0.0, next_due - now) if next_due is not None else None,
+                "workers": self.workers,
+                "max_calls_per_tenant": self.max_calls_per_tenant,
+                "polls_total": self._polls_total,
+                "poll_errors_total": self._poll_errors_total,
+                "throttled_total": self._throttled_total,
+                "completed_total": self._completed_total,
+                "abandoned_total": self._abandoned_total
+            }
+
+    def _schedule(self, tracked: TrackedDeployment, delay: float):
+        """Push a deployment onto the queue. Caller must hold the condition."""
+        tracked.next_poll_at = time.monotonic() + delay
+        heapq.heappush(self._queue, (tracked.next_poll_at, next(self._sequence), tracked))
+        self._condition.notify()
+
+    def _run(self):
+        """Scheduler loop: dispatch due deployments to the worker pool."""
+        with self._condition:
+            while self._running:
+                if not self._queue:
+                    self._condition.wait()
+                    continue
+
+                next_poll_at, _, tracked = self._queue[0]
+                now = time.monotonic()
+                if next_poll_at > now:
+                    self._condition.wait(next_poll_at - now)
+                    continue
+
+                heapq.heappop(self._queue)
+
+                # Skip entries that were untracked, replaced or rescheduled since being queued
+                if self._tracked.get(tracked.deployment_id) is not tracked or tracked.next_poll_at != next_poll_at:
+                    continue
+
+                tenant_calls = self._tenant_in_flight.get(tracked.tenant_id, 0)
+                if tenant_calls >= self.max_calls_per_tenant:
+                    self._throttled_total += 1
+                    self._schedule(tracked, TENANT_THROTTLE_DELAY)
+                    continue
+
+                self._in_flight.add(tracked.deployment_id)
+                self._tenant_in_flight[tracked.tenant_id] = tenant_calls + 1
+                self._executor.submit(self._poll, tracked)
+
+    def _poll(self, tracked: TrackedDeployment):
+        """Run one poll on a worker thread and reschedule the deployment."""
+        result = None
+        failed = False
+        try:
+            result = self.poll_func(tracked)
+        except Exception as e:
+            failed = True
+            logger.error(f"Error polling deployment {tracked.deployment_id}: {str(e)}", exc_info=True)
+
+        if self._record_poll(tracked, result, failed) and self.on_give_up:
+            try:
+                self.on_give_up(tracked)
+            except Exception as e:
+                logger.error(f"Error closing abandoned deployment {tracked.deployment_id}: {str(e)}", exc_info=True)
+
+    def _record_poll(self, tracked: TrackedDeployment, result: Optional[Dict[str, Any]], failed: bool) -> bool:
+        """Reschedule or drop a deployment after a poll. Returns True if the tracker gave up on it."""
+        with self._condition:
+            self._polls_total += 1
+            tracked.polls += 1
+            self._in_flight.discard(tracked.deployment_id)
+            remaining = self._tenant_in_flight.get(tracked.tenant_id, 1) - 1
+            if remaining > 0:
+                self._tenant_in_flight[tracked.tenant_id] = remaining
+            else:
+                self._tenant_in_flight.pop(tracked.tenant_id, None)
+
+            if self._tracked.get(tracked.deployment_id) is not tracked:
+                return False
+
+            if failed:
+                self._poll_errors_total += 1
+                tracked.consecutive_errors += 1
+                if tracked.consecutive_errors >= TRACKER_MAX_CONSECUTIVE_ERRORS:
+                    logger.error(f"Giving up on deployment {tracked.deployment_id} after {tracked.consecutive_errors} failed polls")
+                    self._abandoned_total += 1
+                    del self._tracked[tracked.deployment_id]
+                    return True
+                tracked.interval = min(tracked.interval * self.backoff_factor, self.max_interval)
+                self._schedule(tracked, tracked.interval)
+                return False
+
+            tracked.consecutive_errors = 0
+
+            if result is None:
+                logger.info(f"Stopped tracking deployment {tracked.deployment_id}")
+                del self._tracked[tracked.deployment_id]
+                return False
+
+            status = result.get("status")
+            if status in TERMINAL_STATUSES:
+                logger.info(f"Deployment {tracked.deployment_id} {status}, stopping polling")
+                self._completed_total += 1
+                del self._tracked[tracked.deployment_id]
+                return False
+
+            fingerprint = progress_fingerprint(result)
+            if fingerprint != tracked.last_fingerprint:
+                tracked.interval = self.min_interval
+            else:
+                tracked.interval = min(tracked.interval * self.backoff_factor, self.max_interval)
+            tracked.last_fingerprint = fingerprint
+
+            logger.debug(f"Next poll for deployment {tracked.deployment_id} in {tracked.interval:.1f}s")
+            self._schedule(tracked, tracked.interval)
+            return False
@@ -0,0 +1,166 @@
+"""
+Compiled template cache for the deployment engine.
+Keeps templates in the form deployments send to Azure (parsed ARM JSON, with Bicep
+already built to ARM), so repeated deployments of the same template skip parsing and
+the Bicep CLI subprocess.
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+from sqlalchemy import Column, String, DateTime, JSON
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+# Cache configuration
+TEMPLATE_CACHE_SIZE = int(os.getenv("TEMPLATE_CACHE_SIZE", "256"))  # compiled templates kept in memory
+
+Base = declarative_base()
+
+
+class CompiledTemplate(Base):
+    __tablename__ = "engine_compiled_templates"
+
+    content_hash = Column(String(64), primary_key=True)  # SHA-256 of the template code
+    deployment_type = Column(String, primary_key=True)  # arm, bicep
+    template_id = Column(String, nullable=True)  # Template the code was first compiled for
+    version = Column(String, nullable=True)
+    template = Column(JSON)  # The ARM template
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+def template_content_hash(code: str) -> str:
+    """SHA-256 hex digest of template code, the same digest the backend stores version code under."""
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+class CompiledTemplateCache:
+    """
+    Caches compiled templates by content hash and deployment type.
+
+    Lookups go to an in-process LRU first, then to the engine_compiled_templates table
+    shared by all engine nodes; only on a miss in both is the template compiled. Since
+    entries are keyed by the code's content, they never go stale: a new template
+    version is a new entry.
+    """
+
+    def __init__(self, engine, max_size: int = TEMPLATE_CACHE_SIZE):
+        """
+        Initialize the cache.
+
+        Args:
+            engine: SQLAlchemy engine for the engine's database
+            max_size: Maximum number of compiled templates kept in memory
+        """
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        self.engine = engine
+        self.max_size = max_size
+
+        self._entries = OrderedDict()  # (content_hash, deployment_type) -> ARM template
+        self._lock = threading.Lock()
+
+        # Counters exposed through stats()
+        self._memory_hits = 0
+        self._db_hits = 0
+        self._compiled = 0
+
+    def create_tables(self):
+        """Create the engine_compiled_templates table if it does not exist."""
+        Base.metadata.create_all(bind=self.engine, checkfirst=True)
+        logger.info("Compiled template cache table is ready")
+
+    def _remember(self, key: tuple, template: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = template
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_compile(self, code: str, deployment_type: str, compile: Callable[[str, str], Dict[str, Any]],
+                       template_id: Optional[str] = None, version: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get the compiled form of template code, compiling and storing it on a miss.
+
+        Args:
+            code: The template code
+            deployment_type: 'arm' or 'bicep'
+            compile: Function compiling (code, deployment_type) to the ARM template
+            template_id: Backend template ID, recorded with a newly compiled template
+            version: Template version, recorded with a newly compiled template
+
+        Returns:
+            dict: The ARM template; callers must not modify it
+
+        Raises:
+            ValueError: If the template does not compile
+        """
+        key = (template_content_hash(code), deployment_type)
+
+        with self._lock:
+            template = self._entries.get(key)
+            if template is not None:
+                self._entries.move_to_end(key)
+                self._memory_hits += 1
+                return template
+
+        try:
+            with self.SessionLocal() as session:
+                record = session.get(CompiledTemplate, key)
+                template = record.template if record else None
+        except Exception as e:
+            logger.error(f"Error reading compiled template cache: {str(e)}")
+            template = None
+
+        if template is not None:
+            with self._lock:
+                self._db_hits += 1
+            self._remember(key, template)
+            return template
+
+        template = compile(code, deployment_type)
+        with self._lock:
+            self._compiled += 1
+        self._remember(key, template)
+
+        try:
+            with self.SessionLocal() as session:
+                # Another node may have compiled the same template concurrently
+                session.execute(insert(CompiledTemplate).values(
+                    content_hash=key[0],
+                    deployment_type=deployment_type,
+                    template_id=template_id,
+                    version=version,
+                    template=template,
+                    created_at=datetime.utcnow()
+                ).on_conflict_do_nothing(index_elements=["content_hash", "deployment_type"]))
+                session.commit()
+        except Exception as e:
+            logger.error(f"Error storing compiled template: {str(e)}")
+
+        logger.info(f"Compiled {deployment_type} template {template_id or key[0][:12]} (version {version})")
+        return template
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            dict: Cache size and hit/compile counters
+        """
+        with self._lock:
+            lookups = self._memory_hits + self._db_hits + self._compiled
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "memory_hits": self._memory_hits,
+                "db_hits": self._db_hits,
+                "compiled": self._compiled,
+                "hit_ratio": (self._memory_hits + self._db_hits) / lookups if lookups else None
+            }
@@ -0,0 +1,155 @@
+"""
+Local access token validation for the deployment engine.
+Verifies backend-issued JWTs with the shared secret and caches the user's
+permission and tenant claims so most requests never call the backend.
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import jwt
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Token settings shared with the backend
+JWT_SECRET = os.getenv("JWT_SECRET", "your_jwt_secret_key_change_in_production")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+
+# Claims cache configuration
+AUTH_CACHE_TTL = int(os.getenv("AUTH_CACHE_TTL", "60"))  # seconds
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+
+
+class TokenValidationError(Exception):
+    """Raised when an access token is missing, malformed, expired or rejected."""
+
+
+class TokenValidator:
+    """
+    Validates access tokens locally and resolves user claims.
+
+    The signature and expiry are checked with the shared JWT secret on every call.
+    Permission and tenant claims are not part of the token, so they are fetched from
+    the backend's /api/auth/me on a cache miss and kept for AUTH_CACHE_TTL seconds
+    (never past the token's own expiry).
+    """
+
+    def __init__(self, api_url: str, secret: str = JWT_SECRET, algorithm: str = JWT_ALGORITHM,
+                 ttl: int = AUTH_CACHE_TTL, max_size: int = AUTH_CACHE_SIZE):
+        self.api_url = api_url
+        self.secret = secret
+        self.algorithm = algorithm
+        self.ttl = ttl
+        self.max_size = max_size
+        self._cache = OrderedDict()  # token -> (claims, expires monotonic time)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def validate(self, token: str) -> Dict[str, Any]:
+        """
+        Validate a token and return the user claims.
+
+        Args:
+            token: The bearer token
+
+        Returns:
+            dict: User claims in the shape used by the engine's permission checks
+
+        Raises:
+            TokenValidationError: If the token is invalid or the user cannot be resolved
+        """
+        try:
+            payload = jwt.decode(token, self.secret, algorithms=[self.algorithm])
+        except jwt.ExpiredSignatureError:
+            raise TokenValidationError("Token has expired")
+        except jwt.InvalidTokenError as e:
+            raise TokenValidationError(f"Invalid token: {str(e)}")
+
+        if not payload.get("sub"):
+            raise TokenValidationError("Token has no subject")
+
+        claims = self._get_cached(token)
+        if claims is not None:
+            return claims
+
+        claims = self._fetch_claims(token)
+
+        # Never cache past the token's expiry
+        ttl = self.ttl
+        if payload.get("exp"):
+            ttl = min(ttl, max(payload["exp"] - time.time(), 0))
+        self._put_cached(token, claims, ttl)
+        return claims
+
+    def invalidate(self, token: Optional[str] = None):
+        """Drop one token's cached claims, or all cached claims when no token is given."""
+        with self._lock:
+            if token is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(token, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get claims cache statistics."""
+        with self._lock:
+            return {
+                "size": len(self._cache),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses
+            }
+
+    def _get_cached(self, token: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._cache.get(token)
+            if entry:
+                claims, expires = entry
+                if time.monotonic() < expires:
+                    self._cache.move_to_end(token)
+                    self._hits += 1
+                    return claims
+                del self._cache[token]
+            self._misses += 1
+            return None
+
+    def _put_cached(self, token: str, claims: Dict[str, Any], ttl: float):
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._cache[token] = (claims, time.monotonic() + ttl)
+            self._cache.move_to_end(token)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def _fetch_claims(self, token: str) -> Dict[str, Any]:
+        """Resolve permission and tenant claims for a token from the backend."""
+        logger.debug("Resolving token claims via backend API")
+        headers = {"Authorization": f"Bearer {token}"}
+        response = requests.get(f"{self.api_url}/api/auth/me", headers=headers)
+
+        if response.status_code != 200:
+            logger.error(f"Token validation failed: {response.text}")
+            raise TokenValidationError("Invalid token")
+
+        user_data = response.json()
+
+        # Extract permissions from user data
+        permissions = user_data.get("permissions", [])
+        if not isinstance(permissions, list):
+            permissions = []
+
+        return {
+            "user_id": user_data.get("id"),
+            "username": user_data.get("username"),
+            "tenant_id": user_data.get("tenantId"),  # Use camelCase as returned by backend API
+            "permissions": permissions,
+            "role": user_data.get("role", "user"),
+            "accessible_tenants": user_data.get("accessibleTenants", []),
+            "is_msp_user": user_data.get("isMspUser", False)
+        }
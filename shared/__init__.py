@@ -0,0 +1,3 @@
+"""
+Code shared by the backend and the deployment engine.
+"""
@@ -0,0 +1,216 @@
+"""
+Connection pool construction and telemetry for SQLAlchemy engines, shared by the
+backend and the deployment engine.
+"""
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+class PoolMetrics:
+    """
+    Checkout counters of a pool. The counters are kept when the engine replaces its
+    pool (e.g. on dispose()), so totals cover the engine's whole lifetime.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.invalidations = 0
+        self.recreations = 0
+
+    def record_checkout(self, waited: float, overflow: bool):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            if overflow:
+                self.overflow_checkouts += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def record_invalidation(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def record_recreation(self):
+        with self._lock:
+            self.recreations += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts_total": self.checkouts,
+                "overflow_checkouts_total": self.overflow_checkouts,
+                "timeouts_total": self.timeouts,
+                "invalidations_total": self.invalidations,
+                "recreations_total": self.recreations,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.checkouts, 6) if self.checkouts else 0.0,
+                "wait_seconds_max": round(self.wait_seconds_max, 6)
+            }
+
+
+class PoolMetricsMixin:
+    """
+    Records checkout wait times, overflow connections and timeouts for a QueuePool.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics = PoolMetrics()
+        # A pool built by recreate() inherits the event listeners of the pool it replaces
+        if "_dispatch" not in kwargs:
+            event.listen(self, "invalidate", self._metrics.record_invalidation)
+            event.listen(self, "soft_invalidate", self._metrics.record_invalidation)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool._metrics = self._metrics
+        self._metrics.record_recreation()
+        return pool
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except PoolTimeoutError:
+            self._metrics.record_timeout()
+            raise
+        self._metrics.record_checkout(time.perf_counter() - started, self._overflow > 0)
+        return record
+
+    def stats(self) -> Dict[str, Any]:
+        """Get pool occupancy, and checkout statistics since the engine was created."""
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            **self._metrics.snapshot()
+        }
+
+
+class InstrumentedQueuePool(PoolMetricsMixin, QueuePool):
+    """QueuePool with checkout telemetry, for psycopg2 engines."""
+
+
+class InstrumentedAsyncAdaptedQueuePool(PoolMetricsMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool with checkout telemetry, for asyncpg engines."""
+
+
+def create_pooled_engine(
+    url: str,
+    pool_size: int,
+    max_overflow: int,
+    pool_timeout: int,
+    pool_recycle: int,
+    pool_pre_ping: bool,
+    statement_timeout_ms: int,
+    pgbouncer_mode: bool
+) -> Engine:
+    """
+    Create a Postgres engine with an instrumented, configurable connection pool.
+
+    Args:
+        url: Database URL
+        pool_size: Connections kept open in the pool
+        max_overflow: Extra connections allowed above pool_size under load
+        pool_timeout: Seconds to wait for a connection before raising
+        pool_recycle: Seconds after which connections are replaced (-1 to disable)
+        pool_pre_ping: Test connections on checkout so stale ones after a failover are replaced
+        statement_timeout_ms: Postgres statement_timeout in milliseconds (0 to disable)
+        pgbouncer_mode: Avoid per-connection server-side state so the engine works behind
+            PgBouncer in transaction pooling mode
+
+    Returns:
+        The engine; its pool's stats() reports pool telemetry
+    """
+    connect_args = {}
+    if statement_timeout_ms and not pgbouncer_mode:
+        # Session-level setting sent in the startup packet
+        connect_args["options"] = f"-c statement_timeout={statement_timeout_ms}"
+
+    engine = create_engine(
+        url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=pool_pre_ping,
+        connect_args=connect_args
+    )
+
+    if pgbouncer_mode and statement_timeout_ms:
+        # PgBouncer rejects startup options and shares server sessions between clients,
+        # so apply the timeout per transaction instead
+        @event.listens_for(engine, "begin")
+        def set_statement_timeout(conn):
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(statement_timeout_ms)}")
+
+    return engine
+
+
+def create_pooled_async_engine(
+    url: str,
+    pool_size: int,
+    max_overflow: int,
+    pool_timeout: int,
+    pool_recycle: int,
+    pool_pre_ping: bool,
+    statement_timeout_ms: int,
+    pgbouncer_mode: bool
+) -> AsyncEngine:
+    """
+    Create an asyncpg engine with the same pool settings as create_pooled_engine.
+
+    In PgBouncer mode asyncpg's prepared statement caches are disabled, since prepared
+    statements are bound to a server connection that PgBouncer may swap between
+    transactions, and the statement timeout is applied per transaction.
+    """
+    connect_args = {}
+    if pgbouncer_mode:
+        connect_args["statement_cache_size"] = 0
+        connect_args["prepared_statement_cache_size"] = 0
+    elif statement_timeout_ms:
+        connect_args["server_settings"] = {"statement_timeout": str(statement_timeout_ms)}
+
+    engine = create_async_engine(
+        url,
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=pool_timeout,
+        pool_recycle=pool_recycle,
+        pool_pre_ping=pool_pre_ping,
+        connect_args=connect_args
+    )
+
+    if pgbouncer_mode and statement_timeout_ms:
+        @event.listens_for(engine.sync_engine, "begin")
+        def set_statement_timeout(conn):
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(statement_timeout_ms)}")
+
+    return engine
+
+
+def get_pool_stats(engine: Engine) -> Dict[str, Any]:
+    """Get telemetry for an engine's pool (use .sync_engine for async engines)."""
+    pool = engine.pool
+    if isinstance(pool, PoolMetricsMixin):
+        return pool.stats()
+    return {"status": pool.status()}
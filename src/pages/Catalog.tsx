@@ -51,7 +51,7 @@ const Catalog = () => {
     
     try {
       const [templatesData, categoriesData] = await Promise.all([
-        cmpService.getTemplates(currentTenant.tenant_id),
+        cmpService.getTemplates(currentTenant.tenant_id, { includeCode: false }),
         cmpService.getTemplateCategories(currentTenant.tenant_id)
       ]);
       
@@ -80,7 +80,7 @@ const Catalog = () => {
     
     try {
       const [templatesData, categoriesData] = await Promise.all([
-        cmpService.getTemplates(currentTenant.tenant_id),
+        cmpService.getTemplates(currentTenant.tenant_id, { includeCode: false }),
         cmpService.getTemplateCategories(currentTenant.tenant_id)
       ]);
       
@@ -33,7 +33,7 @@ export default function Dashboard() {
     try {
       // Fetch deployments and cloud accounts in parallel
       const [deploymentsData, cloudAccountsData] = await Promise.all([
-        deploymentService.getDeployments(currentTenant.tenant_id),
+        deploymentService.getDeployments(currentTenant.tenant_id, { fields: [] }),
         deploymentService.getCloudAccounts(currentTenant.tenant_id)
       ]);
       
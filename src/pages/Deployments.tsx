@@ -51,7 +51,7 @@ const Deployments = () => {
       }
       
       // Fetch deployments from API
-      const deployments = await deploymentService.getDeployments(currentTenant.tenant_id);
+      const deployments = await deploymentService.getDeployments(currentTenant.tenant_id, { fields: [] });
       setDeployments(deployments);
       setFilteredDeployments(deployments);
       setIsLoading(false);
@@ -265,7 +265,7 @@ const Deployments = () => {
                       <TableCell>{getProviderBadge(deployment.provider)}</TableCell>
                       <TableCell>{deployment.environment}</TableCell>
                       <TableCell>{new Date(deployment.createdAt).toLocaleDateString()}</TableCell>
-                      <TableCell>{deployment.resources ? deployment.resources.length : 0}</TableCell>
+                      <TableCell>{deployment.resourceCount ?? (deployment.resources ? deployment.resources.length : 0)}</TableCell>
                     </TableRow>
                   ))}
                 </TableBody>
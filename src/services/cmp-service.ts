@@ -159,8 +159,10 @@ export class CMPService {
 
   /**
    * Get all templates for a tenant
+   *
+   * @param options.includeCode Set to false for listings that don't show the template code
    */
-  async getTemplates(tenantId: string): Promise<CloudTemplate[]> {
+  async getTemplates(tenantId: string, options: { includeCode?: boolean } = {}): Promise<CloudTemplate[]> {
     try {
       const token = localStorage.getItem('token');
       if (!token) {
@@ -172,7 +174,8 @@ export class CMPService {
           Authorization: `Bearer ${token}`
         },
         params: {
-          tenant_id: tenantId
+          tenant_id: tenantId,
+          include_code: options.includeCode ?? true
         }
       });
 
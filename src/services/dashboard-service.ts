@@ -54,6 +54,28 @@ export interface WidgetData {
   widget_type: string;
   data: any;
   last_updated: string;
+  cache_age_seconds?: number;
+}
+
+interface WidgetDataRequest {
+  widget_type: string;
+  data_source: string;
+  config?: any;
+  tenant_id?: string;
+}
+
+interface WidgetDataBatchItem {
+  widget_type: string;
+  data?: any;
+  last_updated?: string;
+  cache_age_seconds: number;
+  error?: string;
+}
+
+interface PendingWidgetData {
+  request: WidgetDataRequest;
+  resolve: (data: WidgetData) => void;
+  reject: (error: Error) => void;
 }
 
 export interface CreateDashboardRequest {
@@ -105,6 +127,8 @@ export interface DashboardLayoutUpdate {
 }
 
 class DashboardService {
+  private pendingWidgetData: PendingWidgetData[] = [];
+
   private getAuthHeaders() {
     const token = localStorage.getItem('token');
     return {
@@ -190,7 +214,8 @@ class DashboardService {
   }
 
   // Widget data operations
-  async getWidgetData(widgetType: string, dataSource: string, config?: any, tenantId?: string): Promise<WidgetData> {
+  // Requests made in the same tick (e.g. by all widgets of a dashboard rendering) are sent as one batch
+  getWidgetData(widgetType: string, dataSource: string, config?: any, tenantId?: string): Promise<WidgetData> {
     const request = {
       widget_type: widgetType,
       data_source: dataSource,
@@ -198,10 +223,36 @@ class DashboardService {
       tenant_id: tenantId,
     };
 
-    const response = await axios.post(`${API_BASE_URL}/widgets/data`, request, {
-      headers: this.getAuthHeaders(),
+    return new Promise((resolve, reject) => {
+      this.pendingWidgetData.push({ request, resolve, reject });
+      if (this.pendingWidgetData.length === 1) {
+        setTimeout(() => this.flushWidgetData(), 0);
+      }
     });
-    return response.data;
+  }
+
+  private async flushWidgetData(): Promise<void> {
+    const pending = this.pendingWidgetData;
+    this.pendingWidgetData = [];
+
+    try {
+      const response = await axios.post(
+        `${API_BASE_URL}/widgets/data/batch`,
+        { requests: pending.map((item) => item.request) },
+        { headers: this.getAuthHeaders() }
+      );
+      const results: WidgetDataBatchItem[] = response.data.results;
+      pending.forEach((item, index) => {
+        const result = results[index];
+        if (!result || result.error) {
+          item.reject(new Error(result?.error || 'Error fetching widget data'));
+        } else {
+          item.resolve(result as WidgetData);
+        }
+      });
+    } catch (error) {
+      pending.forEach((item) => item.reject(error as Error));
+    }
   }
 
   // Dashboard statistics
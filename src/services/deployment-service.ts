@@ -46,7 +46,7 @@ export class DeploymentService {
   /**
    * Get all deployments for a tenant
    */
-  async getDeployments(tenantId: string): Promise<CloudDeployment[]> {
+  async getDeployments(tenantId: string, options: { fields?: string[] } = {}): Promise<CloudDeployment[]> {
     try {
       const token = localStorage.getItem('token');
       if (!token) {
@@ -58,7 +58,9 @@ export class DeploymentService {
           Authorization: `Bearer ${token}`
         },
         params: {
-          tenant_id: formatTenantId(tenantId)
+          tenant_id: formatTenantId(tenantId),
+          // Large fields to include (resources, outputs); all when omitted
+          ...(options.fields !== undefined ? { fields: options.fields.join(',') } : {})
         }
       });
       return response.data;
@@ -57,6 +57,7 @@ export interface CloudDeployment {
   updatedAt: string;
   parameters: Record<string, string>;
   resources: CloudResource[];
+  resourceCount?: number; // Returned by the list endpoint, which omits resources unless requested
   tenantId: string;
   logs?: DeploymentLog[];
   details?: DeploymentDetails; // Add details field